@@ -1,10 +1,38 @@
 from gymnasium.envs.registration import register
+import importlib
 import numpy as np
 from .littlezoo import *
 
 import sys
 sys.path.append('../')
 
+# The tools built on LittleZoo are imported on first use: importing the package stays as fast as importing the
+# environment, and running their modules (e.g. python -m little_zoo.server) does not import them twice
+_LAZY_ATTRIBUTES = dict(merge_results='evaluation',
+                        run_evaluation='evaluation',
+                        RolloutStatistics='metrics',
+                        StatisticsRecorder='metrics',
+                        FoodChainPolicy='policies',
+                        OraclePolicy='policies',
+                        RandomPolicy='policies',
+                        make_policy='policies',
+                        EpisodeRecorder='recording',
+                        ScenePool='scene_pool',
+                        EpisodeScheduler='scheduler',
+                        EnvServer='server',
+                        LittleZooClient='server',
+                        LittleZooVectorEnv='vector_env')
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return getattr(importlib.import_module('.' + _LAZY_ATTRIBUTES[name], __name__), name)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_ATTRIBUTES))
+
 for v in ['1']:
     register(id='PlaygroundNavigation-v' + v,
              entry_point='little_zoo.playground.playgroundnavv' + v + ':PlayGroundNavigationV' + v,
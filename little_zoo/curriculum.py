@@ -0,0 +1,240 @@
+import numpy as np
+
+from little_zoo.littlezoo import get_goal_descriptions
+from little_zoo.playground.reward_function import get_reward_tables
+
+GOAL_BUCKETS = ('Grasp', 'Grow plant', 'Grow herbivore', 'Grow carnivore')
+
+
+class SumTree:
+    '''
+        Binary tree where each node stores the sum of its children, leaves store the weights.
+        Weight updates and sampling proportionally to the weights are O(log n), both are vectorized over batches.
+    '''
+
+    def __init__(self, capacity):
+        self.capacity = 1
+        while self.capacity < capacity:
+            self.capacity *= 2
+        self.depth = int(np.log2(self.capacity))
+        self.tree = np.zeros([2 * self.capacity])  # tree[1] is the root, leaves are tree[capacity:]
+
+    @property
+    def total(self):
+        return self.tree[1]
+
+    def get(self, indices):
+        return self.tree[self.capacity + np.asarray(indices)]
+
+    def update(self, indices, weights):
+        '''
+            Set the weights of the leaves at indices (weights must be non-negative)
+        '''
+        nodes = self.capacity + np.atleast_1d(indices)
+        weights = np.broadcast_to(np.maximum(weights, 0), nodes.shape)
+        if len(nodes) == 1:
+            # Scalar path, much cheaper than array operations for single updates
+            node = int(nodes[0])
+            self.tree[node] = weights[0]
+            tree = self.tree
+            for _ in range(self.depth):
+                node //= 2
+                tree[node] = tree[2 * node] + tree[2 * node + 1]
+            return
+        self.tree[nodes] = weights
+        for _ in range(self.depth):
+            nodes = nodes // 2  # duplicated parents are all assigned the same sum
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def find(self, values):
+        '''
+            Return the leaves whose cumulated weight range contains each value (values in [0, total))
+        '''
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(values.shape, dtype=np.int64)
+        for _ in range(self.depth):
+            left = self.tree[2 * nodes]
+            go_right = (values >= left) & (self.tree[2 * nodes + 1] > 0)
+            values -= left * go_right
+            nodes = 2 * nodes + go_right
+        return nodes - self.capacity
+
+    def sample(self, batch_size, rng):
+        return self.find(rng.uniform(0, self.total, batch_size))
+
+
+class GoalSampler:
+    '''
+        Goal sampler for learning-progress curricula over the LittleZoo goals.
+        Goals are identified by their id in get_reward_tables(env_params)['descriptions'].
+        Only the goals whose food chain fits in nb_objects objects are sampled (see get_nb_required_objects).
+        Each bucket (Grasp, Grow plant, Grow herbivore, Grow carnivore) has its own sum tree of goal weights.
+    '''
+
+    def __init__(self,
+                 env_params,
+                 train=True,
+                 nb_objects=4,
+                 bucket_weights=None,
+                 seed=None,
+                 tables=None,
+                ):
+        '''
+            env_params: environment parameters (LittleZoo.env_params)
+            train: sample among the train or the test goals
+            nb_objects: number of objects in the sampled scenes, the goals that need more objects are not sampled
+            bucket_weights: dict of fixed sampling probabilities of the buckets,
+                if None buckets are sampled proportionally to their total weight
+            tables: output of get_reward_tables(env_params), computed if not provided
+        '''
+        self.env_params = env_params
+        self.nb_objects = nb_objects
+        self.rng = np.random.default_rng(seed)
+        self.tables = tables if tables is not None else get_reward_tables(env_params)
+
+        descriptions = [d for d in get_goal_descriptions(self.tables, train)
+                        if self.get_nb_required_objects(d) <= nb_objects]
+        self.goal_ids = np.array([self.tables['description_ids'][d] for d in descriptions], dtype=np.int64)
+        self.goal_buckets = np.array([GOAL_BUCKETS.index(self.get_bucket(d)) for d in descriptions], dtype=np.int64)
+
+        # Position of each goal in the tree of its bucket
+        self.goal_slots = - np.ones([len(self.tables['descriptions'])], dtype=np.int64)
+        self.goal_bucket_of_id = - np.ones([len(self.tables['descriptions'])], dtype=np.int64)
+        self.bucket_goal_ids = []
+        self.trees = []
+        for i_bucket in range(len(GOAL_BUCKETS)):
+            ids = self.goal_ids[self.goal_buckets == i_bucket]
+            self.goal_slots[ids] = np.arange(len(ids))
+            self.goal_bucket_of_id[ids] = i_bucket
+            self.bucket_goal_ids.append(ids)
+            tree = SumTree(max(len(ids), 1))
+            if len(ids) > 0:
+                tree.update(np.arange(len(ids)), np.ones(len(ids)))
+            self.trees.append(tree)
+
+        if bucket_weights is not None:
+            weights = np.array([bucket_weights.get(b, 0) for b in GOAL_BUCKETS], dtype=np.float64)
+            self.bucket_weights = weights / weights.sum()
+        else:
+            self.bucket_weights = None
+
+    def get_bucket(self, description):
+        '''
+            Bucket of a goal description ('Grasp any cow' or 'Grasp cow')
+        '''
+        words = description.split(' ')
+        if words[0] == 'Grasp':
+            return 'Grasp'
+        obj = words[-1]
+        for category in ('plant', 'herbivore', 'carnivore'):
+            if obj == category or obj in self.env_params['categories'][category]:
+                return 'Grow ' + category
+        raise ValueError(description + ' is not a LittleZoo goal')
+
+    def get_nb_required_objects(self, description):
+        '''
+            Number of objects needed to achieve a goal: the object of a Grasp goal, or the object of a Grow goal, one
+            object of each level below it in the food chain and water
+        '''
+        bucket = self.get_bucket(description)
+        return 1 if bucket == 'Grasp' else GOAL_BUCKETS.index(bucket) + 1
+
+    def update(self, goal_ids, weights):
+        '''
+            Set the sampling weights of goals (e.g. their absolute learning progress), O(log n) per goal
+        '''
+        goal_ids = np.atleast_1d(goal_ids)
+        weights = np.broadcast_to(np.asarray(weights, dtype=np.float64), goal_ids.shape)
+        buckets = self.goal_bucket_of_id[goal_ids]
+        if (buckets < 0).any():
+            raise ValueError('Goals {} are not sampled by this sampler'.format(goal_ids[buckets < 0].tolist()))
+        for i_bucket in np.unique(buckets):
+            in_bucket = buckets == i_bucket
+            self.trees[i_bucket].update(self.goal_slots[goal_ids[in_bucket]], weights[in_bucket])
+
+    def get_weights(self, goal_ids=None):
+        goal_ids = self.goal_ids if goal_ids is None else np.atleast_1d(goal_ids)
+        buckets = self.goal_bucket_of_id[goal_ids]
+        weights = np.zeros(goal_ids.shape)
+        for i_bucket in np.unique(buckets[buckets >= 0]):
+            in_bucket = buckets == i_bucket
+            weights[in_bucket] = self.trees[i_bucket].get(self.goal_slots[goal_ids[in_bucket]])
+        return weights
+
+    def sample(self, batch_size, bucket=None):
+        '''
+            Sample a batch of goal ids, within one bucket if specified
+        '''
+        if bucket is not None:
+            buckets = np.full([batch_size], GOAL_BUCKETS.index(bucket))
+        else:
+            totals = np.array([tree.total for tree in self.trees])
+            probs = self.bucket_weights if self.bucket_weights is not None else totals
+            probs = np.where(totals > 0, probs, 0)
+            if probs.sum() <= 0:
+                raise ValueError('All the goals have a zero weight')
+            buckets = self.rng.choice(len(GOAL_BUCKETS), size=batch_size, p=probs / probs.sum())
+
+        goal_ids = np.empty([batch_size], dtype=np.int64)
+        for i_bucket in np.unique(buckets):
+            in_bucket = buckets == i_bucket
+            if self.trees[i_bucket].total <= 0:
+                raise ValueError('All the goals of the bucket ' + GOAL_BUCKETS[i_bucket] + ' have a zero weight')
+            slots = self.trees[i_bucket].sample(in_bucket.sum(), self.rng)
+            goal_ids[in_bucket] = self.bucket_goal_ids[i_bucket][slots]
+        return goal_ids
+
+    def get_env_desc(self, goal_id, rng=None):
+        '''
+            Build an env_desc for LittleZoo.reset: the goal followed by the objects needed to achieve it,
+            completed with random objects (a ValueError is raised if the needed objects do not fit in nb_objects)
+            rng: random generator of the objects, self.rng if None
+        '''
+        rng = self.rng if rng is None else rng
+        categories = self.env_params['categories']
+        description = self.tables['descriptions'][goal_id]
+        if self.get_nb_required_objects(description) > self.nb_objects:
+            raise ValueError('{} needs {} objects, the scenes have {}'.format(
+                description, self.get_nb_required_objects(description), self.nb_objects))
+        words = description.split(' ')
+        verb, obj = words[0], words[-1]
+
+        # Replace a category by one of its types
+        if obj in categories.keys():
+            obj = rng.choice(categories[obj])
+
+        objects = [obj]
+        if verb == 'Grow':
+            chain = ('plant', 'herbivore', 'carnivore')
+            for category in chain[:[i for i, c in enumerate(chain) if obj in categories[c]][0]]:
+                objects.append(rng.choice(categories[category]))
+            objects.append('water')
+        # Distractors
+        while len(objects) < self.nb_objects:
+            objects.append(rng.choice(self.env_params['attributes']['types']))
+        objects = [str(o) for o in objects]
+        rng.shuffle(objects)
+
+        return [verb + ' ' + words[-1]] + objects
+
+    def sample_env_descs(self, batch_size, bucket=None):
+        '''
+            Sample a batch of goals and return the goal ids and the corresponding env_desc lists
+        '''
+        goal_ids = self.sample(batch_size, bucket)
+        return goal_ids, [self.get_env_desc(g) for g in goal_ids]
+
+    # --- Checkpointing ---
+
+    def state_dict(self):
+        return dict(goal_ids=self.goal_ids.copy(),
+                    weights=self.get_weights(),
+                    bucket_weights=None if self.bucket_weights is None else self.bucket_weights.copy(),
+                    rng_state=self.rng.bit_generator.state)
+
+    def load_state_dict(self, state_dict):
+        if not np.array_equal(state_dict['goal_ids'], self.goal_ids):
+            raise ValueError('The checkpoint was saved for another goal space')
+        self.update(state_dict['goal_ids'], state_dict['weights'])
+        self.bucket_weights = state_dict['bucket_weights']
+        self.rng.bit_generator.state = state_dict['rng_state']
@@ -0,0 +1,211 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import zlib
+
+import numpy as np
+
+from little_zoo.curriculum import GoalSampler
+from little_zoo.littlezoo import get_goal_descriptions
+from little_zoo.metrics import GOAL_FAMILIES, RolloutStatistics
+from little_zoo.playground.env_params import get_env_params
+from little_zoo.playground.reward_function import get_reward_tables
+from little_zoo.policies import POLICIES, make_policy
+from little_zoo.scene_pool import build_scene, sample_scene_arrays
+from little_zoo.scheduler import EpisodeScheduler
+from little_zoo.vector_env import LittleZooVectorEnv
+
+SPLITS = ('train', 'test')
+
+
+def get_evaluation_units(env_params, seeds=(0,), nb_scenes=1, splits=SPLITS, tables=None):
+    '''
+        Evaluation units: one episode per (split, goal, seed, scene), for all the LittleZoo goals of the train and test
+        descriptions (see get_goal_descriptions).
+        Returns a list of dicts with the key of the unit ('<split>/<goal_id>/<seed>/<scene>'), its split, goal id and
+        goal, seed and scene index, in a deterministic order.
+    '''
+    tables = tables if tables is not None else get_reward_tables(env_params)
+    units = []
+    for split in splits:
+        for goal in get_goal_descriptions(tables, train=split == 'train'):
+            goal_id = tables['description_ids'][goal]
+            for seed in seeds:
+                for scene in range(nb_scenes):
+                    units.append(dict(key='{}/{}/{}/{}'.format(split, goal_id, seed, scene),
+                                      split=split, goal_id=int(goal_id), goal=goal, seed=int(seed), scene=scene))
+    return units
+
+
+def get_shard(key, nb_shards):
+    '''
+        Shard of a unit, from a hash of its key: it does not depend on the other units nor on the process
+    '''
+    return zlib.crc32(key.encode()) % nb_shards
+
+
+def get_shard_path(output_dir, shard, nb_shards):
+    return os.path.join(output_dir, 'shard_{:03d}-of-{:03d}.jsonl'.format(shard, nb_shards))
+
+
+def load_results(output_dir):
+    '''
+        Results of all the shard files of output_dir, by unit key. A line cut by a crash is ignored (the shard removes
+        it before appending new results).
+    '''
+    results = {}
+    for path in sorted(glob.glob(os.path.join(output_dir, 'shard_*.jsonl'))):
+        with open(path) as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    break
+                result = json.loads(line)
+                results.setdefault(result['key'], result)
+    return results
+
+
+def _open_shard_file(path):
+    # Open a shard file for appending, without the last line if it was cut by a crash
+    if os.path.exists(path):
+        with open(path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+    return open(path, 'a')
+
+
+def _get_unit_scene(unit, goal_sampler, playground):
+    # Scene of a unit, sampled with its own random generator so that it does not depend on the order of the units
+    rng = np.random.default_rng([unit['seed'], unit['goal_id'], unit['scene']])
+    env_desc = goal_sampler.get_env_desc(unit['goal_id'], rng=rng)
+    return build_scene(env_desc[0], sample_scene_arrays(env_desc, playground, rng), playground)
+
+
+def evaluate_shard(policy, output_dir, shard=0, nb_shards=1, seeds=(0,), nb_scenes=1, splits=SPLITS, batch_size=64,
+                   max_invalid_actions=10, **env_kwargs):
+    '''
+        Evaluate the units of a shard that are not in the results of output_dir yet, appending their results to the
+        shard file as the episodes end.
+        policy: name of a policy (in POLICIES), or a function building the policy from the environment parameters
+            (it must be picklable to be used by run_evaluation); the policy is called with the observations and the
+            infos of a batch of environments and returns their actions (see little_zoo.policies)
+        batch_size: number of environments, kept full by an EpisodeScheduler
+        max_invalid_actions: episodes fail when the policy takes more invalid actions
+        env_kwargs: arguments of LittleZoo, observation_mode='vector' by default
+        Returns the number of evaluated units.
+    '''
+    env_kwargs.setdefault('observation_mode', 'vector')
+    env_params = get_env_params()
+    tables = get_reward_tables(env_params)
+    units = [u for u in get_evaluation_units(env_params, seeds, nb_scenes, splits, tables)
+             if get_shard(u['key'], nb_shards) == shard]
+    completed = load_results(output_dir)
+    units = [u for u in units if u['key'] not in completed]
+    if len(units) == 0:
+        return 0
+
+    policy = make_policy(policy, env_params, seed=shard) if isinstance(policy, str) else policy(env_params)
+    goal_sampler = GoalSampler(env_params, tables=tables)
+    envs = LittleZooVectorEnv(min(batch_size, len(units)), **env_kwargs)
+    playground = envs.get_env(0).playground.unwrapped
+    scenes = (_get_unit_scene(unit, goal_sampler, playground) for unit in units)
+    scheduler = EpisodeScheduler(envs, scenes, bin_by_horizon=True, lookahead=8 * envs.nb_envs,
+                                 max_invalid_actions=max_invalid_actions)
+    with _open_shard_file(get_shard_path(output_dir, shard, nb_shards)) as f:
+        scheduler.reset()
+        while not scheduler.done:
+            for episode in scheduler.step(policy(scheduler.observations, scheduler.infos)):
+                result = dict(units[episode['episode']])
+                result.update({k: episode[k] for k in ('success', 'length', 'truncated', 'invalid_actions', 'env_desc')})
+                f.write(json.dumps(result) + '\n')
+            f.flush()
+        os.fsync(f.fileno())
+    envs.close()
+    return len(units)
+
+
+def merge_results(output_dir, seeds=(0,), nb_scenes=1, splits=SPLITS):
+    '''
+        Merge the results of the shards into the report of the evaluation (also saved to output_dir/report.json):
+        the statistics of each split (see RolloutStatistics.snapshot), the success rate of each goal and the number of
+        completed and missing units.
+    '''
+    env_params = get_env_params()
+    tables = get_reward_tables(env_params)
+    units = get_evaluation_units(env_params, seeds, nb_scenes, splits, tables)
+    results = load_results(output_dir)
+    report = dict(nb_units=len(units), nb_completed=0, splits={}, goals={})
+    for split in splits:
+        split_results = [results[u['key']] for u in units if u['split'] == split and u['key'] in results]
+        report['nb_completed'] += len(split_results)
+        statistics = RolloutStatistics(env_params, tables=tables, window=max(len(split_results), 1))
+        if split_results:
+            statistics.add_episodes(*[[r[k] for r in split_results]
+                                      for k in ('goal_id', 'success', 'length', 'truncated')],
+                                    nb_invalid_actions=[r['invalid_actions'] for r in split_results])
+        report['splits'][split] = {k: v for k, v in statistics.snapshot().items() if 'window' not in k}
+        goal_statistics = statistics.get_goal_statistics()
+        report['goals'][split] = {tables['descriptions'][i]: float(goal_statistics['success_rate'][i])
+                                  for i in np.flatnonzero(goal_statistics['episodes'])}
+    report['nb_missing'] = report['nb_units'] - report['nb_completed']
+    with open(os.path.join(output_dir, 'report.json.tmp'), 'w') as f:
+        json.dump(report, f, indent=1)
+    os.replace(os.path.join(output_dir, 'report.json.tmp'), os.path.join(output_dir, 'report.json'))
+    return report
+
+
+def run_evaluation(policy, output_dir, nb_workers=4, seeds=(0,), nb_scenes=1, splits=SPLITS, **kwargs):
+    '''
+        Evaluate a policy on all the units in nb_workers processes (one shard each, in this process if nb_workers is 0)
+        and merge their results. The run can be resumed after a crash by calling run_evaluation again with the same
+        output_dir and units: completed units are skipped, whatever the number of workers.
+        kwargs: arguments of evaluate_shard
+    '''
+    os.makedirs(output_dir, exist_ok=True)
+    config = dict(seeds=[int(s) for s in seeds], nb_scenes=nb_scenes, splits=list(splits))
+    config_path = os.path.join(output_dir, 'config.json')
+    if os.path.exists(config_path):
+        with open(config_path) as f:
+            if json.load(f) != config:
+                raise ValueError('The results of {} were computed for other units'.format(output_dir))
+    else:
+        with open(config_path, 'w') as f:
+            json.dump(config, f)
+
+    if nb_workers == 0:
+        evaluate_shard(policy, output_dir, 0, 1, seeds, nb_scenes, splits, **kwargs)
+    else:
+        context = multiprocessing.get_context('spawn')
+        workers = [context.Process(target=evaluate_shard,
+                                   args=(policy, output_dir, shard, nb_workers, seeds, nb_scenes, splits),
+                                   kwargs=kwargs)
+                   for shard in range(nb_workers)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        failed = [shard for shard, worker in enumerate(workers) if worker.exitcode != 0]
+        if failed:
+            raise RuntimeError('The evaluation of the shards {} failed, run it again to resume'.format(failed))
+    return merge_results(output_dir, seeds, nb_scenes, splits)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sharded and resumable evaluation of a policy on the LittleZoo goals')
+    parser.add_argument('output_dir')
+    parser.add_argument('--policy', default='oracle', choices=POLICIES)
+    parser.add_argument('--workers', type=int, default=4, help='number of processes, 0 to evaluate in this process')
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0])
+    parser.add_argument('--nb-scenes', type=int, default=1, help='scenes per goal and seed')
+    parser.add_argument('--splits', nargs='+', default=list(SPLITS), choices=SPLITS)
+    parser.add_argument('--batch-size', type=int, default=64, help='environments per worker')
+    args = parser.parse_args()
+
+    report = run_evaluation(args.policy, args.output_dir, args.workers, args.seeds, args.nb_scenes, args.splits,
+                            batch_size=args.batch_size)
+    for split, statistics in report['splits'].items():
+        print(split, ', '.join('{}: {:.3f}'.format(family, statistics[family + '/success_rate'])
+                               for family in GOAL_FAMILIES[:-1]))
+    print('{} / {} units completed'.format(report['nb_completed'], report['nb_units']))
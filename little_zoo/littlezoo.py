@@ -3,9 +3,43 @@ import numpy as np
 import random
 import re
 
-from little_zoo.playground.reward_function import get_reward_from_state
-from little_zoo.playground.descriptions import generate_all_descriptions
+from little_zoo.playground.reward_function import get_object_goals, get_reward_from_events, get_reward_from_state, get_reward_tables
 from little_zoo.playground.env_params import get_env_params
+from little_zoo.playground.playgroundnavv1 import PlayGroundNavigationV1
+
+
+def filter_goal_descriptions(descriptions):
+    '''
+        Keep the descriptions that are LittleZoo goals: remove all the 'Go to <position>' goals and general goals
+    '''
+    general = ['animal', 'thing', 'living_thing', 'carnivore', 'herbivore']
+    return [s for s in descriptions if not s.startswith('Go') and s.split(' ')[-1] not in general]
+
+
+def get_goal_descriptions(tables, train=True):
+    '''
+        LittleZoo goals among the train (or test) descriptions of get_reward_tables, in alphabetical order
+    '''
+    split = 0 if train else 1
+    return filter_goal_descriptions(sorted(d for d, s in zip(tables['descriptions'], tables['goal_splits']) if s == split))
+
+
+def get_goal_horizon(goal, env_params):
+    '''
+        Episode horizon of a goal (1.5 x the length of the optimal trajectory)
+    '''
+    if goal.startswith('Grasp'):
+        return 3
+    obj = goal.split(' ')[-1]
+    if goal.startswith('Grow'):
+        if obj in env_params['categories']['plant']:
+            return 6
+        elif obj in env_params['categories']['herbivore']:
+            return 10
+        elif obj in env_params['categories']['carnivore']:
+            return 15
+    return 10 # Impossible grow
+
 
 class LittleZoo(gym.Env):
     '''
@@ -16,29 +50,68 @@ class LittleZoo(gym.Env):
                  nb_objects=4,
                  train=True,
                  seed=None,
+                 render_mode=None,
+                 info_mode='text',
+                 observation_mode='text',
+                 keyframe_interval=5,
                 ):
         
-        # The playground environment
-        self.playground = gym.make('PlaygroundNavigation-v1', max_nb_objects=nb_objects)
+        # The playground environment, unwrapped (LittleZoo enforces its own episode horizon) and without the scene of
+        # the reset at construction
+        self.render_mode = render_mode
+        self.playground = PlayGroundNavigationV1(max_nb_objects=nb_objects, render_mode=render_mode, initial_reset=False)
         
         # Dict containing all the playground environment parameters
         self.env_params = get_env_params()
                         
-        # Generate all the descriptions/goals for the environment
-        train_descriptions, test_descriptions, _ = generate_all_descriptions(self.env_params)
+        # Goal ids: index of the goal in the catalog of all descriptions (ids of DescriptionSpace)
+        self.goal_tables = get_reward_tables(self.env_params)
+        self.goal_descriptions = self.goal_tables['descriptions']
         
-        # Remove all the 'Go to <position>' goals and general goals
-        general = ['animal', 'thing', 'living_thing', 'carnivore', 'herbivore']
-        train_descriptions = [s for s in train_descriptions if not s.startswith('Go') and s.split(' ')[-1] not in general]
-        test_descriptions = [s for s in test_descriptions if not s.startswith('Go') and s.split(' ')[-1] not in general]
+        # Train and test goals, without the 'Go to <position>' goals and the general goals
+        self.train_descriptions = get_goal_descriptions(self.goal_tables, train=True)
+        self.test_descriptions = get_goal_descriptions(self.goal_tables, train=False)
+        self.goal_horizons = [get_goal_horizon(g, self.env_params) for g in self.goal_descriptions]
         
         # Whether we use the train or test descriptions
         self.train = train
         
+        # 'text': info['possible_actions'] lists the possible actions as strings
+        # 'mask': info['action_mask'] is a bool mask over the action vocabulary of the scene (see get_action_vocabulary),
+        # the strings are only built by get_possible_actions
+        if info_mode not in ('text', 'mask'):
+            raise ValueError('Unknown info_mode ' + str(info_mode))
+        self.info_mode = info_mode
+        
+        # 'text': observations are natural language descriptions of the scene
+        # 'vector': observations are the playground feature vector followed by the object slots of the inventory
+        # (-1 for empty slots), actions are ids in the action vocabulary and no text is generated (info_mode is 'mask')
+        # 'prompt': text observations as append-only prompt segments, for LLM prompts whose prefix is cached:
+        # the static prefix of the episode (goal and initial objects, in info['prompt_prefix'] at reset) is followed by
+        # one segment per step (the observation), see get_prompt
+        # 'delta': text observations that only describe what changed since the last step, with a full description of
+        # the scene (keyframe) every keyframe_interval steps, see generate_delta_description
+        if observation_mode not in ('text', 'vector', 'prompt', 'delta'):
+            raise ValueError('Unknown observation_mode ' + str(observation_mode))
+        self.observation_mode = observation_mode
+        self.keyframe_interval = keyframe_interval
+        self.obj_info_stale = False
+        
         # Observation and action space
-        # Here for indication, the observation and action space are much smaller
-        self.observation_space = gym.spaces.Text(int(1e6))
-        self.action_space = gym.spaces.Text(int(1e6))
+        if self.observation_mode == 'vector':
+            self.info_mode = 'mask'
+            playground = self.playground.unwrapped
+            self.vector_observation = np.zeros([playground.dim_obs + 2], dtype=np.float32)
+            # The playground writes its observations directly into the vector observation, that is copied at each
+            # reset and step unless it is a caller-owned buffer (see set_observation_buffer)
+            self.observation_buffer = None
+            playground.set_observation_buffer(self.vector_observation[:playground.dim_obs])
+            self.observation_space = gym.spaces.Box(low=-np.inf, high=np.inf, shape=self.vector_observation.shape, dtype=np.float32)
+            self.action_space = gym.spaces.Discrete(1 + 2 * playground.nb_obj)
+        else:
+            # Here for indication, the observation and action space are much smaller
+            self.observation_space = gym.spaces.Text(int(1e6))
+            self.action_space = gym.spaces.Text(int(1e6))
         
         # Set seeds
         random.seed(seed)
@@ -49,90 +122,121 @@ class LittleZoo(gym.Env):
         
     # --- Gym methods ---
     
-    def reset(self, env_desc=None):
+    def reset(self, env_desc=None, goal_id=None, object_ids=None, scene=None):
         '''
             Reset the environment with a new goal
             env_desc: A list of strings. The first string is the goal,
             the other strings are the objects in the environment.
+            goal_id, object_ids: Alternatively, the id of the goal (in self.goal_descriptions)
+            and the ids of the objects (in env_params['attributes']['types']).
+            scene: Alternatively, a pre-built scene (see ScenePool).
         '''
-        if env_desc is not None:
+        if scene is not None:
+            self.env_desc = scene['env_desc']
+            self.goal_id = self.get_goal_id(self.env_desc[0])
+        elif env_desc is not None:
             self.env_desc = env_desc
+            self.goal_id = self.get_goal_id(env_desc[0])
+        elif goal_id is not None and object_ids is not None:
+            self.goal_id = int(goal_id)
+            types = self.env_params['attributes']['types']
+            self.env_desc = [self.get_goal_str(self.goal_id)] + [types[i] for i in object_ids]
         else:
             raise ValueError('You need to specify a goal')
         
-        self.playground.reset()
-        self.playground.unwrapped.reset_with_goal(self.env_desc)
+        if scene is not None:
+            self.playground.reset(options={'scene': dict(objects=scene['objects'],
+                                                         agent_pos=scene['agent_pos'],
+                                                         gripper_state=scene['gripper_state'])})
+        else:
+            self.playground.reset(options={'env_desc': self.env_desc})
         o, _, _, _, _ = self.playground.step(np.array([0, 0, 0])) # Init step
         self.current_step = 0
         
+        # Goals that each object achieves when it is grasped or grown, rewards are then given by the step events
+        self.object_goals = get_object_goals(self.playground.unwrapped.initial_observation, self.env_params, self.goal_tables)
+        
         # Define the episode horizon (1.5 x the length of the optimal trajectory)
-        if self.env_desc[0].startswith('Grasp'):
-            self.max_steps = 3
-        elif self.env_desc[0].startswith('Grow'):
-            obj = self.env_desc[0].split(' ')[-1]
-            if obj in self.env_params['categories']['plant']:
-                self.max_steps = 6
-            elif obj in self.env_params['categories']['herbivore']:
-                self.max_steps = 10
-            elif obj in self.env_params['categories']['carnivore']:
-                self.max_steps = 15
-            else: # Impossible grow
-                self.max_steps = 10
+        if self.goal_id >= 0:
+            self.max_steps = self.goal_horizons[self.goal_id]
+        else:
+            self.max_steps = get_goal_horizon(self.env_desc[0], self.env_params)
         
         self.update_obj_info()
-        observation, info = self.generate_description()
-        
-        self.inventory = info['inventory']
+        self.action_vocabulary = self.get_action_vocabulary()
+        if self.observation_mode == 'vector':
+            observation, info = self.get_vector_observation()
+        else:
+            observation, info = self.generate_description()
+            self.inventory = info['inventory']
+            if self.observation_mode == 'delta':
+                info['keyframe'] = True
+            if self.observation_mode == 'prompt':
+                self.prompt_segments = [self.get_prompt_prefix()]
+                info['prompt_prefix'] = self.prompt_segments[0]
+                observation = self.add_prompt_segment(observation)
+        if self.info_mode == 'mask':
+            info['action_vocabulary'] = self.action_vocabulary
             
         return observation, info
     
     
     def step(self, action_str):
-        if action_str[:5].lower() == 'go to':
-            action = self.go_to(action_str[6:])
-        elif action_str.lower() == 'grasp':
-            action = self.grasp()
-        elif action_str[:7].lower() == 'release':
-            if 'all' in action_str:
-                release_id = 4
-            else:
-                obj_to_release = action_str[8:]
-                if obj_to_release == self.inventory[0]:
-                    release_id = 2
-                else:
-                    release_id = 3
-                    
-            action = self.release(release_id=release_id)
+        '''
+            action_str: action string, or id of the action in the action vocabulary of the scene
+        '''
+        if isinstance(action_str, (int, np.integer)):
+            action = self.get_action_from_id(action_str)
         else:
-            raise ValueError('The action ' + action_str + ' is incorrect')
+            action = self.get_action_from_str(action_str)
                 
         # Take a step in the playgroud environment
         o, _, _, _, _ = self.playground.step(action)
+        events = list(self.playground.unwrapped.events)
         
         # There is a problem if you move directly to one of the objects, the state of the object is not updated
         # So we need to take a step with no action to update the state of the objects
         if action[0] != 0 or action[1] != 0: # If we moved
             o, _, _, _, _ = self.playground.step(np.array([0, 0, self.playground.unwrapped.gripper_state]))
+            events += self.playground.unwrapped.events
         
         self.current_step += 1
         
-        goal_reached = get_reward_from_state(o, self.env_desc[0], self.env_params)
+        if self.goal_id >= 0:
+            goal_reached = get_reward_from_events(events, self.goal_id, self.object_goals, self.goal_tables)
+        else:
+            goal_reached = get_reward_from_state(o, self.env_desc[0], self.env_params)
+        goal_reached = bool(goal_reached)
         
         truncated = self.current_step == self.max_steps
         done = truncated or goal_reached
         
-        self.update_obj_info()
-        observation, info = self.generate_description()
-        
-        self.inventory = info['inventory']
-        
-        # Reset the size of obj help to find the obj grown in the current step
-        self.playground.unwrapped.reset_size()
+        if self.observation_mode == 'vector':
+            self.obj_info_stale = True
+            observation, info = self.get_vector_observation()
+        else:
+            previous_obj_dict = self.obj_dict
+            self.update_obj_info()
+            observation, info = self.generate_description()
+            self.inventory = info['inventory']
+            if self.observation_mode == 'delta':
+                info['keyframe'] = self.current_step % self.keyframe_interval == 0
+                if not info['keyframe']:
+                    observation = self.generate_delta_description(previous_obj_dict)
+            if self.observation_mode == 'prompt':
+                action_name = self.action_vocabulary[action_str] if isinstance(action_str, (int, np.integer)) else action_str
+                observation = self.add_prompt_segment(observation, action_name)
+        info['events'] = events
         
         return observation, float(goal_reached), done, truncated, info
         
     def render(self):
-        raise NotImplementedError("Not implemented yet")
+        '''
+            Render the playground scene ('rgb_array' returns a uint8 image, 'human' opens a pygame window)
+        '''
+        if self.render_mode is None:
+            raise ValueError('You need to specify a render_mode (\'rgb_array\' or \'human\') at construction')
+        return self.playground.unwrapped.render()
     
     
     
@@ -146,7 +250,7 @@ class LittleZoo(gym.Env):
         '''
         self.obj_dict = {}
         i = 1
-        for obj in self.playground.unwrapped.objects:
+        for i_obj, obj in enumerate(self.playground.unwrapped.objects):
             if obj is None: 
                 continue
             agent_on = np.linalg.norm(obj.position - self.playground.unwrapped.agent_pos) < (obj.size + obj.agent_size) / 2 and not obj.grasped
@@ -158,9 +262,9 @@ class LittleZoo(gym.Env):
             else:
                 key = obj.object_descr['types']
             if key not in self.obj_dict.keys():
-                self.obj_dict[key] = {'position': obj.position, 'grasped': obj.grasped, 'agent_on': agent_on, 'grown': obj.grown_once}
+                self.obj_dict[key] = {'position': obj.position, 'grasped': obj.grasped, 'agent_on': agent_on, 'grown': obj.grown_once, 'id': i_obj}
             else: # If there are multiple objects with the same description
-                self.obj_dict[key + str(i)] = {'position': obj.position, 'grasped': obj.grasped, 'agent_on': agent_on, 'grown': obj.grown_once}
+                self.obj_dict[key + str(i)] = {'position': obj.position, 'grasped': obj.grasped, 'agent_on': agent_on, 'grown': obj.grown_once, 'id': i_obj}
                 i += 1
             
     def generate_description(self):
@@ -178,12 +282,170 @@ class LittleZoo(gym.Env):
                 nb_held += 1
         desc += f'\nInventory ({nb_held}/2): {", ".join(obj_held) if len(obj_held) > 0 else "empty"}'
         
-        possible_actions = ['Grasp'] + ['Go to ' + self.rm_trailing_number(obj) for obj in self.obj_dict.keys() if not self.obj_dict[obj]['grasped']] + ['Release ' + obj for obj in obj_held]
-        
-        info = {'goal': self.env_desc[0], 'possible_actions': possible_actions, 'inventory': obj_held}
+        info = {'goal': self.env_desc[0], 'goal_id': self.goal_id, 'inventory': obj_held}
+        if self.info_mode == 'text':
+            info['possible_actions'] = self.get_possible_actions()
+        else:
+            info['action_mask'] = self.get_action_mask()
         
         return desc, info
     
+    def get_vector_observation(self):
+        '''
+            Return the numeric observation of the scene (observation_mode 'vector') and the info, without text
+        '''
+        playground = self.playground.unwrapped
+        held = [i_obj for i_obj, obj in enumerate(playground.objects) if obj is not None and obj.grasped]
+        inventory = self.vector_observation[playground.dim_obs:]
+        inventory[:] = -1
+        inventory[:len(held)] = held
+        info = {'goal': self.env_desc[0], 'goal_id': self.goal_id, 'action_mask': self.get_action_mask()}
+        if self.observation_buffer is not None:
+            return self.vector_observation, info
+        return self.vector_observation.copy(), info
+    
+    def set_observation_buffer(self, buffer=None):
+        '''
+            Write the vector observations into a caller-owned float32 buffer of shape (dim_obs + 2,), for instance a row
+            of the batch array of LittleZooVectorEnv. reset and step then fill the buffer in place and return it
+            without copy. With buffer=None, go back to returning copies of an internal buffer.
+        '''
+        if self.observation_mode != 'vector':
+            raise ValueError('Observation buffers are only used with observation_mode vector')
+        if buffer is not None and buffer.shape != self.vector_observation.shape:
+            raise ValueError('The observation buffer must have shape {}, got {}'.format(self.vector_observation.shape, buffer.shape))
+        vector_observation = buffer if buffer is not None else np.zeros(self.vector_observation.shape, dtype=np.float32)
+        vector_observation[:] = self.vector_observation
+        self.vector_observation = vector_observation
+        self.observation_buffer = buffer
+        playground = self.playground.unwrapped
+        playground.set_observation_buffer(self.vector_observation[:playground.dim_obs])
+    
+    def update_stale_obj_info(self):
+        '''
+            In observation_mode 'vector', obj_dict and the inventory are only updated when they are needed
+            (string actions and action strings)
+        '''
+        if self.obj_info_stale:
+            self.update_obj_info()
+            self.inventory = [self.rm_trailing_number(obj) for obj in self.obj_dict.keys() if self.obj_dict[obj]['grasped']]
+            self.obj_info_stale = False
+    
+    def generate_delta_description(self, previous_obj_dict):
+        '''
+            Return a natural language description of what changed since previous_obj_dict (obj_dict of the last step):
+            objects that appeared, were consumed or grown, entered or left the inventory, and where the agent stands
+        '''
+        previous = {obj_info['id']: (self.rm_trailing_number(obj), obj_info) for obj, obj_info in previous_obj_dict.items()}
+        current = {obj_info['id']: (self.rm_trailing_number(obj), obj_info) for obj, obj_info in self.obj_dict.items()}
+        
+        changes = []
+        for i_obj, (obj, obj_info) in previous.items():
+            if i_obj not in current:
+                changes.append(f'{obj} was consumed')
+        for i_obj, (obj, obj_info) in current.items():
+            if i_obj not in previous:
+                changes.append(f'{obj} appeared')
+                continue
+            previous_obj, previous_info = previous[i_obj]
+            if obj_info['grown'] and not previous_info['grown']:
+                changes.append(f'{previous_obj} grew into {obj}')
+            if obj_info['grasped'] and not previous_info['grasped']:
+                changes.append(f'{obj} entered your inventory')
+            elif previous_info['grasped'] and not obj_info['grasped']:
+                changes.append(f'{obj} left your inventory')
+        
+        agent_on = [obj for obj, obj_info in current.values() if obj_info['agent_on']]
+        previous_agent_on = [obj for obj, obj_info in previous.values() if obj_info['agent_on']]
+        if agent_on != previous_agent_on:
+            changes.append(f'You are standing on: {", ".join(agent_on) if len(agent_on) > 0 else "nothing"}')
+        
+        return '\n'.join(changes) if len(changes) > 0 else 'Nothing changed'
+    
+    def get_prompt_prefix(self):
+        '''
+            Static prefix of the prompt of the episode: the goal and the objects at reset
+        '''
+        objects = ', '.join(self.rm_trailing_number(obj) for obj in self.obj_dict.keys())
+        return f'Goal: {self.env_desc[0]}\nObjects: {objects}\n\n'
+    
+    def add_prompt_segment(self, description, action_str=None):
+        '''
+            Append the segment of the current step (the action taken and the resulting scene) to the prompt segments
+            and return it. Segments are never modified once appended, each one starts with 'Step <k>:' and ends with an
+            empty line.
+        '''
+        action = f'Action: {action_str}\n' if action_str is not None else ''
+        segment = f'Step {self.current_step}:\n{action}{description}\n\n'
+        self.prompt_segments.append(segment)
+        return segment
+    
+    def get_prompt(self):
+        '''
+            Prompt of the episode so far (observation_mode 'prompt'): the prefix followed by the segments of all the
+            steps. Each call extends the previous prompt, so that its KV cache can be reused.
+        '''
+        return ''.join(self.prompt_segments)
+    
+    def get_possible_actions(self):
+        '''
+            Possible actions of the current step as strings
+        '''
+        self.update_stale_obj_info()
+        obj_held = [self.rm_trailing_number(obj) for obj in self.obj_dict.keys() if self.obj_dict[obj]['grasped']]
+        return ['Grasp'] + ['Go to ' + self.rm_trailing_number(obj) for obj in self.obj_dict.keys() if not self.obj_dict[obj]['grasped']] + ['Release ' + obj for obj in obj_held]
+    
+    def get_action_vocabulary(self):
+        '''
+            Action vocabulary of the scene, fixed at reset: 'Grasp', then 'Go to <obj>' and 'Release <obj>' for each
+            object slot (objects are named as at reset). Action ids index this list.
+        '''
+        names = [None] * len(self.playground.unwrapped.objects)
+        for obj, obj_info in self.obj_dict.items():
+            names[obj_info['id']] = self.rm_trailing_number(obj)
+        return ['Grasp'] + ['Go to ' + str(name) for name in names] + ['Release ' + str(name) for name in names]
+    
+    def get_action_mask(self):
+        '''
+            Bool mask of the possible actions of the current step over the action vocabulary
+        '''
+        objects = self.playground.unwrapped.objects
+        mask = np.zeros([1 + 2 * len(objects)], dtype=bool)
+        mask[0] = True
+        for i_obj, obj in enumerate(objects):
+            if obj is not None:
+                mask[1 + obj.grasped * len(objects) + i_obj] = True
+        return mask
+    
+    def get_action_str(self, action_id):
+        '''
+            Action string of an action id, with the current name of the object (e.g. once a seed has grown)
+        '''
+        if action_id == 0:
+            return 'Grasp'
+        self.update_stale_obj_info()
+        nb_slots = len(self.playground.unwrapped.objects)
+        slot = (action_id - 1) % nb_slots
+        for obj, obj_info in self.obj_dict.items():
+            if obj_info['id'] == slot:
+                return ('Go to ' if action_id <= nb_slots else 'Release ') + self.rm_trailing_number(obj)
+        raise ValueError('The object of the action ' + self.action_vocabulary[action_id] + ' is not in the environment anymore')
+    
+    def get_goal_id(self, goal):
+        '''
+            Id of a goal ('Grow lion' or 'Grow any lion'), -1 if it is not in the catalog (e.g. impossible goals)
+        '''
+        return self.goal_tables['description_ids'].get(goal, -1)
+    
+    def get_goal_str(self, goal_id):
+        '''
+            Goal string of a goal id, in the short form used by LittleZoo ('Grow lion') when possible
+        '''
+        words = self.goal_descriptions[goal_id].split(' ')
+        if len(words) == 3 and words[1] == 'any':
+            return words[0] + ' ' + words[2]
+        return self.goal_descriptions[goal_id]
+    
     def rm_trailing_number(self, input_str):
         return re.sub(r'\d+$', '', input_str)
     
@@ -205,6 +467,53 @@ class LittleZoo(gym.Env):
         else:
             raise ValueError(obj_desc + " not in the environment")
     
+    def get_action_from_str(self, action_str):
+        '''
+            Return the action of an action string
+        '''
+        self.update_stale_obj_info()
+        if action_str[:5].lower() == 'go to':
+            return self.go_to(action_str[6:])
+        elif action_str.lower() == 'grasp':
+            return self.grasp()
+        elif action_str[:7].lower() == 'release':
+            if 'all' in action_str:
+                release_id = 4
+            else:
+                obj_to_release = action_str[8:]
+                if obj_to_release == self.inventory[0]:
+                    release_id = 2
+                else:
+                    release_id = 3
+                    
+            return self.release(release_id=release_id)
+        else:
+            raise ValueError('The action ' + action_str + ' is incorrect')
+    
+    def get_action_from_id(self, action_id):
+        '''
+            Return the action of an action id of the action vocabulary
+        '''
+        nb_slots = len(self.playground.unwrapped.objects)
+        if not 0 <= action_id < 1 + 2 * nb_slots:
+            raise ValueError('The action id ' + str(action_id) + ' is incorrect')
+        if action_id == 0:
+            return self.grasp()
+        slot = (action_id - 1) % nb_slots
+        obj = self.playground.unwrapped.objects[slot]
+        if obj is None:
+            raise ValueError('The object of the action ' + self.action_vocabulary[action_id] + ' is not in the environment anymore')
+        if action_id <= nb_slots:
+            if obj.grasped:
+                raise ValueError(self.action_vocabulary[action_id] + ': the object is in the inventory')
+            agent_pos = self.playground.unwrapped.agent_pos
+            return np.array([obj.position[0] - agent_pos[0], obj.position[1] - agent_pos[1], -1])
+        if not obj.grasped:
+            raise ValueError(self.action_vocabulary[action_id] + ': the object is not in the inventory')
+        # The first object of the inventory is released with 2, the second one with 3
+        first_held = [o for o in self.playground.unwrapped.objects if o is not None and o.grasped][0]
+        return self.release(release_id=2 if obj is first_held else 3)
+    
     def grasp(self):
         '''
             Return the action to grasp an object
@@ -0,0 +1,224 @@
+import gymnasium as gym
+import numpy as np
+
+from little_zoo.curriculum import GOAL_BUCKETS
+from little_zoo.playground.reward_function import get_reward_tables
+
+# Goal families of the statistics, goals that are in none of the buckets (e.g. impossible goals) are counted as 'Other'
+GOAL_FAMILIES = GOAL_BUCKETS + ('Other',)
+_COUNTERS = ('episodes', 'successes', 'truncations', 'success_steps', 'steps', 'actions', 'invalid_actions')
+
+
+def get_goal_families(env_params, tables=None):
+    '''
+        Family of each goal id (index in GOAL_FAMILIES)
+    '''
+    tables = tables if tables is not None else get_reward_tables(env_params)
+    families = np.full([len(tables['descriptions'])], GOAL_FAMILIES.index('Other'), dtype=np.int64)
+    for i_goal, description in enumerate(tables['descriptions']):
+        words = description.split(' ')
+        if words[0] == 'Grasp':
+            families[i_goal] = GOAL_FAMILIES.index('Grasp')
+        elif words[0] == 'Grow':
+            for category in ('plant', 'herbivore', 'carnivore'):
+                if words[-1] == category or words[-1] in env_params['categories'][category]:
+                    families[i_goal] = GOAL_FAMILIES.index('Grow ' + category)
+    return families
+
+
+class RolloutStatistics:
+    '''
+        Streaming statistics of rollouts by goal id and goal family: success rate, steps to success, truncation rate
+        and invalid action rate, plus the success rate over a rolling window of the last episodes.
+        Counters are flat arrays indexed by goal id (the last entry counts the goals that are not in the catalog), so
+        that updates are O(1) and statistics of several processes can be merged by summing them (send state_dict()
+        rather than the object, which also holds the goal tables).
+        Truncations are the episodes that reach their horizon without success.
+
+        Usage:
+            statistics = RolloutStatistics(env.env_params)
+            env = StatisticsRecorder(env, statistics)  # or LittleZooVectorEnv(..., statistics=statistics)
+            ...
+            logger.log(statistics.snapshot())
+    '''
+
+    def __init__(self, env_params, tables=None, window=1000):
+        '''
+            env_params: environment parameters (LittleZoo.env_params)
+            tables: output of get_reward_tables(env_params), computed if not provided
+            window: number of episodes of the rolling window
+        '''
+        self.tables = tables if tables is not None else get_reward_tables(env_params)
+        self.nb_goals = len(self.tables['descriptions'])
+        # The last family is the one of the goals that are not in the catalog
+        self.goal_families = np.append(get_goal_families(env_params, self.tables), GOAL_FAMILIES.index('Other'))
+        self.counters = {name: np.zeros([self.nb_goals + 1], dtype=np.int64) for name in _COUNTERS}
+
+        self.window = window
+        self.window_goal_ids = np.full([window], -1, dtype=np.int64)
+        self.window_successes = np.zeros([window], dtype=bool)
+        self.nb_window_episodes = 0  # total number of episodes added to the window, the next one goes in the slot % window
+
+    # --- Updates ---
+
+    def add_episode(self, goal_id, success, length, truncated=False, nb_actions=None, nb_invalid_actions=0):
+        '''
+            Record a finished episode
+            goal_id: id of the goal (in self.tables['descriptions']), -1 if it is not in the catalog
+            length: number of valid steps of the episode
+            nb_actions: number of actions, valid or not (length + nb_invalid_actions if None)
+        '''
+        i = goal_id if 0 <= goal_id < self.nb_goals else self.nb_goals
+        counters = self.counters
+        counters['episodes'][i] += 1
+        counters['successes'][i] += bool(success)
+        counters['truncations'][i] += bool(truncated) and not success
+        counters['success_steps'][i] += length if success else 0
+        counters['steps'][i] += length
+        counters['actions'][i] += nb_actions if nb_actions is not None else length + nb_invalid_actions
+        counters['invalid_actions'][i] += nb_invalid_actions
+
+        slot = self.nb_window_episodes % self.window
+        self.window_goal_ids[slot] = goal_id
+        self.window_successes[slot] = bool(success)
+        self.nb_window_episodes += 1
+
+    def add_episodes(self, goal_ids, successes, lengths, truncateds=None, nb_actions=None, nb_invalid_actions=None):
+        '''
+            Record a batch of finished episodes (arrays of the arguments of add_episode)
+        '''
+        goal_ids = np.asarray(goal_ids, dtype=np.int64)
+        successes = np.asarray(successes, dtype=bool)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        truncateds = np.zeros(goal_ids.shape, dtype=bool) if truncateds is None else np.asarray(truncateds, dtype=bool)
+        nb_invalid_actions = np.zeros(goal_ids.shape, dtype=np.int64) if nb_invalid_actions is None else np.asarray(nb_invalid_actions)
+        nb_actions = lengths + nb_invalid_actions if nb_actions is None else np.asarray(nb_actions)
+
+        indices = np.where((goal_ids >= 0) & (goal_ids < self.nb_goals), goal_ids, self.nb_goals)
+        for name, values in (('episodes', 1), ('successes', successes), ('truncations', truncateds & ~successes),
+                             ('success_steps', lengths * successes), ('steps', lengths), ('actions', nb_actions),
+                             ('invalid_actions', nb_invalid_actions)):
+            np.add.at(self.counters[name], indices, values)
+
+        self._add_to_window(goal_ids, successes)
+
+    def merge(self, other):
+        '''
+            Add the statistics of another RolloutStatistics (e.g. of another process, received pickled or as a
+            state_dict). The episodes of its window are considered as the most recent ones.
+        '''
+        state = other.state_dict() if isinstance(other, RolloutStatistics) else other
+        for name in _COUNTERS:
+            self.counters[name] += state['counters'][name]
+        # Episodes of the other window, from the oldest to the most recent
+        window = len(state['window_goal_ids'])
+        nb_episodes = min(state['nb_window_episodes'], window)
+        slots = (state['nb_window_episodes'] - nb_episodes + np.arange(nb_episodes)) % max(window, 1)
+        self._add_to_window(state['window_goal_ids'][slots], state['window_successes'][slots])
+        return self
+
+    def reset(self):
+        for counter in self.counters.values():
+            counter[:] = 0
+        self.window_goal_ids[:] = -1
+        self.window_successes[:] = False
+        self.nb_window_episodes = 0
+
+    # --- Snapshots ---
+
+    def get_goal_statistics(self):
+        '''
+            Statistics of each goal id (arrays of shape (nb_goals,), nan for goals without episodes)
+        '''
+        return self._get_rates({name: counter[:-1] for name, counter in self.counters.items()})
+
+    def get_family_statistics(self):
+        '''
+            Statistics of each goal family (arrays of shape (len(GOAL_FAMILIES),))
+        '''
+        return self._get_rates({name: np.bincount(self.goal_families, counter, minlength=len(GOAL_FAMILIES))
+                                for name, counter in self.counters.items()})
+
+    def snapshot(self):
+        '''
+            Flat dict of scalars for logging: overall statistics, statistics of each family ('<family>/<statistic>')
+            and the success rate over the window
+        '''
+        totals = self._get_rates({name: counter.sum() for name, counter in self.counters.items()})
+        snapshot = {name: float(value) for name, value in totals.items()}
+        for name, values in self.get_family_statistics().items():
+            for family, value in zip(GOAL_FAMILIES, values):
+                snapshot[family + '/' + name] = float(value)
+        # Slots of the window are filled in order, the first nb_window_episodes ones are used
+        nb_window_episodes = min(self.nb_window_episodes, self.window)
+        goal_ids = self.window_goal_ids[:nb_window_episodes]
+        successes = self.window_successes[:nb_window_episodes]
+        families = self.goal_families[np.where((goal_ids >= 0) & (goal_ids < self.nb_goals), goal_ids, self.nb_goals)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            snapshot['window_success_rate'] = float(successes.mean()) if nb_window_episodes > 0 else np.nan
+            family_rates = (np.bincount(families, successes, minlength=len(GOAL_FAMILIES))
+                            / np.bincount(families, minlength=len(GOAL_FAMILIES)))
+        for family, value in zip(GOAL_FAMILIES, family_rates):
+            snapshot[family + '/window_success_rate'] = float(value)
+        return snapshot
+
+    def state_dict(self):
+        return dict(counters={name: counter.copy() for name, counter in self.counters.items()},
+                    window_goal_ids=self.window_goal_ids.copy(),
+                    window_successes=self.window_successes.copy(),
+                    nb_window_episodes=self.nb_window_episodes)
+
+    def load_state_dict(self, state_dict):
+        self.reset()
+        for name in _COUNTERS:
+            self.counters[name][:] = state_dict['counters'][name]
+        self.window_goal_ids[:] = state_dict['window_goal_ids']
+        self.window_successes[:] = state_dict['window_successes']
+        self.nb_window_episodes = state_dict['nb_window_episodes']
+
+    def _add_to_window(self, goal_ids, successes):
+        # Only the most recent episodes fit in the window
+        nb_episodes = len(goal_ids)
+        nb_kept = min(nb_episodes, self.window)
+        slots = (self.nb_window_episodes + nb_episodes - nb_kept + np.arange(nb_kept)) % self.window
+        self.window_goal_ids[slots] = goal_ids[nb_episodes - nb_kept:]
+        self.window_successes[slots] = successes[nb_episodes - nb_kept:]
+        self.nb_window_episodes += nb_episodes
+
+    def _get_rates(self, counters):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            episodes = np.asarray(counters['episodes'], dtype=np.float64)
+            successes = np.asarray(counters['successes'], dtype=np.float64)
+            return dict(episodes=counters['episodes'],
+                        success_rate=successes / episodes,
+                        steps_to_success=counters['success_steps'] / successes,
+                        truncation_rate=counters['truncations'] / episodes,
+                        invalid_action_rate=counters['invalid_actions'] / np.asarray(counters['actions'], dtype=np.float64))
+
+
+class StatisticsRecorder(gym.Wrapper):
+    '''
+        Record the episodes of a LittleZoo environment in a RolloutStatistics.
+        Invalid actions (the ValueError raised by step) are counted and raised again.
+    '''
+
+    def __init__(self, env, statistics):
+        super().__init__(env)
+        self.statistics = statistics
+        self.nb_invalid_actions = 0
+
+    def reset(self, env_desc=None, **kwargs):
+        self.nb_invalid_actions = 0
+        return self.env.reset(env_desc, **kwargs)
+
+    def step(self, action_str):
+        try:
+            observation, reward, done, truncated, info = self.env.step(action_str)
+        except ValueError:
+            self.nb_invalid_actions += 1
+            raise
+        if done:
+            env = self.env.unwrapped
+            self.statistics.add_episode(env.goal_id, reward > 0, env.current_step, truncated,
+                                        nb_invalid_actions=self.nb_invalid_actions)
+        return observation, reward, done, truncated, info
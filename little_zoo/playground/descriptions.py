@@ -1,3 +1,4 @@
+import numpy as np
 from little_zoo.playground.env_params import get_env_params
 
 
@@ -122,6 +123,152 @@ def generate_all_descriptions(env_params):
 
     return train_descriptions, test_descriptions, extra_descriptions
 
+class _VerbDescriptions:
+    """
+    Descriptions of one verb, in the order of generate_all_descriptions: for each adjective, '<verb> <adj> <name>' for
+    all names (non-relative adjectives only) then '<verb> any <adj> thing'; then '<verb> any <name>' for all names.
+    """
+    def __init__(self, verb, adjectives, relative, names):
+        self.verb = verb
+        self.adjectives = adjectives
+        self.names = names
+        self.adjective_ids = dict(zip(adjectives, range(len(adjectives))))
+        self.name_ids = dict(zip(names, range(len(names))))
+        # number of names combined with each adjective, and first id of each adjective segment
+        self.nb_adj_names = np.where(relative, 0, len(names)).astype(np.int64)
+        self.starts = np.concatenate([[0], np.cumsum(self.nb_adj_names + 1)]).astype(np.int64)
+        self.nb_adj_descriptions = int(self.starts[-1])
+
+    def __len__(self):
+        return self.nb_adj_descriptions + len(self.names)
+
+    def get(self, i):
+        if i >= self.nb_adj_descriptions:
+            return '{} any {}'.format(self.verb, self.names[i - self.nb_adj_descriptions])
+        i_adj = int(np.searchsorted(self.starts, i, side='right')) - 1
+        j = i - self.starts[i_adj]
+        if j < self.nb_adj_names[i_adj]:
+            return '{} {} {}'.format(self.verb, self.adjectives[i_adj], self.names[j])
+        return '{} any {} thing'.format(self.verb, self.adjectives[i_adj])
+
+    def index(self, words):
+        # words: description without the verb, returns None if it is not a description of this verb
+        if len(words) >= 3 and words[0] == 'any' and words[-1] == 'thing':
+            i_adj = self.adjective_ids.get(' '.join(words[1:-1]))
+            if i_adj is not None:
+                return int(self.starts[i_adj + 1]) - 1
+        elif len(words) == 2 and words[0] == 'any':
+            if words[1] in self.name_ids:
+                return self.nb_adj_descriptions + self.name_ids[words[1]]
+        elif len(words) >= 2:
+            i_adj = self.adjective_ids.get(' '.join(words[:-1]))
+            if i_adj is not None and words[-1] in self.name_ids and self.nb_adj_names[i_adj] > 0:
+                return int(self.starts[i_adj]) + self.name_ids[words[-1]]
+        return None
+
+
+class DescriptionSpace:
+    def __init__(self, env_params):
+        """
+        Lazy version of generate_all_descriptions: counts, indexes and iterates over the descriptions without building
+        them. Ids follow the generation order of generate_all_descriptions (Move, Grasp then Grow descriptions, before
+        the train/test split and sorting), they are the goal ids of get_reward_tables. The split of a description is
+        decided on demand from its id. Attempted grow (extra) descriptions are not included.
+
+        Parameters
+        ----------
+        env_params: dict
+            Dict of environment parameters from get_env_params function.
+        """
+        p = env_params
+        self.words_test_set_def = p['words_test_set_def']
+        find_category_of_attribute = p['extract_functions']['find_category_of_attribute']
+
+        # Categories of the adjectives are looked up once
+        adjectives = list(p['adjective_attributes'])
+        adj_categories = dict((a, find_category_of_attribute(a)) for a in adjectives)
+        is_relative = dict((a, 'relative' in adj_categories[a]) for a in adjectives)
+        if p['attribute_combinations']:
+            # same combinations as combine_two(adjectives, adjectives)
+            for a in list(adjectives):
+                for b in p['adjective_attributes']:
+                    cat_a, cat_b = adj_categories[a], adj_categories[b]
+                    if a != b and not (cat_a in cat_b or cat_b in cat_a) and not is_relative[a] and not is_relative[b]:
+                        adjectives.append('{} and {}'.format(a, b))
+                        is_relative[adjectives[-1]] = False
+        relative = np.array([is_relative[a] for a in adjectives], dtype=bool)
+
+        self.move_descriptions = ()
+        if 'Move' in p['admissible_actions']:
+            self.move_descriptions = ('Go left', 'Go right', 'Go bottom', 'Go top',
+                                      'Go top left', 'Go bottom left', 'Go top right', 'Go bottom right', 'Go center')
+        self.move_ids = dict(zip(self.move_descriptions, range(len(self.move_descriptions))))
+
+        self.verbs = []
+        if 'Grasp' in p['admissible_actions']:
+            self.verbs.append(_VerbDescriptions('Grasp', adjectives, relative, p['name_attributes']))
+        if 'Grow' in p['admissible_actions']:
+            list_exluded = p['categories']['furniture'] + p['categories']['supply'] + ('furniture', 'supply')
+            kept = [i for i, a in enumerate(adjectives) if a not in list_exluded]
+            self.verbs.append(_VerbDescriptions('Grow',
+                                                [adjectives[i] for i in kept],
+                                                relative[kept],
+                                                tuple(n for n in p['name_attributes'] if n not in list_exluded)))
+        self.starts = np.cumsum([0, len(self.move_descriptions)] + [len(v) for v in self.verbs]).astype(np.int64)
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def __getitem__(self, description_id):
+        if description_id < 0:
+            description_id += len(self)
+        if not 0 <= description_id < len(self):
+            raise IndexError('description id out of range')
+        if description_id < len(self.move_descriptions):
+            return self.move_descriptions[description_id]
+        i_verb = int(np.searchsorted(self.starts, description_id, side='right')) - 2
+        return self.verbs[i_verb].get(description_id - int(self.starts[i_verb + 1]))
+
+    def __iter__(self):
+        for description_id in range(len(self)):
+            yield self[description_id]
+
+    def __contains__(self, description):
+        try:
+            self.index(description)
+        except ValueError:
+            return False
+        return True
+
+    def index(self, description):
+        """
+        Id of a description, raises a ValueError if the description is not in the space.
+        """
+        if description in self.move_ids:
+            return self.move_ids[description]
+        words = description.split(' ')
+        for i_verb, verb in enumerate(self.verbs):
+            if words[0] == verb.verb:
+                i = verb.index(words[1:])
+                if i is not None:
+                    return int(self.starts[i_verb + 1]) + i
+        raise ValueError('{} is not in the description space'.format(description))
+
+    def is_test(self, description_id):
+        """
+        Whether a description belongs to the testing set (contains an occurrence reserved to the testing set).
+        """
+        description = self[description_id]
+        return any(w in description for w in self.words_test_set_def)
+
+    def iter_split(self, test=False):
+        """
+        Iterate over the (id, description) pairs of the training (or testing) set.
+        """
+        for description_id, description in enumerate(self):
+            if any(w in description for w in self.words_test_set_def) == test:
+                yield description_id, description
+
 if __name__ == '__main__':
     env_params = get_env_params()
     train_descriptions, test_descriptions, extra_descriptions = generate_all_descriptions(env_params)
@@ -278,6 +278,64 @@ def get_env_params(max_nb_objects=3,
 
     get_attributes_functions['all_attributes'] = get_attributes_from_state
 
+    # Attributes of the batched extraction (last dimension of its output), in the order of admissible_attributes
+    attribute_names = ()
+    for k in admissible_attributes:
+        attribute_names += attributes[k]
+    params['attribute_names'] = attribute_names
+
+    # One-hot encodings of the types, shared by all objects (read-only)
+    type_encodings = np.eye(nb_types)
+    type_encodings.flags.writeable = False
+    params['type_encodings'] = type_encodings
+    params['type_ids'] = dict(zip(types, range(nb_types)))
+    type_categories = np.array([[obj_type in categories[k] for k in categories.keys()] for obj_type in types])
+
+    # Batched attribute extraction functions, over arrays of features of shape (batch_size, nb_objs, dim_obj_features)
+    def get_objs_type(all_obj_features):
+        return all_obj_features[:, :, type_inds] == 1
+
+    def get_objs_cat(all_obj_features):
+        return get_objs_type(all_obj_features).astype(np.int64) @ type_categories.astype(np.int64) > 0
+
+    def get_objs_size(all_obj_features):
+        small = all_obj_features[:, :, size_inds] < min_max_sizes[0][1]
+        return np.stack([~small, small], axis=-1)
+
+    def get_objs_position(all_obj_features):
+        x_position = all_obj_features[:, :, position_inds[0]]
+        y_position = all_obj_features[:, :, position_inds[1]]
+        return np.stack([x_position < 0, x_position >= 0, y_position >= 0, y_position < 0], axis=-1)
+
+    def get_objs_relative_position(all_obj_features):
+        # one min/max reduction per state, ties are all attributed the relative position
+        x_position = all_obj_features[:, :, position_inds[0]]
+        y_position = all_obj_features[:, :, position_inds[1]]
+        return np.stack([x_position == x_position.min(axis=1, keepdims=True),
+                         x_position == x_position.max(axis=1, keepdims=True),
+                         y_position == y_position.max(axis=1, keepdims=True),
+                         y_position == y_position.min(axis=1, keepdims=True)], axis=-1)
+
+    get_objs_attributes_functions = dict(relative_positions=get_objs_relative_position,
+                                         positions=get_objs_position,
+                                         sizes=get_objs_size,
+                                         types=get_objs_type,
+                                         categories=get_objs_cat)
+
+    # List all attributes of all objects from a batch of states
+    def get_attributes_from_states(states):
+        """
+        Batched version of get_attributes_from_state.
+
+        states: nd.array of shape (batch_size, dim_state) (or a single state)
+        Returns a bool nd.array of shape (batch_size, nb_objs, len(params['attribute_names'])).
+        """
+        states = np.atleast_2d(states)
+        nb_objs = (states.shape[1] - dim_body_features) // dim_obj_features
+        all_obj_features = states[:, dim_body_features:dim_body_features + nb_objs * dim_obj_features]
+        all_obj_features = all_obj_features.reshape(states.shape[0], nb_objs, dim_obj_features)
+        return np.concatenate([get_objs_attributes_functions[k](all_obj_features) for k in admissible_attributes], axis=-1)
+
     # Extract absolute position of the agent
     def get_agent_position_attributes(state):
         agent_pos = state[agent_position_inds]
@@ -415,6 +473,7 @@ def get_env_params(max_nb_objects=3,
                                        count_objects=count_objects,
                                        get_obj_features=get_obj_features,
                                        get_attributes_functions=get_attributes_functions,
+                                       get_attributes_from_states=get_attributes_from_states,
                                        find_category_of_attribute=find_category_of_attribute,
                                        check_if_relative=check_if_relative,
                                        combine_two=combine_two)
@@ -0,0 +1,449 @@
+"""
+Pure-functional core of the PlayGroundNavigationV1 dynamics.
+
+The state of a scene is a dict of arrays (see get_state) and step(state, action) -> (state, event_flags) only uses array
+operations, without objects nor in-place updates. All the arrays can have leading batch dimensions, so that one call
+steps a batch of scenes with NumPy. With the jax backend, step can be jit-compiled and vmap-ed (on CPU or any device).
+Transitions match PlayGroundNavigationV1.step, including the order in which the objects are updated (see
+check_trace, the golden traces of generate_golden_traces and the frozen ones of tests/data/golden_traces.npz).
+"""
+import argparse
+import time
+
+import numpy as np
+
+# Events of the objects (see PlayGroundNavigationV1.events), in the order of the last axis of stacked event flags
+EVENTS = ('grasped', 'released', 'grown', 'consumed')
+BACKENDS = ('numpy', 'jax')
+# Level of the objects in the food chain: water (0) feeds plants (1), grown plants feed herbivores (2) and grown
+# herbivores feed carnivores (3), other objects (-1) do not grow
+_FOOD_CHAIN = ('supply', 'plant', 'herbivore', 'carnivore')
+
+
+def get_backend(backend='numpy'):
+    """
+    Array module of a backend.
+
+    Parameters
+    ----------
+    backend: str
+        'numpy', or 'jax' for jax.numpy (jax is an optional dependency).
+
+    Returns
+    -------
+    xp: module
+    """
+    if backend == 'numpy':
+        return np
+    if backend == 'jax':
+        try:
+            import jax.numpy as jnp
+        except ImportError as e:
+            raise ImportError('The jax backend needs jax, install it with pip install jax') from e
+        return jnp
+    raise ValueError('Unknown backend {}, should be in {}'.format(backend, BACKENDS))
+
+
+def get_type_levels(params):
+    """
+    Level of each object type in the food chain, -1 for the types that do not grow nor feed other objects.
+
+    Parameters
+    ----------
+    params: dict
+        Environment parameters.
+
+    Returns
+    -------
+    levels: nd.array of int of shape (nb_types,)
+    """
+    types = params['attributes']['types']
+    # Category of each type, the most specific one as in PlayGroundNavigationV1.regularize_type_and_attribute
+    type_to_category = {t: c for c, category_types in params['categories'].items() for t in category_types}
+    return np.array([_FOOD_CHAIN.index(type_to_category[t]) if type_to_category[t] in _FOOD_CHAIN else -1
+                     for t in types], dtype=np.int64)
+
+
+def get_state(playground):
+    """
+    State arrays of a PlayGroundNavigationV1 scene.
+
+    Parameters
+    ----------
+    playground: PlayGroundNavigationV1
+
+    Returns
+    -------
+    state: dict
+        agent_pos: nd.array of shape (2,)
+        gripper_state: int (1 closed, -1 open)
+        type_ids: nd.array of int of shape (nb_objects,)
+        present: nd.array of bool of shape (nb_objects,), False for removed objects (their other arrays are unused)
+        positions: nd.array of shape (nb_objects, 2)
+        sizes: nd.array of shape (nb_objects,)
+        rgb_codes: nd.array of shape (nb_objects, 3)
+        grasped: nd.array of bool of shape (nb_objects,)
+        grown: nd.array of bool of shape (nb_objects,), whether the objects already grew
+    """
+    objects = playground.objects
+    nb_objects = len(objects)
+    state = dict(agent_pos=np.array(playground.agent_pos, dtype=np.float64),
+                 gripper_state=np.array(playground.gripper_state, dtype=np.int64),
+                 type_ids=np.zeros([nb_objects], dtype=np.int64),
+                 present=np.zeros([nb_objects], dtype=bool),
+                 positions=np.zeros([nb_objects, 2]),
+                 sizes=np.zeros([nb_objects]),
+                 rgb_codes=np.zeros([nb_objects, 3]),
+                 grasped=np.zeros([nb_objects], dtype=bool),
+                 grown=np.zeros([nb_objects], dtype=bool))
+    for i_obj, obj in enumerate(objects):
+        if obj is None:
+            continue
+        state['type_ids'][i_obj] = np.argmax(obj.type)
+        state['present'][i_obj] = True
+        state['positions'][i_obj] = obj.position
+        state['sizes'][i_obj] = obj.size
+        state['rgb_codes'][i_obj] = obj.rgb_code
+        state['grasped'][i_obj] = obj.grasped
+        state['grown'][i_obj] = obj.grown_once
+    return state
+
+
+def get_initial_state(scene_arrays):
+    """
+    State arrays of a new scene sampled by little_zoo.scene_pool.sample_scene_arrays (no object is grasped nor grown).
+
+    Parameters
+    ----------
+    scene_arrays: dict
+        Output of sample_scene_arrays.
+
+    Returns
+    -------
+    state: dict
+        See get_state.
+    """
+    nb_objects = len(scene_arrays['type_ids'])
+    return dict(agent_pos=np.array(scene_arrays['agent_pos'], dtype=np.float64),
+                gripper_state=np.array(scene_arrays['gripper_state'], dtype=np.int64),
+                type_ids=np.array(scene_arrays['type_ids'], dtype=np.int64),
+                present=np.ones([nb_objects], dtype=bool),
+                positions=np.array(scene_arrays['positions'], dtype=np.float64),
+                sizes=np.array(scene_arrays['sizes'], dtype=np.float64),
+                rgb_codes=np.array(scene_arrays['rgb_codes'], dtype=np.float64),
+                grasped=np.zeros([nb_objects], dtype=bool),
+                grown=np.zeros([nb_objects], dtype=bool))
+
+
+def stack_states(states):
+    """
+    Stack the state arrays of several scenes (with the same number of objects) along a new first axis.
+    """
+    return {k: np.stack([state[k] for state in states]) for k in states[0].keys()}
+
+
+def make_step(params, backend='numpy'):
+    """
+    Build the step function of the dynamics.
+
+    Parameters
+    ----------
+    params: dict
+        Environment parameters.
+    backend: str
+        'numpy' or 'jax'. With jax, the returned function can be wrapped in jax.jit and jax.vmap (enable jax_enable_x64
+        to get the float64 transitions of the reference engine).
+
+    Returns
+    -------
+    step: function
+        step(state, action) -> (state, event_flags). The state is a dict of arrays (see get_state) and action an array
+        of shape (..., 3) of PlayGroundNavigationV1 actions: agent displacement and gripper action (1 grasps, 2, 3 and
+        4 release the first, second and both objects of the inventory, other values open the gripper).
+        event_flags is a dict of bool arrays of shape (..., nb_objects), one per event of EVENTS. Actions that the
+        reference engine rejects (releasing an empty inventory slot) release nothing.
+    """
+    xp = get_backend(backend)
+    type_levels = xp.asarray(get_type_levels(params))
+    agent_size = params['agent_size']
+    size_update = params['obj_size_update']
+    max_size = params['min_max_sizes'][1][1] + size_update
+
+    def step(state, action):
+        action = xp.asarray(action)
+        agent_pos = state['agent_pos'] + action[..., :2]
+        gripper_action = action[..., 2:3]
+        present, positions, sizes = state['present'], state['positions'], state['sizes']
+        grasped, grown = state['grasped'], state['grown']
+        levels = type_levels[state['type_ids']]
+        nb_objects = present.shape[-1]
+        slots = xp.arange(nb_objects)
+
+        # Inventory: the grasped objects in the order of the slots
+        held = present & grasped
+        rank = xp.cumsum(held, axis=-1) - 1
+        nb_held = xp.sum(held, axis=-1, keepdims=True)
+        to_release = held & (((gripper_action == 2) & (rank == 0)) | ((gripper_action == 3) & (rank == 1))
+                             | ((gripper_action == 4) & (rank <= 1)))
+        single_release = xp.sum(to_release, axis=-1, keepdims=True) == 1
+        gripper = xp.where((gripper_action == 1) & (nb_held < 2), 1, -1)
+
+        flags = {event: xp.zeros_like(present) for event in EVENTS}
+        # Objects are updated one after the other, in the order of the slots: an object sees the changes of the objects
+        # before it in the same step (e.g. their new positions)
+        for i in range(nb_objects):
+            is_i = slots == i
+            level = levels[..., i:i + 1]
+            # Grow by consuming the first object that feeds it (water, or a grown object of the level below) and
+            # touches it, if both are free or the only released object
+            free = ~grasped | (to_release & single_release)
+            distances = xp.sqrt(xp.sum((positions - positions[..., i:i + 1, :]) ** 2, axis=-1))
+            food = (present & free & (levels == level - 1) & (level >= 1) & (grown | (level == 1))
+                    & (distances < (sizes[..., i:i + 1] + sizes) / 2))
+            food = food & (present & free & ~grown & is_i).any(axis=-1, keepdims=True)
+            consumed = food & (xp.cumsum(food, axis=-1) == 1)
+            grows = is_i & food.any(axis=-1, keepdims=True)
+            flags['released'] = flags['released'] | (grows & grasped)
+            flags['grown'] = flags['grown'] | grows
+            flags['consumed'] = flags['consumed'] | consumed
+            sizes = xp.where(grows, xp.minimum(sizes + size_update, max_size), sizes)
+            grown = grown | grows
+            grasped = grasped & ~grows
+            present = present & ~consumed
+
+            # Grasp if the gripper is closed and the agent touches the object
+            agent_distance = xp.sqrt(xp.sum((positions - agent_pos[..., None, :]) ** 2, axis=-1))
+            grasps = is_i & present & ~grasped & (agent_distance < (sizes + agent_size) / 2) & (gripper > 0)
+            flags['grasped'] = flags['grasped'] | grasps
+            grasped = grasped | grasps
+
+            # Grasped objects follow the agent
+            follows = is_i & present & grasped
+            positions = xp.where(follows[..., None], xp.clip(agent_pos[..., None, :], -1, 1), positions)
+
+            # Consuming an object opens the gripper for the next objects
+            gripper = xp.where(consumed.any(axis=-1, keepdims=True), -1, gripper)
+
+        state = dict(state,
+                     agent_pos=agent_pos,
+                     gripper_state=gripper[..., 0],
+                     present=present,
+                     positions=positions,
+                     sizes=sizes,
+                     grasped=grasped,
+                     grown=grown)
+        return state, flags
+
+    return step
+
+
+def make_observe(params, backend='numpy'):
+    """
+    Build the function returning the current state half of the PlayGroundNavigationV1 observation of state arrays
+    (see PlayGroundNavigationV1.observe): agent position, gripper state and features of the objects.
+
+    Returns
+    -------
+    observe: function
+        observe(state) -> nd.array of shape (..., dim_body_features + nb_objects * dim_obj_features)
+    """
+    xp = get_backend(backend)
+    type_encodings = xp.asarray(params['type_encodings'])
+
+    def observe(state):
+        present = state['present'][..., None]
+        features = xp.concatenate([type_encodings[state['type_ids']],
+                                   state['positions'],
+                                   state['sizes'][..., None],
+                                   state['rgb_codes'],
+                                   xp.where(state['grasped'], 1., -1.)[..., None]], axis=-1)
+        features = xp.where(present, features, 0.)
+        body = xp.concatenate([state['agent_pos'], xp.asarray(state['gripper_state'], dtype=features.dtype)[..., None]], axis=-1)
+        return xp.concatenate([body, features.reshape(features.shape[:-2] + (-1,))], axis=-1)
+
+    return observe
+
+
+def get_event_flags(events, nb_objects):
+    """
+    Event flags (see make_step) of a list of (event, object slot) tuples of PlayGroundNavigationV1.events.
+    """
+    flags = {event: np.zeros([nb_objects], dtype=bool) for event in EVENTS}
+    for event, i_obj in events:
+        flags[event][i_obj] = True
+    return flags
+
+
+# --- Golden traces ---
+
+def record_trace(env, action_ids):
+    """
+    Play LittleZoo actions and record the transitions of the reference engine (PlayGroundNavigationV1).
+
+    Parameters
+    ----------
+    env: LittleZoo
+        Environment after reset.
+    action_ids: iterable of int or function
+        Ids of the actions in the action vocabulary, or a function returning the next action id from the environment
+        (called until the end of the episode).
+
+    Returns
+    -------
+    trace: dict
+        initial_state: state arrays after reset (see get_state)
+        actions: nd.array of shape (nb_steps, 3), the PlayGroundNavigationV1 action of each LittleZoo step
+        observations: nd.array of shape (nb_steps, half_dim_obs), current state half of the observation after each step
+        event_flags: nd.array of bool of shape (nb_steps, nb_objects, len(EVENTS))
+    """
+    playground = env.playground.unwrapped
+    trace = dict(initial_state=get_state(playground), actions=[], observations=[], event_flags=[])
+    actions = iter(lambda: action_ids(env), None) if callable(action_ids) else iter(action_ids)
+    done = False
+    while not done:
+        try:
+            action_id = next(actions)
+        except StopIteration:
+            break
+        action = env.get_action_from_id(action_id)
+        _, _, done, _, info = env.step(action_id)
+        flags = get_event_flags(info['events'], len(playground.objects))
+        trace['actions'].append(np.array(action, dtype=np.float64))
+        trace['observations'].append(playground.observe())
+        trace['event_flags'].append(np.stack([flags[event] for event in EVENTS], axis=-1))
+    for k in ('actions', 'observations', 'event_flags'):
+        trace[k] = np.array(trace[k])
+    return trace
+
+
+def replay_trace(trace, step, observe, xp=np):
+    """
+    Replay the actions of a trace with a step function as LittleZoo does (an action that moves the agent is followed
+    by a step that does not).
+
+    Returns
+    -------
+    observations: nd.array of shape (nb_steps, half_dim_obs)
+    event_flags: nd.array of bool of shape (nb_steps, nb_objects, len(EVENTS))
+    """
+    state = {k: xp.asarray(v) for k, v in trace['initial_state'].items()}
+    observations, event_flags = [], []
+    for action in trace['actions']:
+        state, flags = step(state, action)
+        if action[0] != 0 or action[1] != 0:
+            state, update_flags = step(state, xp.asarray([0., 0., state['gripper_state']]))
+            flags = {event: flags[event] | update_flags[event] for event in EVENTS}
+        observations.append(np.asarray(observe(state)))
+        event_flags.append(np.stack([np.asarray(flags[event]) for event in EVENTS], axis=-1))
+    return np.array(observations), np.array(event_flags)
+
+
+def check_trace(trace, params, backend='numpy', atol=0.):
+    """
+    Whether a step function of the backend reproduces a trace of the reference engine: same observations (up to atol)
+    and same events.
+    """
+    xp = get_backend(backend)
+    observations, event_flags = replay_trace(trace, make_step(params, backend), make_observe(params, backend), xp)
+    if len(trace['actions']) == 0:
+        return True
+    return bool(np.allclose(observations, trace['observations'], rtol=0, atol=atol)
+                and np.array_equal(event_flags, trace['event_flags']))
+
+
+def generate_golden_traces(nb_traces=300, seed=0, nb_objects=4):
+    """
+    Golden traces of the reference engine: episodes of the goals of a GoalSampler played by the oracle, food chain
+    and random policies of little_zoo.policies (one third each), with random initial gripper states and positions.
+    Seeds the global NumPy random generator, that the reference engine uses to sample the scenes.
+    """
+    from little_zoo.curriculum import GoalSampler
+    from little_zoo.littlezoo import LittleZoo
+    from little_zoo.policies import make_policy
+
+    np.random.seed(seed)
+    env = LittleZoo(nb_objects=nb_objects, observation_mode='vector')
+    goal_sampler = GoalSampler(env.env_params, nb_objects=nb_objects, seed=seed)
+    policies = [make_policy(name, env.env_params, seed=seed) for name in ('oracle', 'food_chain', 'random')]
+    traces = []
+    for i_trace in range(nb_traces):
+        _, env_descs = goal_sampler.sample_env_descs(1)
+        observation, info = env.reset(env_descs[0])
+        policy = policies[i_trace % len(policies)]
+
+        def act(env):
+            observation, info = env.get_vector_observation()
+            return int(policy(observation[None], [info])[0])
+        traces.append(record_trace(env, act))
+    return traces
+
+
+def save_traces(path, traces):
+    """
+    Save traces of scenes with the same number of objects (see record_trace) to a compressed .npz file, so that they
+    can be replayed without the reference engine and independently of its random sampling.
+    """
+    arrays = {'initial_state/' + k: np.stack([trace['initial_state'][k] for trace in traces])
+              for k in traces[0]['initial_state']}
+    arrays['lengths'] = np.array([len(trace['actions']) for trace in traces], dtype=np.int64)
+    for k in ('actions', 'observations', 'event_flags'):
+        arrays[k] = np.concatenate([trace[k] for trace in traces])
+    np.savez_compressed(path, **arrays)
+
+
+def load_traces(path):
+    """
+    Load the traces of a file written by save_traces, in the same order.
+    """
+    with np.load(path) as data:
+        ends = np.cumsum(data['lengths'])
+        initial_states = {k.split('/', 1)[1]: data[k] for k in data.files if k.startswith('initial_state/')}
+        steps = {k: np.split(data[k], ends[:-1]) for k in ('actions', 'observations', 'event_flags')}
+    return [dict(initial_state={k: v[i_trace] for k, v in initial_states.items()},
+                 **{k: v[i_trace] for k, v in steps.items()})
+            for i_trace in range(len(ends))]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check the functional step against golden traces of the reference engine')
+    parser.add_argument('--nb-traces', type=int, default=300)
+    parser.add_argument('--traces', help='.npz file of frozen golden traces to check instead of generating them')
+    parser.add_argument('--save-traces', help='save the generated golden traces to this .npz file')
+    parser.add_argument('--backend', default='numpy', choices=BACKENDS)
+    parser.add_argument('--batch-size', type=int, default=4096, help='number of scenes of the throughput benchmark')
+    args = parser.parse_args()
+
+    from little_zoo.playground.env_params import get_env_params
+    from little_zoo.scene_pool import sample_scene_arrays
+    from little_zoo.littlezoo import LittleZoo
+
+    params = get_env_params()
+    if args.backend == 'jax':
+        import jax
+        jax.config.update('jax_enable_x64', True)
+    traces = load_traces(args.traces) if args.traces else generate_golden_traces(args.nb_traces)
+    if args.save_traces:
+        save_traces(args.save_traces, traces)
+    nb_matching = sum(check_trace(trace, params, args.backend) for trace in traces)
+    print('{} / {} golden traces reproduced ({} transitions)'.format(nb_matching, len(traces),
+                                                                    sum(len(t['actions']) for t in traces)))
+
+    # Throughput on a batch of random scenes and random actions
+    xp = get_backend(args.backend)
+    rng = np.random.default_rng(0)
+    playground = LittleZoo().playground.unwrapped
+    states = stack_states([get_initial_state(sample_scene_arrays(['Grasp water', 'water', 'carrot', 'cow', 'lion'],
+                                                                 playground, rng)) for _ in range(args.batch_size)])
+    step = make_step(params, args.backend)
+    if args.backend == 'jax':
+        step = jax.jit(jax.vmap(step))
+    states = {k: xp.asarray(v) for k, v in states.items()}
+    actions = xp.asarray(np.concatenate([rng.uniform(-0.5, 0.5, (100, args.batch_size, 2)),
+                                         rng.integers(-1, 5, (100, args.batch_size, 1))], axis=-1))
+    states, _ = step(states, actions[0])
+    start = time.perf_counter()
+    for action in actions[1:]:
+        states, flags = step(states, action)
+    if args.backend == 'jax':
+        flags['grown'].block_until_ready()
+    print('{:.0f} transitions/s'.format(99 * args.batch_size / (time.perf_counter() - start)))
@@ -1,7 +1,9 @@
-import pygame
 import numpy as np
 
 from little_zoo.playground.color_generation import sample_color
+from little_zoo.playground.placement import sample_free_position, sample_positions
+
+INITIAL_SIZE = 0.2  # size of the objects when they are created
 
 
 class Thing:
@@ -18,10 +20,57 @@ class Thing:
         params: dict
             Dict with all environment parameters.
         """
+        self._init_object(object_descr, object_id_int, params)
+        self._sample_state()
 
-        self.object_descr = object_descr
-        self.object_id_int = object_id_int
+    @classmethod
+    def from_state(cls, object_descr, object_id_int, params, position, rgb_code, size):
+        """
+        Create an object with given physical attributes, without sampling them (e.g. to restore a pre-generated scene).
+        Does not use the global random generator.
+
+        Parameters
+        ----------
+        object_descr: dict
+            Dict that specify some attributes of the object that need to be created.
+        object_id_int: int
+            id of the object in the scene.
+        params: dict
+            Dict with all environment parameters.
+        position: nd.array of size 2
+        rgb_code: nd.array of size 3
+        size: float
+
+        Returns
+        -------
+        obj: Thing
+        """
+        obj = cls.__new__(cls)
+        obj._init_object(object_descr, object_id_int, params)
+        obj._set_state(position, rgb_code, size)
+        return obj
+
+    def _set_state(self, position, rgb_code, size):
+        self._update_position(np.array(position, dtype=np.float64))
+        self._update_color(np.array(rgb_code, dtype=np.float64))
+        self._update_size(float(size))
+        self.initial_rgb_code = self.rgb_code.copy()
+
+    def _sample_state(self):
+        # initialize values for the type, position color and size.
+        self._sample_position()
+        self._sample_color()
+        self._sample_size()
+        self.initial_rgb_code = self.rgb_code.copy()
+
+    def _init_object(self, object_descr, object_id_int, params):
+        """
+        Initialize everything but the physical attributes of the object.
+        """
         self.params = params
+        self.nb_types = params['nb_types']
+        # features of the object (see get_features), kept up to date when its physical attributes change
+        self._features = np.zeros([params['dim_obj_features']])
         self.min_max_sizes = params['min_max_sizes']
         self.admissible_attributes = params['admissible_attributes']
         self.adm_rel_attributes = [a for a in self.admissible_attributes if 'relative' in a]
@@ -31,9 +80,23 @@ class Thing:
         self.get_attributes_functions = params['extract_functions']['get_attributes_functions']
         self.img_path = params['img_path']
 
+        self.object_attributes = dict()
+        self.object_initial_attributes = dict()
+        self._reset_object(object_descr, object_id_int)
+
+    def _reset_object(self, object_descr, object_id_int):
+        """
+        Reinitialize everything but the physical attributes of the object, reusing its containers (see ObjectPool).
+        """
+        self.object_descr = object_descr
+        self.object_id_int = object_id_int
+
         # initialize object attributes.
-        self.object_attributes = self.object_descr.copy()
-        self.object_initial_attributes = dict(zip(sorted(self.object_descr.keys()), [[self.object_descr[k]] for k in sorted(self.object_descr.keys())]))
+        self.object_attributes.clear()
+        self.object_attributes.update(self.object_descr)
+        self.object_initial_attributes.clear()
+        for k in sorted(self.object_descr.keys()):
+            self.object_initial_attributes[k] = [self.object_descr[k]]
         # add relative attributes (will be filled later when all objects in the scene have been created)
         for a in self.adm_rel_attributes:
             self.object_initial_attributes[a] = []
@@ -47,13 +110,8 @@ class Thing:
         self.scene_objects = []  # list of refs to other objects from the scene
         self.grown_once = False
         self.big = True
-
-        # initialize values for the type, position color and size.
+        self.events = None  # event stream of the scene (see PlayGroundNavigationV1.events)
         self._get_type_encoding()
-        self._sample_position()
-        self._sample_color()
-        self._sample_size()
-        self.initial_rgb_code = self.rgb_code.copy()
 
         # rendering
         self.view = False
@@ -92,12 +150,12 @@ class Thing:
         Sample a size for the object
 
         """
-        size = 0.2
+        size = INITIAL_SIZE
         self._update_size(size)
 
-    def _sample_position(self):
+    def _get_position_bounds(self):
         """
-        Sample a position for the object.
+        Bounds of the initial position of the object.
         """
         lows = (-1, -1)
         highs = (1, 1)
@@ -112,20 +170,20 @@ class Thing:
                 highs = (1, 0)
             else:
                 raise NotImplementedError
-        ok = False
-        while not ok:
-            candidate_position = np.random.uniform(lows, highs)
-            ok = True
-            for obj in self.scene_objects:
-                if obj.position is not None:
-                    if np.linalg.norm(obj.position - candidate_position) < self.params['epsilon_initial_pos']:
-                        ok = False
-            if ok:
-                self._update_position(candidate_position)
+        return lows, highs
+
+    def _sample_position(self):
+        """
+        Sample a position for the object, at a distance of at least epsilon_initial_pos from the other objects.
+        """
+        lows, highs = self._get_position_bounds()
+        other_positions = [obj.position for obj in self.scene_objects if obj is not None and obj is not self and obj.position is not None]
+        self._update_position(sample_free_position(other_positions, self.params['epsilon_initial_pos'], lows, highs))
 
     # Update physical attributes of the object
     def _update_size(self, new_size):
         self.size = new_size
+        self._features[self.nb_types + 2] = new_size
         self.size_pixels = int(self.params['ratio_size'] * self.size)
         self._update_attribute('sizes')
         if self.scene_objects:
@@ -135,6 +193,7 @@ class Thing:
                 
     def _update_color(self, new_rgb):
         self.rgb_code = new_rgb
+        self._features[self.nb_types + 3:self.nb_types + 6] = new_rgb
         self._update_attribute('colors')
         self._update_attribute('shades')
         if self.scene_objects:
@@ -144,8 +203,8 @@ class Thing:
                     obj._update_attribute('relative_shades')
 
     def _update_position(self, new_position):
-        clipped_position = np.clip(new_position, -1, 1)
-        self.position = clipped_position.copy()
+        self.position = np.clip(new_position, -1, 1)
+        self._features[self.nb_types:self.nb_types + 2] = self.position
         self._update_attribute('positions')
         if self.scene_objects:
             for obj in self.scene_objects:
@@ -168,8 +227,8 @@ class Thing:
 
     # Get type one hot code
     def _get_type_encoding(self):
-        self.type = np.zeros([self.params['nb_types']])
-        self.type[self.params['attributes']['types'].index(self.object_initial_attributes['types'][0])] = 1
+        self.type = self.params['type_encodings'][self.params['type_ids'][self.object_initial_attributes['types'][0]]]
+        self._features[:self.nb_types] = self.type
 
 
     def enforce_relative_attributes(self):
@@ -246,44 +305,61 @@ class Thing:
         # if the hand is close enough
         if not self.grasped and np.linalg.norm(self.position - agent_position) < (self.size + self.agent_size) / 2 and gripper_state:
             self.grasped = True
+            self._emit('grasped')
             
         # if grasped, the object follows the hand
         if self.grasped:
-            self._update_position(agent_position.copy())
-        self.features = self.get_features()
+            self._update_position(agent_position)
         return update_object_grasped, rm_obj
 
+    def _grow(self, consumed_obj, rm_obj):
+        """
+        Grow by consuming another object (water for plants, grown plants for herbivores...).
+        Parameters
+        ----------
+        consumed_obj: Thing
+            Object that is consumed, it will be removed from the scene.
+        rm_obj: list of Thing objects
+            Objects to remove from the scene.
+        """
+        self.grown_once = True
+        # check action
+        size = min(self.size + self.obj_size_update, self.min_max_sizes[1][1] + self.obj_size_update)
+
+        self._update_size(size)
+        if self.grasped:
+            self._emit('released')
+        self.grasped = False
+        rm_obj.append(consumed_obj)
+        self._emit('grown')
+        consumed_obj._emit('consumed')
+
+    def _emit(self, event):
+        """
+        Record an event ('grasped', 'released', 'grown' or 'consumed') of the object in the event stream of the scene.
+        """
+        if self.events is not None:
+            self.events.append((event, self.object_id_int))
+
+    def write_features(self, out):
+        """
+        Write the features of the object (see get_features) into out, in place.
+        """
+        out[:] = self._features
+        out[-1] = 1 if self.grasped else -1
+
     def get_features(self):
         """
         Form features of the object.
         """
-        grasped_feature = np.array([1]) if self.grasped else np.array([-1])
-        features = np.concatenate([self.type, self.position, np.array([self.size]), self.rgb_code, grasped_feature])
+        features = self._features.copy()
+        features[-1] = 1 if self.grasped else -1
         return features
 
-    def _color_surface(self, surface, rgb):
-        arr = pygame.surfarray.pixels3d(surface)
-        arr[:, :, 0] = rgb[0]
-        arr[:, :, 1] = rgb[1]
-        arr[:, :, 2] = rgb[2]
-
     def get_pixel_coordinates(self, xpos, ypos):
         return ((xpos + 1) / 2 * (self.params['screen_size'] * 2 / 3) + 1 / 6 * self.params['screen_size']).astype(np.int64), \
                ((-ypos + 1) / 2 * (self.params['screen_size'] * 2 / 3) + 1 / 6 * self.params['screen_size']).astype(np.int64)
 
-    def update_rendering(self, viewer):
-        x, y = self.get_pixel_coordinates(self.position[0], self.position[1])
-        left = int(x - self.size_pixels // 2)
-        top = int(y - self.size_pixels // 2)
-
-        color = tuple(self.rgb_code * 255)
-        # pygame.draw.rect(self.icon, color, (0, 0, self.size_pixels - 1, self.size_pixels - 1), 6)
-        self.icon = pygame.transform.scale(self.icon, (self.size_pixels, self.size_pixels)).convert_alpha()
-        self.surface = self.icon.copy()
-        self._color_surface(self.surface, color)
-        viewer.blit(self.surface,(left,top))
-        # viewer.blit(self.icon, (left, top))
-
     def __repr__(self):
         msg = '\n\nOBJ #{}: '.format(self.object_id_int)
         for att in self.object_attributes:
@@ -314,13 +390,7 @@ class Carnivores(Animals):
             if condition:
                 # check distance
                 if np.linalg.norm(obj.position - self.position) < (self.size + obj.size) / 2 and not self.grown_once:
-                    self.grown_once = True
-                    # check action
-                    size = min(self.size + self.obj_size_update, self.min_max_sizes[1][1] + self.obj_size_update)
-                    
-                    self._update_size(size)
-                    self.grasped = False
-                    rm_obj.append(obj)
+                    self._grow(obj, rm_obj)
         
         return super().update_state(hand_position, gripper_state, objects, object_grasped, action, rm_obj, obj_to_release)
     
@@ -338,13 +408,7 @@ class Herbivores(Animals):
             if condition:
                 # check distance
                 if np.linalg.norm(obj.position - self.position) < (self.size + obj.size) / 2 and not self.grown_once:
-                    self.grown_once = True
-                    # check action
-                    size = min(self.size + self.obj_size_update, self.min_max_sizes[1][1] + self.obj_size_update)
-                    
-                    self._update_size(size)
-                    self.grasped = False
-                    rm_obj.append(obj)
+                    self._grow(obj, rm_obj)
         
         return super().update_state(hand_position, gripper_state, objects, object_grasped, action, rm_obj, obj_to_release)
 
@@ -369,13 +433,7 @@ class Plants(LivingThings):
             if obj is not None and obj.object_descr['types'] == 'water':
                 # check distance
                 if np.linalg.norm(obj.position - self.position) < (self.size + obj.size) / 2 and not self.grown_once and (not self.grasped or self in obj_to_release and len(obj_to_release) == 1) and (not obj.grasped or obj in obj_to_release and len(obj_to_release) == 1):
-                    self.grown_once = True
-                    # check action
-                    size = min(self.size + self.obj_size_update, self.min_max_sizes[1][1] + self.obj_size_update)
-                    
-                    self._update_size(size)
-                    self.grasped = False
-                    rm_obj.append(obj)
+                    self._grow(obj, rm_obj)
                     
         return super().update_state(hand_position, gripper_state, objects, object_grasped, action, rm_obj, obj_to_release)
 
@@ -604,7 +662,45 @@ obj_type_to_obj = dict(
 
 
 
-def generate_objects(objects_descr, params):
+class ObjectPool:
+    """
+    Objects of previous scenes, grouped by type, that are reinitialized in place instead of being built again at each
+    reset. Objects released to the pool must not be used anymore.
+    """
+    def __init__(self):
+        self.free_objects = dict()
+
+    def release(self, objects):
+        """
+        Give back the objects of a scene that is not used anymore.
+        Parameters
+        ----------
+        objects: list of Thing objects (or None).
+        """
+        for o in objects:
+            if o is not None:
+                self.free_objects.setdefault(o.object_descr['types'], []).append(o)
+
+    def new_object(self, object_descr, object_id_int, params):
+        """
+        Object described by object_descr, reused if possible. Its physical attributes are not initialized.
+        """
+        free_objects = self.free_objects.get(object_descr['types'])
+        if free_objects and free_objects[-1].params is params:
+            obj = free_objects.pop()
+            obj._reset_object(object_descr, object_id_int)
+            return obj
+        return _new_object(object_descr, object_id_int, params)
+
+
+def _new_object(object_descr, object_id_int, params):
+    # Object whose physical attributes are not initialized
+    obj = obj_type_to_obj[object_descr['types']].__new__(obj_type_to_obj[object_descr['types']])
+    obj._init_object(object_descr, object_id_int, params)
+    return obj
+
+
+def generate_objects(objects_descr, params, objects_pool=None):
     """
     From a list of desired objects and their attributes, generate the scene.
     Parameters
@@ -613,6 +709,8 @@ def generate_objects(objects_descr, params):
         List of dict that describes the attributes of the desired objects.
     params: dict
         Environment parameters.
+    objects_pool: ObjectPool, optional
+        Pool of objects to reuse.
 
     Returns
     -------
@@ -622,12 +720,22 @@ def generate_objects(objects_descr, params):
     for o in objects_descr:
         assert o['types'] in obj_type_to_obj.keys(), "The object '{}' is not registered in the obj_type_to_obj dict".format(o['types'])
 
-    objs = [obj_type_to_obj[o['types']](o, o_id_int, params) for o, o_id_int in zip(objects_descr, range(len(objects_descr)))]
-
-    # give each object the reference to other objects in the scene and resample their position so that they are not in contact.
+    new_object = objects_pool.new_object if objects_pool is not None else _new_object
+    objs = [new_object(o, o_id_int, params) for o, o_id_int in zip(objects_descr, range(len(objects_descr)))]
+    for o in objs:
+        o._sample_color()
+        o._sample_size()
+        o.initial_rgb_code = o.rgb_code.copy()
+
+    # place all objects at once so that they are not in contact, then give each object the reference to other objects
+    # in the scene (this computes the relative attributes once all positions are known).
+    if objs:
+        lows, highs = zip(*[o._get_position_bounds() for o in objs])
+        positions = sample_positions(len(objs), params['epsilon_initial_pos'], lows, highs)
+        for o, position in zip(objs, positions):
+            o._update_position(position)
     for o in objs:
         o.update_ref_to_scene_objects(objs)
-        o._sample_position()
 
     # Enforce that relative attributes are respected (the darkest object should be the darkest physically).
     # oks = [False for _ in range(len(objs))]
@@ -637,4 +745,32 @@ def generate_objects(objects_descr, params):
     return objs
 
 
+def build_objects(objects_descr, params, positions, rgb_codes, sizes, objects_pool=None):
+    """
+    Build a scene from given physical attributes (see Thing.from_state), e.g. to restore a pre-generated scene.
+    Parameters
+    ----------
+    objects_descr: list of dict
+        List of dict that describes the attributes of the objects (types and categories at least).
+    params: dict
+        Environment parameters.
+    positions: nd.array of shape (n_objects, 2)
+    rgb_codes: nd.array of shape (n_objects, 3)
+    sizes: nd.array of shape (n_objects,)
+    objects_pool: ObjectPool, optional
+        Pool of objects to reuse.
+
+    Returns
+    -------
+    objs: list of Thing objects
+    """
+    new_object = objects_pool.new_object if objects_pool is not None else _new_object
+    objs = [new_object(o, o_id_int, params) for o_id_int, o in enumerate(objects_descr)]
+    for o, position, rgb_code, size in zip(objs, positions, rgb_codes, sizes):
+        o._set_state(position, rgb_code, size)
+    for o in objs:
+        o.update_ref_to_scene_objects(objs)
+    return objs
+
+
 stop = 1
@@ -0,0 +1,286 @@
+import functools
+
+import numpy as np
+
+# Offsets of the neighbouring cells that can contain an object closer than min_dist (cells have a side of min_dist / sqrt(2))
+_NEIGHBOUR_OFFSETS = np.array([(i, j) for i in range(-2, 3) for j in range(-2, 3)], dtype=np.int64)
+# Below this number of objects, candidates are compared to all the objects already placed rather than through the grid
+_BRUTE_FORCE_MAX_OBJECTS = 32
+# Number of lattice points checked at once by the exhaustive search of large scenes
+_SEARCH_CHUNK_SIZE = 256
+# Density of the hexagonal packing, the densest packing of disks in the plane
+_HEXAGONAL_DENSITY = np.pi / (2 * np.sqrt(3))
+
+
+class PlacementError(ValueError):
+    """
+    Raised when objects cannot be placed at a distance of at least min_dist from each other.
+    """
+    pass
+
+
+def _choose(points, rng):
+    # np.random (legacy global generator) and np.random.Generator name their integer samplers differently
+    i = rng.randint(len(points)) if rng is np.random else rng.integers(len(points))
+    return points[i]
+
+
+@functools.lru_cache(maxsize=8)
+def _get_search_lattice(min_dist, lows=(-1, -1), highs=(1, 1)):
+    # Square lattice searched exhaustively when dart throwing fails
+    lattice = np.stack(np.meshgrid(np.arange(lows[0], highs[0] + 1e-9, min_dist / 4),
+                                   np.arange(lows[1], highs[1] + 1e-9, min_dist / 4)), -1).reshape(-1, 2)
+    lattice.flags.writeable = False
+    return lattice
+
+
+def _get_lattice(spacing, lows=(-1, -1), highs=(1, 1)):
+    # Sites of a hexagonal lattice within the box
+    xs = np.arange(lows[0], highs[0] + 1e-9, spacing)
+    ys = np.arange(lows[1], highs[1] + 1e-9, spacing * np.sqrt(3) / 2)
+    sites = np.stack(np.meshgrid(xs, ys), -1)
+    sites[1::2, :, 0] += spacing / 2
+    sites = sites.reshape(-1, 2)
+    return sites[sites[:, 0] <= highs[0] + 1e-9]
+
+
+def sample_lattice_positions(nb_objects, min_dist, lows=(-1, -1), highs=(1, 1), rng=None):
+    """
+    Place the objects of one scene on randomly chosen sites of a hexagonal lattice, jittered within the margin left by
+    the lattice spacing. Less random than dart throwing, but it does not jam and succeeds in much denser scenes.
+
+    Parameters
+    ----------
+    nb_objects: int
+        Number of objects.
+    min_dist: float
+        Minimal distance between two objects.
+    lows, highs: array-like broadcastable to (nb_objects, 2)
+        Bounds of the position of each object, within [-1, 1].
+    rng: np.random.Generator or None
+        Random generator, the global numpy generator is used if None.
+
+    Returns
+    -------
+    positions: nd.array of shape (nb_objects, 2)
+
+    Raises
+    ------
+    PlacementError
+        If the lattice has no free site left within the bounds of an object.
+    """
+    rng = np.random if rng is None else rng
+    lows = np.broadcast_to(np.asarray(lows, dtype=np.float64), (nb_objects, 2))
+    highs = np.broadcast_to(np.asarray(highs, dtype=np.float64), (nb_objects, 2))
+
+    # Largest spacing whose lattice covering the bounds has enough sites, the margin above min_dist is used for jittering
+    box_lows, box_highs = lows.min(axis=0), highs.max(axis=0)
+    area = np.prod(box_highs - box_lows)
+    spacing = max(min_dist, np.sqrt(area / (nb_objects * np.sqrt(3) / 2)))
+    sites = _get_lattice(spacing, box_lows, box_highs)
+    while len(sites) < nb_objects and spacing > min_dist:
+        spacing = max(min_dist, spacing * 0.95)
+        sites = _get_lattice(spacing, box_lows, box_highs)
+    jitter = (spacing - min_dist) / 2
+
+    positions = np.empty([nb_objects, 2])
+    available = np.ones([len(sites)], dtype=bool)
+    for i_obj in range(nb_objects):
+        candidates = np.flatnonzero(available & ((sites >= lows[i_obj]) & (sites <= highs[i_obj])).all(axis=1))
+        if len(candidates) == 0:
+            raise PlacementError('Cannot place {} objects at a distance of {} from each other'.format(nb_objects, min_dist))
+        site = _choose(candidates, rng)
+        available[site] = False
+        angle, radius = rng.uniform(0, 2 * np.pi), jitter * np.sqrt(rng.uniform(0, 1))
+        positions[i_obj] = np.clip(sites[site] + radius * np.array([np.cos(angle), np.sin(angle)]), lows[i_obj], highs[i_obj])
+    return positions
+
+
+def get_max_nb_objects(min_dist, lows=(-1, -1), highs=(1, 1)):
+    """
+    Upper bound on the number of objects that can be placed in a box with pairwise distances of at least min_dist
+    (disks of radius min_dist / 2 centered in the box, hexagonal packing).
+
+    Parameters
+    ----------
+    min_dist: float
+        Minimal distance between two objects.
+    lows, highs: array-like of size 2
+        Bounds of the box.
+
+    Returns
+    -------
+    max_nb_objects: int
+    """
+    if min_dist <= 0:
+        return np.inf
+    extent = np.asarray(highs, dtype=np.float64) - np.asarray(lows, dtype=np.float64) + min_dist
+    return int(np.prod(extent) * _HEXAGONAL_DENSITY / (np.pi * (min_dist / 2) ** 2))
+
+
+def sample_positions_batch(nb_scenes, nb_objects, min_dist, lows=(-1, -1), highs=(1, 1), nb_attempts=30, rng=None):
+    """
+    Place the objects of many scenes at once so that objects of the same scene are at a distance of at least min_dist.
+    Objects are placed one after the other (dart throwing): nb_attempts candidates are drawn for each object and the
+    first one that is free is kept, all the scenes being processed at once. In large scenes, candidates are checked
+    against a background grid whose cells contain at most one object, so that each candidate is only compared to the
+    objects of the 5x5 neighbouring cells. If all candidates are rejected, the free points of a lattice
+    (spacing min_dist / 4) are searched exhaustively: in large scenes only the points of the empty cells of the grid
+    are checked, in a random order until a free one is found. Scenes where dart throwing jams (dense scenes) are
+    placed again with sample_lattice_positions. Dart throwing is linear in the number of objects, but each
+    exhaustive search costs up to the size of the lattice (about 16 / min_dist ** 2 points), and near the capacity
+    of the arena most objects need one: 500 objects at min_dist=0.07 (half of get_max_nb_objects) take about 0.15s
+    per scene.
+
+    Parameters
+    ----------
+    nb_scenes: int
+        Number of scenes.
+    nb_objects: int
+        Number of objects per scene.
+    min_dist: float
+        Minimal distance between two objects of a scene.
+    lows, highs: array-like broadcastable to (nb_objects, 2)
+        Bounds of the position of each object, within [-1, 1].
+    nb_attempts: int
+        Number of random candidates per object before the exhaustive search.
+    rng: np.random.Generator or None
+        Random generator, the global numpy generator is used if None.
+
+    Returns
+    -------
+    positions: nd.array of shape (nb_scenes, nb_objects, 2)
+
+    Raises
+    ------
+    PlacementError
+        If the density is infeasible.
+    """
+    rng = np.random if rng is None else rng
+    lows = np.broadcast_to(np.asarray(lows, dtype=np.float64), (nb_objects, 2))
+    highs = np.broadcast_to(np.asarray(highs, dtype=np.float64), (nb_objects, 2))
+    max_nb_objects = get_max_nb_objects(min_dist, lows.min(axis=0), highs.max(axis=0))
+    if nb_objects > max_nb_objects:
+        raise PlacementError('Cannot place {} objects at a distance of {} from each other, '
+                             'at most {} objects fit in the arena'.format(nb_objects, min_dist, max_nb_objects))
+
+    candidates = rng.uniform(lows[:, None], highs[:, None], (nb_scenes, nb_objects, nb_attempts, 2))
+    if min_dist <= 0:
+        return candidates[:, :, 0].copy()
+
+    positions = np.full([nb_scenes, nb_objects + 1, 2], np.inf)  # the last position is the sentinel of empty cells
+    scene_ids = np.arange(nb_scenes)
+    use_grid = nb_objects > _BRUTE_FORCE_MAX_OBJECTS
+    if use_grid:
+        # Background grid (padded by two cells), each cell stores the index of its object or nb_objects if it is empty
+        cell_size = min_dist / np.sqrt(2)
+        nb_cells = int(np.ceil(2 / cell_size)) + 1
+        grid = np.full([nb_scenes, nb_cells + 4, nb_cells + 4], nb_objects, dtype=np.int64)
+
+    def get_cells(points):
+        return ((points + 1) / cell_size).astype(np.int64) + 2
+
+    def is_free(scenes, points, nb_placed):
+        # scenes: (n,), points: (n, k, 2)
+        if use_grid:
+            cells = get_cells(points)
+            neighbours = grid[scenes[:, None, None],
+                              cells[..., None, 0] + _NEIGHBOUR_OFFSETS[:, 0],
+                              cells[..., None, 1] + _NEIGHBOUR_OFFSETS[:, 1]]
+            neighbour_positions = positions[scenes[:, None, None], neighbours]
+        else:
+            neighbour_positions = positions[scenes, None, :nb_placed]
+        diffs = neighbour_positions - points[..., None, :]
+        return (np.einsum('...i,...i->...', diffs, diffs) >= min_dist ** 2).all(axis=-1)
+
+    jammed = np.zeros([nb_scenes], dtype=bool)
+    search_lattice = None
+    for i_obj in range(nb_objects):
+        free = is_free(scene_ids, candidates[:, i_obj], i_obj)
+        found = free.any(axis=1)
+        positions[:, i_obj] = candidates[scene_ids, i_obj, free.argmax(axis=1)]
+
+        # Exhaustive search on a lattice for the scenes where all candidates were rejected
+        for i_scene in np.flatnonzero(~found & ~jammed):
+            if search_lattice is None:
+                search_lattice = _get_search_lattice(min_dist)
+                if use_grid:
+                    search_cells = get_cells(search_lattice)
+            in_bounds = ((search_lattice >= lows[i_obj]) & (search_lattice <= highs[i_obj])).all(axis=1)
+            if not use_grid:
+                lattice = search_lattice[in_bounds]
+                free_points = lattice[is_free(np.array([i_scene]), lattice[None], i_obj)[0]]
+                if len(free_points) == 0:
+                    jammed[i_scene] = True
+                else:
+                    positions[i_scene, i_obj] = _choose(free_points, rng)
+                continue
+
+            # Points in the cell of an object are closer than min_dist to it, only the points of empty cells are
+            # checked, by chunks in a random order (the first free point is a uniform choice among the free points)
+            in_bounds &= grid[i_scene, search_cells[:, 0], search_cells[:, 1]] == nb_objects
+            lattice = search_lattice[in_bounds]
+            lattice = lattice[rng.permutation(len(lattice))]
+            jammed[i_scene] = True
+            for start in range(0, len(lattice), _SEARCH_CHUNK_SIZE):
+                points = lattice[start:start + _SEARCH_CHUNK_SIZE]
+                free = is_free(np.array([i_scene]), points[None], i_obj)[0]
+                if free.any():
+                    positions[i_scene, i_obj] = points[free.argmax()]
+                    jammed[i_scene] = False
+                    break
+
+        if use_grid:
+            cells = get_cells(positions[:, i_obj])
+            grid[scene_ids, cells[:, 0], cells[:, 1]] = i_obj
+
+    for i_scene in np.flatnonzero(jammed):
+        positions[i_scene, :-1] = sample_lattice_positions(nb_objects, min_dist, lows, highs, rng)
+    return positions[:, :-1]
+
+
+def sample_positions(nb_objects, min_dist, lows=(-1, -1), highs=(1, 1), nb_attempts=30, rng=None):
+    """
+    Place the objects of one scene so that they are at a distance of at least min_dist from each other
+    (see sample_positions_batch).
+
+    Returns
+    -------
+    positions: nd.array of shape (nb_objects, 2)
+    """
+    return sample_positions_batch(1, nb_objects, min_dist, lows, highs, nb_attempts, rng)[0]
+
+
+def sample_free_position(other_positions, min_dist, lows=(-1, -1), highs=(1, 1), nb_attempts=30, rng=None):
+    """
+    Sample a position at a distance of at least min_dist from other_positions, e.g. to move a single object of a
+    scene that is already placed.
+
+    Parameters
+    ----------
+    other_positions: nd.array of shape (n, 2)
+        Positions of the other objects of the scene.
+
+    Returns
+    -------
+    position: nd.array of size 2
+
+    Raises
+    ------
+    PlacementError
+        If no free position remains.
+    """
+    rng = np.random if rng is None else rng
+    other_positions = np.asarray(other_positions, dtype=np.float64).reshape(-1, 2)
+    candidates = rng.uniform(lows, highs, (nb_attempts, 2))
+    if len(other_positions) == 0 or min_dist <= 0:
+        return candidates[0]
+    free = (np.linalg.norm(candidates[:, None] - other_positions, axis=-1) >= min_dist).all(axis=1)
+    if free.any():
+        return candidates[free.argmax()]
+
+    lattice = _get_search_lattice(min_dist, tuple(lows), tuple(highs))
+    free_points = lattice[(np.linalg.norm(lattice[:, None] - other_positions, axis=-1) >= min_dist).all(axis=1)]
+    if len(free_points) == 0:
+        raise PlacementError('No free position left at a distance of {} from the {} other objects'.format(min_dist, len(other_positions)))
+    return _choose(free_points, rng)
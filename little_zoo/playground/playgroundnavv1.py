@@ -3,8 +3,9 @@ import gymnasium as gym
 from gymnasium import spaces
 import numpy as np
 import pygame
-from little_zoo.playground.objects import generate_objects
+from little_zoo.playground.objects import ObjectPool, generate_objects
 from little_zoo.playground.env_params import get_env_params
+from little_zoo.playground.rendering import SpriteAtlas, render_frame
 
 class PlayGroundNavigationV1(gym.Env):
     metadata = {
@@ -16,6 +17,7 @@ class PlayGroundNavigationV1(gym.Env):
         Playground Environment:
         set reward_screen to True to visualize modular reward function predictions
         set viz_data_collection to True to visualize Social Partner interactions 
+        set initial_reset to False to skip the reset at construction (reset must then be called before step)
     '''
     def __init__(self,
                  max_timesteps=50,
@@ -40,7 +42,8 @@ class PlayGroundNavigationV1(gym.Env):
                  next_to_epsilon=0.3,  # define the area to qualify an object as 'next to' another.
                  attribute_combinations=False,
                  obj_size_update=0.04,
-                 render_mode=None
+                 render_mode=None,
+                 initial_reset=True
                  ):
 
         self.params = get_env_params(max_nb_objects=max_nb_objects,
@@ -104,6 +107,8 @@ class PlayGroundNavigationV1(gym.Env):
         self.human = human
         self.render_mode = render_mode
         self.logits_concat = (0 for _ in range(self.nb_obj))
+        self.viewer = None
+        self.atlas = None
         if self.render_mode == "human":
             pygame.init()
             if self.reward_screen:
@@ -113,7 +118,22 @@ class PlayGroundNavigationV1(gym.Env):
             self.viewer_started = False
         self.background = None
 
-        self.reset()
+        # Objects of the previous scenes are reused across resets
+        self.objects_pool = ObjectPool()
+        self.all_objects = []
+
+        # Events of the last reset or step, (event, object id) with event in 'grasped', 'released', 'grown' and
+        # 'consumed', recorded by the objects in update_state. The list is cleared in place.
+        self.events = []
+
+        # Observations are written in place into these buffers (see set_observation_buffer)
+        self.observation = None
+        self.initial_observation = None
+        self.observation_buffer = None
+        self.objects = []
+
+        if initial_reset:
+            self.reset()
 
         # We set to None to rush error if reset not called
         self.observation = None
@@ -174,7 +194,13 @@ class PlayGroundNavigationV1(gym.Env):
 
         return self.reset_scene(objs)
 
-    def reset(self):
+    def reset(self, options=None):
+        """
+        Reset the environment with a random scene.
+        options: dict, optional
+            'env_desc': build the scene of a goal description instead (see reset_with_goal).
+            'scene': install a pre-built scene instead, dict of set_scene arguments (e.g. from a ScenePool).
+        """
         if self.random_nb_obj:
             self.nb_obj = np.random.randint(2, self.max_nb_objects)
             self.half_dim_obs = self.nb_obj * self.dim_obj + self.dim_body
@@ -184,9 +210,14 @@ class PlayGroundNavigationV1(gym.Env):
         self.logits_concat = (0 for _ in range(self.nb_obj))
         self.SP_feedback = False
         self.known_goals_update = False
+        if options is not None and 'scene' in options:
+            return self.set_scene(**options['scene']), {}
+        if options is not None and 'env_desc' in options:
+            return self.reset_with_goal(options['env_desc']), {}
         return self.reset_scene(), {}
 
     def reset_scene(self, objects=None):
+        self.release_objects()
 
         self.agent_pos = self.agent_initial_pos
 
@@ -196,7 +227,21 @@ class PlayGroundNavigationV1(gym.Env):
         else:
             self.gripper_state = -1
 
-        self.objects = self.sample_objects(objects)
+        return self.set_scene(self.sample_objects(objects), self.agent_pos, self.gripper_state)
+
+    def set_scene(self, objects, agent_pos, gripper_state):
+        """
+        Install a scene of already built objects (see generate_objects and build_objects).
+        """
+        self.release_objects()
+        self.agent_pos = agent_pos
+        self.gripper_state = gripper_state
+        self.objects = objects
+        self.all_objects = list(objects)  # including the objects that will be consumed
+        self.events.clear()
+        for obj in self.all_objects:
+            if obj is not None:
+                obj.events = self.events
 
         # Print objects
         self.object_grasped = False
@@ -220,12 +265,18 @@ class PlayGroundNavigationV1(gym.Env):
 
 
         # construct vector of observations
-        self.observation = np.zeros(self.dim_obs)
-        self.observation[:self.half_dim_obs] = self.observe()
-        self.initial_observation = self.observation[:self.half_dim_obs].copy()
+        if self.observation_buffer is not None:
+            self.observation = self.observation_buffer
+        elif self.observation is None or self.observation.shape != (self.dim_obs,):
+            self.observation = np.zeros(self.dim_obs)
+        self.observe(self.observation[:self.half_dim_obs])
+        self.observation[self.half_dim_obs:] = 0
+        if self.initial_observation is None or self.initial_observation.shape != (self.half_dim_obs,):
+            self.initial_observation = np.zeros(self.half_dim_obs)
+        self.initial_observation[:] = self.observation[:self.half_dim_obs]
         self.env_step = 0
         self.done = False
-        return self.observation.copy()
+        return self._get_observation()
 
     def get_pixel_coordinates(self, xpos, ypos):
         return ((xpos + 1) / 2 * (self.params['screen_size'] * 2 / 3) + 1 / 6 * self.params['screen_size']).astype(np.int64), \
@@ -247,25 +298,60 @@ class PlayGroundNavigationV1(gym.Env):
                     object[k] = np.random.choice(self.attributes[k])
             object_descr.append(object)
         object_descr = self.complete_and_check_objs(object_descr)
-        objects = generate_objects(object_descr, self.params)
+        objects = generate_objects(object_descr, self.params, self.objects_pool)
                 
         return objects
 
+    def release_objects(self):
+        """
+        Give the objects of the current scene back to the objects pool, they will be reused by the next scenes.
+        """
+        self.objects_pool.release(self.all_objects)
+        self.all_objects = []
+
     def get_obj_identifier(self, object):
         id_str = ''
         for k in sorted(list(object.keys())):
             id_str += '{}:{} '.format(k, object[k])
         return id_str
 
-    def observe(self):
-
-        obj_features = np.array([obj.get_features() if obj is not None else np.zeros(len(self.attributes['types']) + 7) for obj in self.objects]).flatten()
-        obs = np.concatenate([self.agent_pos,  # size 2
-                              np.array([self.gripper_state]),
-                              obj_features,
-                              ])
+    def observe(self, out=None):
+        """
+        Current state: agent position, gripper state and features of the objects (zeros for removed objects).
+        Written in place into out (of shape (half_dim_obs,)) if provided, without intermediate arrays.
+        """
+        if out is None:
+            out = np.zeros(self.half_dim_obs)
+        out[0] = self.agent_pos[0]
+        out[1] = self.agent_pos[1]
+        out[2] = self.gripper_state
+        for i_obj, obj in enumerate(self.objects):
+            obj_features = out[self.dim_body + self.dim_obj * i_obj:self.dim_body + self.dim_obj * (i_obj + 1)]
+            if obj is None:
+                obj_features[:] = 0
+            else:
+                obj.write_features(obj_features)
+        return out
 
-        return obs.copy()
+    def set_observation_buffer(self, buffer=None):
+        """
+        Write the observations into a caller-owned buffer of shape (dim_obs,) and any float dtype (e.g. float32),
+        for instance a row of the batch array of a vector environment. reset and step then fill the buffer in place and
+        return it without copy. With buffer=None, go back to returning copies of an internal buffer.
+        """
+        if buffer is not None and buffer.shape != (self.dim_obs,):
+            raise ValueError('The observation buffer must have shape ({},), got {}'.format(self.dim_obs, buffer.shape))
+        self.observation_buffer = buffer
+        if buffer is not None and self.observation is not None:
+            buffer[:] = self.observation
+            self.observation = buffer
+        elif buffer is None and self.observation is not None:
+            self.observation = np.array(self.observation, dtype=np.float64)
+
+    def _get_observation(self):
+        if self.observation_buffer is not None:
+            return self.observation
+        return self.observation.copy()
 
     def step(self, action):
         # actions
@@ -277,6 +363,7 @@ class PlayGroundNavigationV1(gym.Env):
         Run one timestep of the environment's dynamics.
         """
         action = np.array(action)
+        self.events.clear()
 
         if np.sum(action) != 0:
             self.first_action = True
@@ -320,27 +407,53 @@ class PlayGroundNavigationV1(gym.Env):
                 self.objects[self.objects.index(obj_to_remove)] = None
 
 
-        self.observation[:self.half_dim_obs] = self.observe()
-        self.observation[self.half_dim_obs:] = self.observation[:self.half_dim_obs] - self.initial_observation
+        self.observe(self.observation[:self.half_dim_obs])
+        np.subtract(self.observation[:self.half_dim_obs], self.initial_observation, out=self.observation[self.half_dim_obs:])
 
         self.env_step += 1
         if self.env_step == self.max_timesteps:
             self.done = True
 
-        return self.observation.copy(), 0, self.done, False, {}
+        return self._get_observation(), 0, self.done, False, {}
 
-    def render(self, goal_str="", mode='human', close=False):
+    def get_render_arrays(self):
+        """
+        Object arrays used by the offscreen renderer.
+
+        Returns
+        -------
+        positions: nd.array of shape (n_objects, 2)
+        sizes: nd.array of shape (n_objects,)
+        type_ids: nd.array of shape (n_objects,), -1 for removed objects
+        rgb_codes: nd.array of shape (n_objects, 3)
+        """
+        positions = np.zeros([len(self.objects), 2])
+        sizes = np.zeros([len(self.objects)])
+        type_ids = - np.ones([len(self.objects)], dtype=np.int64)
+        rgb_codes = np.zeros([len(self.objects), 3])
+        for i_obj, obj in enumerate(self.objects):
+            if obj is None:
+                continue
+            positions[i_obj] = obj.position
+            sizes[i_obj] = obj.size
+            type_ids[i_obj] = np.argmax(obj.type)
+            rgb_codes[i_obj] = obj.rgb_code
+        return positions, sizes, type_ids, rgb_codes
 
-        background_color = [220, 220, 220]
-        FONT = pygame.font.Font(None, 25)
-        self.viewer.fill(background_color)
-        self.shapes = {}
-        self.anchors = {}
-        self.patches = {}
+    def render(self, goal_str="", mode='human', close=False):
+        """
+        Render the scene. Returns a (screen_size, screen_size, 3) uint8 array in 'rgb_array' mode (no display needed),
+        draws it in the pygame window in 'human' mode.
+        """
+        # Sprites are loaded and rescaled once, then reused for all frames
+        if self.atlas is None:
+            self.atlas = SpriteAtlas(self.params)
+        frame = render_frame(self.atlas, *self.get_render_arrays(), self.agent_pos, self.gripper_state)
+        if self.render_mode == 'rgb_array':
+            return frame
 
-        # OBJECTS
-        for object in self.objects:
-            object.update_rendering(self.viewer)
+        self.viewer.fill([220, 220, 220])
+        self.viewer.blit(pygame.surfarray.make_surface(frame.swapaxes(0, 1)), (0, 0))
 
         # # REWARD SCREEN
         # if self.reward_screen:
@@ -372,25 +485,6 @@ class PlayGroundNavigationV1(gym.Env):
 
         #         pygame.draw.rect(self.viewer, pygame.Color('darkred'), (860 + int(x * 160), 252.5 + 200 * i_obj, 3, 25))
 
-        # GRIPPER
-        x, y = self.get_pixel_coordinates(self.agent_pos[0], self.agent_pos[1])
-        # TODO don't load in rendering this is stupidobj_supply = dict(zip(self.adm_abs_attributes, [None for _ in range(len(self.adm_abs_attributes))] ))
-        size_gripper_pixels = 55
-        size_gripper_closed_pixels = 45
-        gripper_icon = pygame.image.load(self.params['img_path'] + 'hand_open.png')
-        gripper_icon = pygame.transform.scale(gripper_icon, (size_gripper_pixels, size_gripper_pixels)).convert_alpha()
-        closed_gripper_icon = pygame.image.load(self.params['img_path'] + 'hand_closed.png')
-        closed_gripper_icon = pygame.transform.scale(closed_gripper_icon,
-                                                     (size_gripper_closed_pixels, size_gripper_pixels)).convert_alpha()
-        if self.gripper_state == 1:
-            left = int(x - size_gripper_closed_pixels // 2)
-            top = int(y - size_gripper_closed_pixels // 2)
-            self.viewer.blit(closed_gripper_icon, (left, top))
-        else:
-            left = int(x - size_gripper_pixels // 2)
-            top = int(y - size_gripper_pixels // 2)
-            self.viewer.blit(gripper_icon, (left, top))
-
         # # IMAGINATION BUBBLE
         # if self.first_action == False:
         #     txt_surface = FONT.render(goal_str, True, pygame.Color('black'))
@@ -456,11 +550,6 @@ class PlayGroundNavigationV1(gym.Env):
         pygame.display.update()
         pygame.time.wait(50)
 
-    def reset_size(self):
-        for obj in self.objects:
-            if obj is not None:
-                obj._sample_size()
-
     def set_SP_feedback(self, goal_descr):
         self.SP_feedback = True
         self.SP_goal_descr = goal_descr
@@ -0,0 +1,312 @@
+import os
+import numpy as np
+import pygame
+
+BACKGROUND_COLOR = (220, 220, 220)
+GRIPPER_SIZE_PIXELS = 55
+GRIPPER_CLOSED_SIZE_PIXELS = 45
+GRIPPER_FALLBACK_COLOR = (60, 60, 60)
+
+
+def get_pixel_coordinates(xpos, ypos, screen_size):
+    """
+    Map positions in [-1, 1] to pixel coordinates, same mapping as PlayGroundNavigationV1.get_pixel_coordinates.
+    """
+    return ((np.asarray(xpos) + 1) / 2 * (screen_size * 2 / 3) + 1 / 6 * screen_size).astype(np.int64), \
+           ((-np.asarray(ypos) + 1) / 2 * (screen_size * 2 / 3) + 1 / 6 * screen_size).astype(np.int64)
+
+
+def rgb_to_pixels(rgb_code):
+    """
+    Convert object rgb codes to 8-bit pixel colors (rgb codes are in [0, 1]).
+    """
+    return np.clip(np.asarray(rgb_code, dtype=np.float32) * 255, 0, 255)
+
+
+class SpriteAtlas:
+    def __init__(self, params):
+        """
+        Cache of the object and gripper sprites used for rendering.
+
+        Icons are loaded from disk once, and rescaled once per pixel size from the original image (so they do not
+        degrade over frames). Objects are colorized with their own rgb code, so only their alpha mask is stored and the
+        color is applied when composing the frame. When an icon is missing from `img_path`, a plain square (objects) or
+        disc (gripper) is used instead.
+
+        Parameters
+        ----------
+        params: dict
+            Environment parameters from get_env_params.
+        """
+        self.img_path = params['img_path']
+        self.types = params['attributes']['types']
+        self.ratio_size = params['ratio_size']
+        self.screen_size = params['screen_size']
+
+        self._icons = {}  # icon name -> pygame surface at original resolution (None if missing)
+        self._masks = {}  # (icon name, width, height) -> alpha mask of shape (height, width)
+        self._grippers = {}  # gripper closed -> (rgb, alpha)
+
+    def _load_icon(self, name):
+        if name not in self._icons:
+            path = os.path.join(self.img_path, name + '.png')
+            self._icons[name] = pygame.image.load(path) if os.path.isfile(path) else None
+        return self._icons[name]
+
+    def _scaled(self, name, width, height):
+        icon = self._load_icon(name)
+        if icon is None:
+            return None
+        return pygame.transform.scale(icon, (width, height))
+
+    def get_object_mask(self, type_id, size_pixels):
+        """
+        Alpha mask of the object of type `type_id` rendered with a side of `size_pixels`.
+
+        Returns
+        -------
+        mask: nd.array of shape (size_pixels, size_pixels), float32 in [0, 1]
+        """
+        name = self.types[type_id]
+        key = (name, size_pixels, size_pixels)
+        if key not in self._masks:
+            surface = self._scaled(name, size_pixels, size_pixels)
+            if surface is None:
+                mask = np.ones([size_pixels, size_pixels], dtype=np.float32)
+            else:
+                mask = pygame.surfarray.array_alpha(surface).T.astype(np.float32) / 255
+            self._masks[key] = mask
+        return self._masks[key]
+
+    def get_gripper(self, closed):
+        """
+        Colors and alpha mask of the gripper sprite.
+
+        Returns
+        -------
+        rgb: nd.array of shape (height, width, 3), float32
+        alpha: nd.array of shape (height, width), float32 in [0, 1]
+        """
+        if closed not in self._grippers:
+            width = GRIPPER_CLOSED_SIZE_PIXELS if closed else GRIPPER_SIZE_PIXELS
+            height = GRIPPER_SIZE_PIXELS
+            surface = self._scaled('hand_closed' if closed else 'hand_open', width, height)
+            if surface is None:
+                rows, cols = np.mgrid[:height, :width]
+                radius = min(width, height) / 2
+                alpha = (((rows - height / 2 + 0.5) ** 2 + (cols - width / 2 + 0.5) ** 2) < radius ** 2).astype(np.float32)
+                rgb = np.empty([height, width, 3], dtype=np.float32)
+                rgb[:] = GRIPPER_FALLBACK_COLOR
+            else:
+                alpha = pygame.surfarray.array_alpha(surface).T.astype(np.float32) / 255
+                rgb = pygame.surfarray.array3d(surface).transpose(1, 0, 2).astype(np.float32)
+            self._grippers[closed] = (rgb, alpha)
+        return self._grippers[closed]
+
+
+def _composite(canvas, height, width, lefts, tops, rgb, alpha):
+    """
+    Alpha-blend one sprite per frame onto a batch of frames (in place), clipping sprites at the frame borders.
+
+    Parameters
+    ----------
+    canvas: nd.array of shape (n_frames * height * width, 3), uint8
+        Flat view of the frames.
+    height, width: int
+        Frame size in pixels.
+    lefts, tops: nd.array of shape (n_frames,)
+        Pixel coordinates of the top left corner of the sprites.
+    rgb: nd.array of shape (n_frames, 3) or (n_frames, sprite_height, sprite_width, 3)
+        Uniform or per-pixel sprite colors.
+    alpha: nd.array of shape (n_frames, sprite_height, sprite_width)
+        Sprite alpha masks, 0 for frames where nothing should be drawn.
+    """
+    n_frames, sprite_height, sprite_width = alpha.shape
+    rows = tops[:, None] + np.arange(sprite_height)
+    cols = lefts[:, None] + np.arange(sprite_width)
+    drawn = (alpha > 0) & ((rows >= 0) & (rows < height))[:, :, None] & ((cols >= 0) & (cols < width))[:, None, :]
+    if not drawn.any():
+        return
+    i_frame, i_row, i_col = np.nonzero(drawn)
+    inds = (i_frame * height + rows[i_frame, i_row]) * width + cols[i_frame, i_col]
+    a = alpha[i_frame, i_row, i_col][:, None]
+    colors = rgb[i_frame] if rgb.ndim == 2 else rgb[i_frame, i_row, i_col]
+    pixels = np.take(canvas, inds, axis=0).astype(np.float32)
+    pixels += a * (colors - pixels)
+    canvas[inds] = np.rint(pixels).astype(np.uint8)
+
+
+def get_render_arrays_from_states(states, params):
+    """
+    Extract the renderer inputs from a batch of PlayGroundNavigationV1 observations.
+
+    Parameters
+    ----------
+    states: nd.array of shape (n_frames, dim_obs)
+        Observations, as returned by PlayGroundNavigationV1.step (only the current state half is used).
+    params: dict
+        Environment parameters.
+
+    Returns
+    -------
+    positions, sizes, type_ids, rgb_codes, agent_pos, gripper_state: nd.arrays
+        Inputs of render_batch. Removed objects (all-zero features) get a type id of -1.
+    """
+    states = np.atleast_2d(states)
+    states = states[:, :states.shape[1] // 2]
+    dim_body = params['dim_body_features']
+    dim_obj = params['dim_obj_features']
+    nb_objs = (states.shape[1] - dim_body) // dim_obj
+    objs = states[:, dim_body:dim_body + nb_objs * dim_obj].reshape(states.shape[0], nb_objs, dim_obj)
+    types = objs[:, :, params['type_inds']]
+    type_ids = np.where(types.max(axis=2) > 0, types.argmax(axis=2), -1)
+    return (objs[:, :, params['position_inds']],
+            objs[:, :, params['size_inds']],
+            type_ids,
+            objs[:, :, params['color_inds']],
+            states[:, params['agent_position_inds']],
+            states[:, 2])
+
+
+def render_batch(atlas, positions, sizes, type_ids, rgb_codes, agent_pos=None, gripper_state=None):
+    """
+    Compose frames of a batch of scenes without any display.
+
+    Sprites of all scenes are gathered from the shared atlas and blended in one vectorized pass per object slot, with
+    the same pixel mapping as PlayGroundNavigationV1.get_pixel_coordinates. Use env params built with a smaller
+    screen_size to get smaller frames.
+
+    Parameters
+    ----------
+    atlas: SpriteAtlas
+        Sprite cache.
+    positions: nd.array of shape (n_frames, n_objects, 2)
+        Object positions.
+    sizes: nd.array of shape (n_frames, n_objects)
+        Object sizes.
+    type_ids: nd.array of shape (n_frames, n_objects)
+        Index of the object types in params['attributes']['types'], -1 for empty slots (removed objects).
+    rgb_codes: nd.array of shape (n_frames, n_objects, 3)
+        Object rgb codes.
+    agent_pos: nd.array of shape (n_frames, 2), optional
+        Agent positions. The gripper is not drawn if None.
+    gripper_state: nd.array of shape (n_frames,), optional
+        1 if the gripper is closed, -1 otherwise.
+
+    Returns
+    -------
+    frames: nd.array of shape (n_frames, screen_size, screen_size, 3), uint8
+    """
+    positions = np.asarray(positions)
+    type_ids = np.asarray(type_ids)
+    n_frames, n_objects = type_ids.shape
+    screen_size = atlas.screen_size
+    background_row = np.empty([screen_size, 3], dtype=np.uint8)
+    background_row[:] = BACKGROUND_COLOR
+    frames = np.empty([n_frames, screen_size, screen_size, 3], dtype=np.uint8)
+    frames[:] = background_row  # broadcasting a whole row is much faster than a single pixel
+    canvas = frames.reshape(-1, 3)
+
+    # OBJECTS
+    xs, ys = get_pixel_coordinates(positions[..., 0], positions[..., 1], screen_size)
+    sizes_pixels = (atlas.ratio_size * np.asarray(sizes)).astype(np.int64)
+    colors = rgb_to_pixels(rgb_codes)
+    valid = type_ids >= 0
+    if valid.any():
+        # One padded mask per (type, pixel size) pair present in the batch
+        keys = np.stack([np.where(valid, type_ids, 0), np.where(valid, sizes_pixels, 0)], axis=-1).reshape(-1, 2)
+        unique_keys, key_inds = np.unique(keys, axis=0, return_inverse=True)
+        key_inds = key_inds.reshape(n_frames, n_objects)
+        side = max(int(unique_keys[:, 1].max()), 1)
+        masks = np.zeros([len(unique_keys), side, side], dtype=np.float32)
+        for i_key, (type_id, size_pixels) in enumerate(unique_keys):
+            if size_pixels > 0:
+                masks[i_key, :size_pixels, :size_pixels] = atlas.get_object_mask(type_id, size_pixels)
+        for i_obj in range(n_objects):
+            alpha = masks[key_inds[:, i_obj]] * valid[:, i_obj, None, None]
+            _composite(canvas, screen_size, screen_size,
+                       xs[:, i_obj] - sizes_pixels[:, i_obj] // 2, ys[:, i_obj] - sizes_pixels[:, i_obj] // 2,
+                       colors[:, i_obj], alpha)
+
+    # GRIPPER
+    if agent_pos is not None:
+        agent_pos = np.asarray(agent_pos)
+        closed = np.asarray(gripper_state) == 1 if gripper_state is not None else np.zeros(n_frames, dtype=bool)
+        open_rgb, open_alpha = atlas.get_gripper(False)
+        closed_rgb, closed_alpha = atlas.get_gripper(True)
+        rgb = np.zeros([2, GRIPPER_SIZE_PIXELS, GRIPPER_SIZE_PIXELS, 3], dtype=np.float32)
+        alpha = np.zeros([2, GRIPPER_SIZE_PIXELS, GRIPPER_SIZE_PIXELS], dtype=np.float32)
+        rgb[0], alpha[0] = open_rgb, open_alpha
+        rgb[1, :, :GRIPPER_CLOSED_SIZE_PIXELS], alpha[1, :, :GRIPPER_CLOSED_SIZE_PIXELS] = closed_rgb, closed_alpha
+        x, y = get_pixel_coordinates(agent_pos[:, 0], agent_pos[:, 1], screen_size)
+        half = np.where(closed, GRIPPER_CLOSED_SIZE_PIXELS // 2, GRIPPER_SIZE_PIXELS // 2)
+        _composite(canvas, screen_size, screen_size, x - half, y - half, rgb[closed.astype(np.int64)],
+                   alpha[closed.astype(np.int64)])
+
+    return frames
+
+
+def render_frame(atlas, positions, sizes, type_ids, rgb_codes, agent_pos, gripper_state):
+    """
+    Compose a frame of the scene without any display.
+
+    Parameters
+    ----------
+    atlas: SpriteAtlas
+        Sprite cache.
+    positions: nd.array of shape (n_objects, 2)
+        Object positions.
+    sizes: nd.array of shape (n_objects,)
+        Object sizes.
+    type_ids: nd.array of shape (n_objects,)
+        Index of the object types in params['attributes']['types'], -1 for empty slots (removed objects).
+    rgb_codes: nd.array of shape (n_objects, 3)
+        Object rgb codes.
+    agent_pos: nd.array of size 2
+        Agent position.
+    gripper_state: int
+        1 if the gripper is closed, -1 otherwise.
+
+    Returns
+    -------
+    frame: nd.array of shape (screen_size, screen_size, 3), uint8
+    """
+    return render_batch(atlas,
+                        np.asarray(positions)[None],
+                        np.asarray(sizes)[None],
+                        np.asarray(type_ids)[None],
+                        np.asarray(rgb_codes)[None],
+                        np.asarray(agent_pos)[None],
+                        np.array([gripper_state]))[0]
+
+
+_fonts = {}
+
+
+def draw_text(frame, text, left, top, font_size=25, color=(0, 0, 0)):
+    """
+    Draw a line of text on a frame (in place), without any display.
+
+    Parameters
+    ----------
+    frame: nd.array of shape (height, width, 3), uint8
+        Frame to draw on.
+    text: str
+        Text to draw.
+    left, top: int
+        Pixel coordinates of the top left corner of the text.
+    font_size: int
+        Size of the default pygame font.
+    color: tuple of int
+        Text color.
+    """
+    if not text:
+        return
+    if font_size not in _fonts:
+        pygame.font.init()
+        _fonts[font_size] = pygame.font.Font(None, font_size)
+    surface = _fonts[font_size].render(text, True, color)
+    alpha = pygame.surfarray.array_alpha(surface).T.astype(np.float32)[None] / 255
+    height, width = frame.shape[:2]
+    _composite(frame.reshape(-1, 3), height, width, np.array([left]), np.array([top]),
+               np.array([color], dtype=np.float32), alpha)
@@ -1,7 +1,16 @@
+import functools
+
+import numpy as np
 from little_zoo.playground.env_params import get_env_params
-from little_zoo.playground.descriptions import generate_all_descriptions
+from little_zoo.playground.descriptions import DescriptionSpace
+
 
-train_descriptions, test_descriptions, extra_descriptions = generate_all_descriptions(get_env_params())
+@functools.lru_cache(maxsize=None)
+def get_default_description_space():
+    """
+    Description space of the default environment parameters, built on first use.
+    """
+    return DescriptionSpace(get_env_params())
 
 def get_move_descriptions(get_agent_position_attributes, current_state):
     """
@@ -220,19 +229,20 @@ def sample_descriptions_from_state(state, params):
 
         # descriptions += get_extra_grow_descriptions(get_supply_contact, initial_state, current_state, params, obj_attributes, sort_attributes, combine_two,
         #                                                  check_if_relative)
+    description_space = get_default_description_space()
     train_descr = []
     test_descr = []
     extra_descr = []
     for descr in descriptions:
-        if descr in train_descriptions:
-            train_descr.append(descr)
-        elif descr in test_descriptions:
-            test_descr.append(descr)
-        elif descr in extra_descriptions:
+        if descr in description_space:
+            if description_space.is_test(description_space.index(descr)):
+                test_descr.append(descr)
+            else:
+                train_descr.append(descr)
+        elif descr.startswith('Attempted grow'):
             extra_descr.append(descr)
         else:
-            print(descr)
-            raise ValueError
+            raise ValueError('{} is not in the description space'.format(descr))
 
     return train_descr.copy(), test_descr.copy(), extra_descr.copy()
 
@@ -315,3 +325,242 @@ def get_reward_from_state(state, goal, params):
 
 
 
+def get_reward_tables(params):
+    """
+    Precompute the tables used by the batched reward function. Goal ids index the `descriptions` tuple, they are the
+    ids of DescriptionSpace (training and testing descriptions, in the generation order of generate_all_descriptions).
+
+    Parameters
+    ----------
+    params: dict
+        Environment parameters.
+
+    Returns
+    -------
+    tables: dict
+        descriptions: tuple of str
+        description_ids: dict mapping descriptions ('Grasp any cow' and the short form 'Grasp cow') to goal ids
+        goal_verbs: nd.array of int, 0 for Grasp goals, 1 for Grow goals, -1 otherwise
+        goal_attributes: nd.array of bool of shape (nb_goals, nb_attributes), attributes (in params['attribute_names'])
+            the Grasped/Grown object must have
+        goal_splits: nd.array of int, 0 for training descriptions, 1 for testing descriptions
+    """
+    description_space = DescriptionSpace(params)
+    descriptions = tuple(description_space)
+    attribute_names = params['attribute_names']
+
+    verbs = dict(Grasp=0, Grow=1)
+    goal_verbs = - np.ones([len(descriptions)], dtype=np.int64)
+    goal_attributes = np.zeros([len(descriptions), len(attribute_names)], dtype=bool)
+    description_ids = dict()
+    for i_descr, descr in enumerate(descriptions):
+        description_ids[descr] = i_descr
+        words = descr.split(' ')
+        attributes = [w for w in words[1:] if w not in ('any', 'thing', 'and')]
+        if words[0] in verbs and all(a in attribute_names for a in attributes):
+            goal_verbs[i_descr] = verbs[words[0]]
+            goal_attributes[i_descr, [attribute_names.index(a) for a in attributes]] = True
+            if len(words) == 3 and words[1] == 'any':
+                description_ids[words[0] + ' ' + words[2]] = i_descr
+
+    return dict(descriptions=descriptions,
+                description_ids=description_ids,
+                goal_verbs=goal_verbs,
+                goal_attributes=goal_attributes,
+                goal_splits=np.array([description_space.is_test(i) for i in range(len(descriptions))], dtype=np.int64))
+
+def get_reward_from_states(states, goals, params, tables=None):
+    """
+    Batched reward function. Whether each state satisfies its goal, computed with array operations over all states.
+
+    Parameters
+    ----------
+    states: nd.array of shape (batch_size, dim_obs)
+        Environment states (PlayGroundNavigationV1 observations).
+    goals: str or nd.array of int of shape (batch_size,)
+        Description of the goal shared by all states ('Grow lion' or 'Grow any lion'), or goal ids (see
+        get_reward_tables). Only Grasp and Grow goals can be satisfied.
+    params: dict
+        Environment parameters.
+    tables: dict
+        Output of get_reward_tables(params), computed if not provided (pass it to avoid recomputing it at every call).
+
+    Returns
+    -------
+    rewards: nd.array of bool of shape (batch_size,)
+    """
+    if tables is None:
+        tables = get_reward_tables(params)
+    get_attributes_from_states = params['extract_functions']['get_attributes_from_states']
+    states = np.atleast_2d(states)
+    batch_size = states.shape[0]
+
+    if isinstance(goals, str):
+        goal_ids = np.full([batch_size], tables['description_ids'].get(goals, -1), dtype=np.int64)
+    else:
+        goal_ids = np.broadcast_to(np.asarray(goals, dtype=np.int64), [batch_size])
+    goal_verbs = np.where(goal_ids >= 0, tables['goal_verbs'][goal_ids], -1)
+    goal_attributes = tables['goal_attributes'][goal_ids]
+
+    # (batch_size, nb_objects, dim_obj_features) views of the current and initial states
+    half_dim = states.shape[1] // 2
+    dim_body = params['dim_body_features']
+    dim_obj = params['dim_obj_features']
+    nb_objs = (half_dim - dim_body) // dim_obj
+    current_state = states[:, :half_dim]
+    initial_state = current_state - states[:, half_dim:]
+    current_objs = current_state[:, dim_body:].reshape(batch_size, nb_objs, dim_obj)
+    initial_objs = initial_state[:, dim_body:].reshape(batch_size, nb_objs, dim_obj)
+
+    # Whether each object has all the goal attributes (attributes are extracted from the initial state)
+    obj_attributes = get_attributes_from_states(initial_state)
+    nb_matching = np.einsum('boa,ba->bo', obj_attributes.astype(np.int64), goal_attributes.astype(np.int64))
+    has_attributes = nb_matching == goal_attributes.sum(axis=1, keepdims=True)
+
+    size_ind = int(params['size_inds'])
+    grasped_ind = int(params['grasped_inds'][0])
+    grasped = current_objs[:, :, grasped_ind] == 1
+    grown = current_objs[:, :, size_ind] > initial_objs[:, :, size_ind] + 0.001
+    interacted = np.where((goal_verbs == 0)[:, None], grasped, (goal_verbs == 1)[:, None] & grown)
+
+    return (interacted & has_attributes).any(axis=1)
+
+# Events of PlayGroundNavigationV1.events that achieve the goals of each verb (tables['goal_verbs'])
+EVENT_VERBS = dict(grasped=0, grown=1)
+
+def get_object_goals(initial_state, params, tables=None):
+    """
+    Goals that each object of a scene would achieve if it was grasped or grown (it has all the goal attributes).
+    Computed once per episode, rewards are then given by the events of each step (see get_reward_from_events).
+
+    Parameters
+    ----------
+    initial_state: nd.array of shape (dim_obs // 2,)
+        Initial state of the scene (first half of the PlayGroundNavigationV1 observation at reset).
+    params: dict
+        Environment parameters.
+    tables: dict
+        Output of get_reward_tables(params), computed if not provided.
+
+    Returns
+    -------
+    object_goals: nd.array of bool of shape (nb_objects, nb_goals)
+    """
+    if tables is None:
+        tables = get_reward_tables(params)
+    obj_attributes = params['extract_functions']['get_attributes_from_states'](np.asarray(initial_state)[None])[0]
+    goal_attributes = tables['goal_attributes']
+    nb_matching = obj_attributes.astype(np.int64) @ goal_attributes.T.astype(np.int64)
+    return nb_matching == goal_attributes.sum(axis=1)
+
+def get_reward_from_events(events, goal_id, object_goals, tables):
+    """
+    Whether the events of a step achieve a goal.
+
+    Parameters
+    ----------
+    events: list of (str, int)
+        (event, object id) pairs, see PlayGroundNavigationV1.events.
+    goal_id: int
+        Id of the goal (see get_reward_tables).
+    object_goals: nd.array of bool of shape (nb_objects, nb_goals)
+        Output of get_object_goals for the scene.
+    tables: dict
+        Output of get_reward_tables(params).
+
+    Returns
+    -------
+    reward: bool
+    """
+    goal_verb = tables['goal_verbs'][goal_id]
+    for event, obj_id in events:
+        if EVENT_VERBS.get(event, -1) == goal_verb and object_goals[obj_id, goal_id]:
+            return True
+    return False
+
+def get_achieved_goals_from_events(events, object_goals, tables):
+    """
+    All the goals achieved by the events of a step, e.g. to relabel it.
+
+    Parameters
+    ----------
+    events: list of (str, int)
+        (event, object id) pairs, see PlayGroundNavigationV1.events.
+    object_goals: nd.array of bool of shape (nb_objects, nb_goals)
+        Output of get_object_goals for the scene.
+    tables: dict
+        Output of get_reward_tables(params).
+
+    Returns
+    -------
+    goal_ids: nd.array of int, sorted
+    """
+    achieved = np.zeros(object_goals.shape[1], dtype=bool)
+    for event, obj_id in events:
+        if event in EVENT_VERBS:
+            achieved |= object_goals[obj_id] & (tables['goal_verbs'] == EVENT_VERBS[event])
+    return np.flatnonzero(achieved)
+
+def get_achieved_goals_from_trajectories(trajectories, params, tables=None, lengths=None):
+    """
+    Hindsight relabeling over whole trajectories. Finds the first timestep at which each goal is achieved.
+    Object attributes are extracted once per trajectory (from its initial state) and matched against all goals once,
+    each timestep then only contributes its grasped and grown masks.
+
+    Parameters
+    ----------
+    trajectories: nd.array of shape (T, dim_obs) or (nb_trajectories, T, dim_obs)
+        Environment states (PlayGroundNavigationV1 observations) of one trajectory or of a batch of trajectories.
+    params: dict
+        Environment parameters.
+    tables: dict
+        Output of get_reward_tables(params), computed if not provided.
+    lengths: nd.array of int of shape (nb_trajectories,)
+        Length of each trajectory, when shorter trajectories are padded. All timesteps are used if not provided.
+
+    Returns
+    -------
+    achieved: nd.array of int of shape (nb_achieved, 3) or (nb_achieved, 4)
+        One (timestep, goal_id, split) row per achieved goal (split is 0 for training goals, 1 for testing goals),
+        prefixed by the trajectory index for a batch of trajectories. Rows are sorted by trajectory and timestep.
+    """
+    if tables is None:
+        tables = get_reward_tables(params)
+    get_attributes_from_states = params['extract_functions']['get_attributes_from_states']
+    single = trajectories.ndim == 2
+    if single:
+        trajectories = trajectories[None]
+    nb_trajectories, horizon, dim_obs = trajectories.shape
+
+    half_dim = dim_obs // 2
+    dim_body = params['dim_body_features']
+    dim_obj = params['dim_obj_features']
+    nb_objs = (half_dim - dim_body) // dim_obj
+    initial_state = trajectories[:, 0, :half_dim] - trajectories[:, 0, half_dim:]
+    initial_objs = initial_state[:, dim_body:].reshape(nb_trajectories, 1, nb_objs, dim_obj)
+    current_objs = trajectories[:, :, dim_body:half_dim].reshape(nb_trajectories, horizon, nb_objs, dim_obj)
+
+    # Goals that each object would satisfy if it was grasped/grown, shape (nb_trajectories, nb_objs, nb_goals)
+    goal_attributes = tables['goal_attributes'].astype(np.float32)
+    nb_matching = get_attributes_from_states(initial_state).astype(np.float32) @ goal_attributes.T
+    has_attributes = nb_matching == goal_attributes.sum(axis=1)
+    grasp_goals = has_attributes & (tables['goal_verbs'] == 0)
+    grow_goals = has_attributes & (tables['goal_verbs'] == 1)
+
+    size_ind = int(params['size_inds'])
+    grasped_ind = int(params['grasped_inds'][0])
+    grasped = current_objs[:, :, :, grasped_ind] == 1
+    grown = current_objs[:, :, :, size_ind] > initial_objs[:, :, :, size_ind] + 0.001
+    if lengths is not None:
+        valid = np.arange(horizon) < np.asarray(lengths)[:, None]
+        grasped &= valid[:, :, None]
+        grown &= valid[:, :, None]
+
+    # (nb_trajectories, T, nb_goals)
+    achieved = (grasped.astype(np.float32) @ grasp_goals.astype(np.float32)
+                + grown.astype(np.float32) @ grow_goals.astype(np.float32)) > 0
+    i_traj, goal_ids = np.nonzero(achieved.any(axis=1))
+    timesteps = achieved.argmax(axis=1)[i_traj, goal_ids]
+    order = np.lexsort((goal_ids, timesteps, i_traj))
+    out = np.stack([i_traj, timesteps, goal_ids, tables['goal_splits'][goal_ids]], axis=1)[order].astype(np.int64)
+    return out[:, 1:] if single else out
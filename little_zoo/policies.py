@@ -0,0 +1,206 @@
+import numpy as np
+
+from little_zoo.metrics import GOAL_FAMILIES, get_goal_families
+from little_zoo.playground.reward_function import get_reward_tables
+
+POLICIES = ('random', 'food_chain', 'oracle')
+# Level of the objects in the food chain: water feeds plants, grown plants feed herbivores, grown herbivores feed
+# carnivores
+FOOD_CHAIN = ('supply', 'plant', 'herbivore', 'carnivore')
+
+
+class RandomPolicy:
+    '''
+        Uniform random policy over the possible actions, for any observation mode.
+        Returns action ids when action masks are available (info_mode 'mask'), action strings otherwise.
+
+        Usage (all policies are called the same way):
+            policy = make_policy('random', env.env_params, seed=0)
+            actions = policy(observations, infos)
+            observations, rewards, dones, truncateds, infos = envs.step(indices, actions)
+    '''
+
+    def __init__(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(self, observations=None, infos=None, action_masks=None):
+        '''
+            observations: unused
+            infos: list of info dicts of a batch of environments
+            action_masks: bool array of shape (batch_size, nb_actions), taken from the infos if not provided
+        '''
+        if action_masks is None and 'action_mask' in infos[0]:
+            action_masks = np.stack([info['action_mask'] for info in infos])
+        if action_masks is not None:
+            scores = self.rng.random(action_masks.shape)
+            scores[~action_masks] = -1
+            return scores.argmax(axis=1)
+        return [info['possible_actions'][self.rng.integers(len(info['possible_actions']))] for info in infos]
+
+
+class _ScenePolicy:
+    '''
+        Scripted policies reading the scene from a batch of vector observations (LittleZoo observation_mode 'vector').
+        Actions are ids of the action vocabulary: 0 is Grasp, 1 + i goes to object i and 1 + nb_objects + i releases
+        object i. LittleZoo.get_action_str converts them to strings.
+    '''
+
+    def __init__(self, env_params, tables=None):
+        '''
+            env_params: environment parameters (LittleZoo.env_params)
+            tables: output of get_reward_tables(env_params), computed if not provided
+        '''
+        self.env_params = env_params
+        self.tables = tables if tables is not None else get_reward_tables(env_params)
+        self.goal_families = get_goal_families(env_params, self.tables)
+        types = env_params['attributes']['types']
+        self.type_levels = np.full([len(types)], -1, dtype=np.int64)
+        for level, category in enumerate(FOOD_CHAIN):
+            self.type_levels[[types.index(t) for t in env_params['categories'][category]]] = level
+
+    def parse(self, observations, goal_ids):
+        '''
+            Arrays describing the scenes, of shape (batch_size, nb_objects) unless stated otherwise
+        '''
+        params = self.env_params
+        observations = np.atleast_2d(observations).astype(np.float64)
+        batch_size = observations.shape[0]
+        half_dim = (observations.shape[1] - 2) // 2  # the last 2 features are the inventory slots
+        dim_body, dim_obj, nb_types = params['dim_body_features'], params['dim_obj_features'], params['nb_types']
+        nb_objects = (half_dim - dim_body) // dim_obj
+        current_state = observations[:, :half_dim]
+        initial_state = current_state - observations[:, half_dim:2 * half_dim]
+        objects = current_state[:, dim_body:].reshape(batch_size, nb_objects, dim_obj)
+        initial_objects = initial_state[:, dim_body:].reshape(batch_size, nb_objects, dim_obj)
+
+        present = objects[:, :, :nb_types].max(axis=2) > 0.5
+        positions = objects[:, :, nb_types:nb_types + 2]
+        sizes = objects[:, :, int(params['size_inds'])]
+        grasped = present & (objects[:, :, int(params['grasped_inds'][0])] > 0)
+        distances = np.linalg.norm(positions - current_state[:, None, :2], axis=2)
+
+        goal_ids = np.asarray(goal_ids, dtype=np.int64)
+        goal_attributes = self.tables['goal_attributes'][goal_ids]
+        obj_attributes = params['extract_functions']['get_attributes_from_states'](initial_state)
+        nb_matching = np.einsum('boa,ba->bo', obj_attributes.astype(np.int64), goal_attributes.astype(np.int64))
+
+        return dict(nb_objects=nb_objects,
+                    present=present,
+                    grasped=grasped,
+                    grown=present & (sizes > initial_objects[:, :, int(params['size_inds'])] + 0.001),
+                    near=present & ~grasped & (distances < (sizes + params['agent_size']) / 2),
+                    distances=distances,
+                    levels=self.type_levels[initial_objects[:, :, :nb_types].argmax(axis=2)],
+                    goal_objects=(nb_matching == goal_attributes.sum(axis=1, keepdims=True)) & (goal_ids >= 0)[:, None],
+                    goal_families=np.where(goal_ids >= 0, self.goal_families[np.maximum(goal_ids, 0)], GOAL_FAMILIES.index('Other')))
+
+    def _get_or_go_to(self, scene, objects):
+        # Grasp the objects if the agent is on them, go to them otherwise
+        near = np.take_along_axis(scene['near'], objects[:, None], axis=1)[:, 0]
+        return np.where(near, 0, 1 + objects)
+
+    def _deliver(self, scene, food, targets):
+        # Bring the food to the targets: grasp it, go to the target and release it there
+        food_grasped = np.take_along_axis(scene['grasped'], food[:, None], axis=1)[:, 0]
+        target_near = np.take_along_axis(scene['near'], targets[:, None], axis=1)[:, 0]
+        deliver = np.where(target_near, 1 + scene['nb_objects'] + food, 1 + targets)
+        return np.where(food_grasped, deliver, self._get_or_go_to(scene, food))
+
+
+class OraclePolicy(_ScenePolicy):
+    '''
+        Optimal scripted policy: achieves each Grasp or Grow goal in the minimal number of steps
+        (at most 2 for Grasp goals, 4, 7 and 10 for Grow plant, herbivore and carnivore goals). Objects already held are
+        preferred so that the policy can take over an episode in progress.
+    '''
+
+    def __call__(self, observations, infos=None, goal_ids=None):
+        '''
+            observations: vector observations of shape (batch_size, dim_obs)
+            infos: list of info dicts of the environments, used for the goal ids if goal_ids is None
+            goal_ids: goal ids of shape (batch_size,)
+            Returns the action ids, of shape (batch_size,)
+        '''
+        goal_ids = [info['goal_id'] for info in infos] if goal_ids is None else goal_ids
+        scene = self.parse(observations, goal_ids)
+        present, grasped, grown, levels = scene['present'], scene['grasped'], scene['grown'], scene['levels']
+        families = scene['goal_families']
+        actions = np.zeros([len(families)], dtype=np.int64)
+
+        # Grasp goals: get one of the goal objects
+        is_grasp = families == GOAL_FAMILIES.index('Grasp')
+        candidates = scene['goal_objects'] & present & ~grasped
+        targets = candidates.argmax(axis=1)
+        actions = np.where(is_grasp & candidates.any(axis=1), self._get_or_go_to(scene, targets), actions)
+
+        # Grow goals: walk down the food chain from the goal object until food is available, then deliver it
+        target_levels = np.where((families >= 1) & (families <= 3), families, -1)
+        candidates = scene['goal_objects'] & present & ~grown & (levels == target_levels[:, None])
+        targets = candidates.argmax(axis=1)
+        unresolved = (target_levels > 0) & candidates.any(axis=1)
+        food = np.zeros_like(targets)
+        slots = np.arange(scene['nb_objects'])
+        for _ in range(len(FOOD_CHAIN) - 1):
+            food_levels = target_levels - 1
+            food_candidates = present & (levels == food_levels[:, None]) & (grown | (food_levels[:, None] == 0))
+            food_candidates &= slots != targets[:, None]
+            has_food = unresolved & food_candidates.any(axis=1)
+            food = np.where(has_food, (food_candidates + 2 * (food_candidates & grasped)).argmax(axis=1), food)
+            actions = np.where(has_food, self._deliver(scene, food, targets), actions)
+            unresolved &= ~has_food
+
+            # No food: grow an object of the level below first
+            new_targets = present & ~grown & (levels == food_levels[:, None]) & (food_levels[:, None] > 0)
+            unresolved &= new_targets.any(axis=1)
+            targets = np.where(unresolved, new_targets.argmax(axis=1), targets)
+            target_levels = np.where(unresolved, food_levels, target_levels)
+        return actions
+
+
+class FoodChainPolicy(_ScenePolicy):
+    '''
+        Greedy goal-agnostic policy: feeds the food chain as far as possible. It delivers the held food to the closest
+        object that can eat it, or picks up the most advanced food (grown herbivore, grown plant, then water) that has a
+        consumer in the scene.
+    '''
+
+    def __call__(self, observations, infos=None, goal_ids=None):
+        '''
+            observations: vector observations of shape (batch_size, dim_obs)
+            infos, goal_ids: unused, the policy ignores the goals
+            Returns the action ids, of shape (batch_size,)
+        '''
+        observations = np.atleast_2d(observations)
+        scene = self.parse(observations, np.full([observations.shape[0]], -1))
+        present, grasped, grown, levels = scene['present'], scene['grasped'], scene['grown'], scene['levels']
+        distances = scene['distances']
+        actions = np.zeros([observations.shape[0]], dtype=np.int64)
+        done = np.zeros([observations.shape[0]], dtype=bool)
+
+        is_food = present & (grown | (levels == 0)) & (levels >= 0) & (levels < len(FOOD_CHAIN) - 1)
+        for food_level in range(len(FOOD_CHAIN) - 2, -1, -1):
+            consumers = present & ~grasped & ~grown & (levels == food_level + 1)
+            food = is_food & (levels == food_level)
+            has_consumer = consumers.any(axis=1)
+            # Closest consumer, and closest food (held food first)
+            targets = np.where(consumers, distances, np.inf).argmin(axis=1)
+            food_slots = np.where(food, distances - 10 * grasped, np.inf).argmin(axis=1)
+            feed = ~done & has_consumer & food.any(axis=1)
+            held_first = (food & grasped).any(axis=1) | ~(is_food & grasped).any(axis=1)
+            feed &= held_first
+            actions = np.where(feed, self._deliver(scene, food_slots, targets), actions)
+            done |= feed
+        return actions
+
+
+def make_policy(name, env_params, seed=None):
+    '''
+        Build a policy from its name (in POLICIES), food_chain and oracle need vector observations
+    '''
+    if name == 'random':
+        return RandomPolicy(seed)
+    elif name == 'food_chain':
+        return FoodChainPolicy(env_params)
+    elif name == 'oracle':
+        return OraclePolicy(env_params)
+    raise ValueError('Unknown policy {}, should be in {}'.format(name, POLICIES))
@@ -0,0 +1,272 @@
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import threading
+import zlib
+
+import gymnasium as gym
+import numpy as np
+
+from little_zoo.playground.rendering import SpriteAtlas, render_frame, draw_text
+
+
+# --- Encoders ---
+
+class FFmpegEncoder:
+    '''
+        Stream raw RGB frames into an ffmpeg subprocess (H.264 mp4)
+    '''
+    extension = '.mp4'
+
+    def __init__(self, path, fps):
+        self.path = path
+        self.fps = fps
+        self.process = None
+
+    def write(self, frame):
+        if self.process is None:
+            height, width = frame.shape[:2]
+            self.process = subprocess.Popen(['ffmpeg', '-y', '-loglevel', 'error',
+                                             '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+                                             '-s', '{}x{}'.format(width, height), '-r', str(self.fps), '-i', '-',
+                                             '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+                                             '-vcodec', 'libx264', '-pix_fmt', 'yuv420p', self.path],
+                                            stdin=subprocess.PIPE)
+        self.process.stdin.write(np.ascontiguousarray(frame).tobytes())
+
+    def close(self):
+        if self.process is not None:
+            process, self.process = self.process, None
+            process.stdin.close()
+            if process.wait() != 0:
+                raise RuntimeError('ffmpeg failed to encode ' + self.path)
+
+    def abort(self):
+        '''
+            Stop ffmpeg after a failure, without finishing the video
+        '''
+        if self.process is not None:
+            process, self.process = self.process, None
+            process.kill()
+            process.stdin.close()
+            process.wait()
+
+
+class APNGEncoder:
+    '''
+        Stream frames into an animated PNG, dependency-free fallback when ffmpeg is not available.
+        Each frame is compressed and written as soon as it is received, the frame count is patched on close.
+    '''
+    extension = '.png'
+
+    def __init__(self, path, fps):
+        self.path = path
+        self.fps = fps
+        self.file = None
+        self.nb_frames = 0
+        self.sequence = 0
+        self.actl_offset = None
+
+    def _chunk(self, chunk_type, data):
+        self.file.write(struct.pack('>I', len(data)) + chunk_type + data
+                        + struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff))
+
+    def write(self, frame):
+        height, width = frame.shape[:2]
+        if self.file is None:
+            self.file = open(self.path, 'wb')
+            self.file.write(b'\x89PNG\r\n\x1a\n')
+            self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            self.actl_offset = self.file.tell()
+            self._chunk(b'acTL', struct.pack('>II', 0, 0))  # number of frames patched on close
+            self.size = (width, height)
+        assert (width, height) == self.size, 'All the frames of a video must have the same size'
+
+        # fcTL: sequence, size, offset, delay (in ms, so that any fps fits the 16-bit fraction), dispose and blend ops
+        self._chunk(b'fcTL', struct.pack('>IIIIIHHBB', self.sequence, width, height, 0, 0,
+                                         round(1000 / self.fps), 1000, 0, 0))
+        self.sequence += 1
+        # Each scanline is prefixed with the filter type (0: none)
+        scanlines = np.zeros([height, width * 3 + 1], dtype=np.uint8)
+        scanlines[:, 1:] = frame.reshape(height, -1)
+        data = zlib.compress(scanlines.tobytes(), 6)
+        if self.nb_frames == 0:
+            self._chunk(b'IDAT', data)
+        else:
+            self._chunk(b'fdAT', struct.pack('>I', self.sequence) + data)
+            self.sequence += 1
+        self.nb_frames += 1
+
+    def close(self):
+        if self.file is not None:
+            try:
+                self._chunk(b'IEND', b'')
+                self.file.seek(self.actl_offset)
+                self._chunk(b'acTL', struct.pack('>II', self.nb_frames, 0))
+            finally:
+                self.abort()
+
+    def abort(self):
+        '''
+            Close the file after a failure, without finishing the video
+        '''
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def make_encoder(path, fps, encoder='auto'):
+    '''
+        Return an encoder writing to path (without extension)
+        encoder: 'ffmpeg', 'apng' or 'auto' (ffmpeg if it is installed, apng otherwise)
+    '''
+    if encoder == 'auto':
+        encoder = 'ffmpeg' if shutil.which('ffmpeg') is not None else 'apng'
+    if encoder == 'ffmpeg':
+        return FFmpegEncoder(path + FFmpegEncoder.extension, fps)
+    elif encoder == 'apng':
+        return APNGEncoder(path + APNGEncoder.extension, fps)
+    else:
+        raise ValueError('Unknown encoder ' + encoder)
+
+
+# --- Recorder ---
+
+class EpisodeRecorder(gym.Wrapper):
+    '''
+        Record videos of LittleZoo episodes.
+        The scene is snapshotted (object arrays only) at each step, frames are rendered and encoded in a background
+        thread as they are produced. Memory is bounded by queue_size: step blocks if the encoder falls behind.
+    '''
+
+    def __init__(self,
+                 env,
+                 video_folder,
+                 record_every=1,
+                 fps=2,
+                 queue_size=8,
+                 encoder='auto',
+                 name_prefix='episode',
+                ):
+        '''
+            env: LittleZoo environment
+            video_folder: where the videos are written
+            record_every: only record every k-th episode
+            fps: frames (steps) per second of the videos
+            queue_size: maximum number of frames waiting to be rendered
+            encoder: 'ffmpeg', 'apng' or 'auto'
+        '''
+        super().__init__(env)
+        self.video_folder = video_folder
+        os.makedirs(self.video_folder, exist_ok=True)
+        self.record_every = record_every
+        self.fps = fps
+        self.encoder = encoder
+        self.name_prefix = name_prefix
+
+        self.episode_id = -1
+        self.recording = False
+        self.video_paths = []
+        self._error = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def reset(self, env_desc=None, **kwargs):
+        self._end_video()
+        observation, info = self.env.reset(env_desc, **kwargs)
+        self.episode_id += 1
+        self.recording = self.episode_id % self.record_every == 0
+        if self.recording:
+            self._put(('open', os.path.join(self.video_folder, '{}-{}'.format(self.name_prefix, self.episode_id))))
+            self._capture('')
+        return observation, info
+
+    def step(self, action_str):
+        action = action_str
+        if isinstance(action, (int, np.integer)):
+            action_str = self.env.unwrapped.action_vocabulary[action]
+        observation, reward, done, truncated, info = self.env.step(action)
+        if self.recording:
+            self._capture(action_str)
+            if done:
+                self._end_video()
+        return observation, reward, done, truncated, info
+
+    def close(self):
+        self._end_video()
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_error()
+        return super().close()
+
+    def flush(self):
+        '''
+            Wait until all the captured frames have been encoded
+        '''
+        self._queue.join()
+        self._raise_error()
+
+    # --- Utils ---
+
+    def _capture(self, action_str):
+        '''
+            Snapshot what is needed to render the current scene
+        '''
+        playground = self.env.unwrapped.playground.unwrapped
+        self._put(('frame', (playground.get_render_arrays(),
+                             np.array(playground.agent_pos, dtype=np.float64),
+                             playground.gripper_state,
+                             self.env.unwrapped.env_desc[0],
+                             action_str)))
+
+    def _end_video(self):
+        if self.recording:
+            self._put(('close', None))
+            self.recording = False
+
+    def _put(self, item):
+        self._raise_error()
+        self._queue.put(item)
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError('Episode recording failed') from error
+
+    def _run(self):
+        atlas = SpriteAtlas(self.env.unwrapped.playground.unwrapped.params)
+        encoder = None
+        try:
+            while True:
+                item = self._queue.get()
+                try:
+                    if item is None:
+                        return
+                    command, content = item
+                    if command == 'open':
+                        encoder = make_encoder(content, self.fps, self.encoder)
+                        self.video_paths.append(encoder.path)
+                    elif command == 'frame' and encoder is not None:
+                        (render_arrays, agent_pos, gripper_state, goal, action_str) = content
+                        frame = render_frame(atlas, *render_arrays, agent_pos, gripper_state)
+                        draw_text(frame, 'Goal: ' + goal, 10, 10)
+                        draw_text(frame, 'Action: ' + action_str if action_str else '', 10, 35)
+                        encoder.write(frame)
+                    elif command == 'close' and encoder is not None:
+                        encoder, closing = None, encoder
+                        closing.close()
+                except Exception as e:
+                    self._error = e
+                    if encoder is not None:
+                        encoder, failed = None, encoder
+                        failed.abort()
+                finally:
+                    self._queue.task_done()
+        finally:
+            # The video in progress when the thread stops (e.g. the recorder is closed in the middle of an episode)
+            if encoder is not None:
+                encoder.abort()
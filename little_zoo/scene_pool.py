@@ -0,0 +1,219 @@
+import os
+import queue
+import threading
+
+import numpy as np
+
+from little_zoo.playground.objects import INITIAL_SIZE, ObjectPool, build_objects
+from little_zoo.playground.placement import sample_positions
+
+
+def sample_scene_arrays(env_desc, playground, rng):
+    '''
+        Sample the physical state of the scene of an env_desc (same distribution as PlayGroundNavigationV1.reset_with_goal)
+        using rng only.
+        Returns a dict of arrays: type_ids (n_objects,), positions (n_objects, 2), rgb_codes (n_objects, 3),
+        sizes (n_objects,), agent_pos (2,) and gripper_state ().
+    '''
+    params = playground.params
+    types = params['attributes']['types']
+    categories = params['categories']
+
+    objects = list(env_desc[1:])
+    while len(objects) < playground.nb_obj:
+        category = rng.choice(list(categories.keys()))
+        objects.append(rng.choice(categories[category]))
+    nb_objects = len(objects)
+
+    agent_pos = np.array(playground.agent_initial_pos, dtype=np.float64)
+    gripper_state = -1
+    if playground.random_init:
+        agent_pos += rng.uniform(-playground.agent_initial_pos_range, playground.agent_initial_pos_range, 2)
+        gripper_state = rng.choice([-1, 1])
+
+    return dict(type_ids=np.array([types.index(o) for o in objects], dtype=np.int16),
+                positions=sample_positions(nb_objects, params['epsilon_initial_pos'], rng=rng),
+                rgb_codes=rng.uniform(-1, 1, (nb_objects, 3)),
+                sizes=np.full([nb_objects], INITIAL_SIZE),
+                agent_pos=agent_pos,
+                gripper_state=np.array(gripper_state, dtype=np.int8))
+
+
+def build_scene(goal, arrays, playground, objects_pool=None):
+    '''
+        Build the objects of a scene sampled by sample_scene_arrays, returns the scene argument of LittleZoo.reset
+        objects_pool: pool of objects to reuse (e.g. playground.objects_pool), new objects are built if None
+    '''
+    params = playground.params
+    types = params['attributes']['types']
+    # Category of each type, the most specific one as in PlayGroundNavigationV1.regularize_type_and_attribute
+    type_to_category = {t: c for c, category_types in params['categories'].items() for t in category_types}
+    objects_descr = [dict(types=types[i], categories=type_to_category[types[i]]) for i in arrays['type_ids']]
+    objects = build_objects(objects_descr, params, arrays['positions'], arrays['rgb_codes'], arrays['sizes'],
+                            objects_pool=objects_pool)
+    return dict(env_desc=[str(goal)] + [o['types'] for o in objects_descr],
+                objects=objects,
+                agent_pos=np.array(arrays['agent_pos'], dtype=np.float64),
+                gripper_state=int(arrays['gripper_state']))
+
+
+class ScenePool:
+    '''
+        Pool of pre-generated LittleZoo scenes for a fixed distribution of env_desc (e.g. sampled by a GoalSampler).
+        Scenes are sampled ahead of time, stored compactly (object arrays and the seed they were sampled with) and can be
+        cached on disk to be reused across runs. reset only builds the objects from the arrays, without sampling,
+        placement or the throwaway scene of PlayGroundNavigationV1.reset.
+        With background=True, a thread builds the objects of the next scenes while the agent acts, so that reset only
+        installs a ready scene. Because of the GIL this only pays off when the main thread waits (e.g. on LLM calls).
+        The thread reuses the objects of the scenes replaced by reset through its own objects pool.
+
+        Usage:
+            pool = ScenePool(env, env_descs, cache_path='scenes.npz')
+            observation, info = pool.reset()  # same as env.reset(env_desc) for the next env_desc of the pool
+    '''
+
+    def __init__(self,
+                 env,
+                 env_descs=None,
+                 cache_path=None,
+                 seed=0,
+                 shuffle=True,
+                 prefetch=32,
+                 background=False,
+                ):
+        '''
+            env: LittleZoo environment
+            env_descs: list of env_desc (goal followed by the objects), one scene is generated for each.
+                Can be None if the scenes are loaded from cache_path.
+            cache_path: .npz file, scenes are loaded from it if it exists and matches env_descs, saved to it otherwise
+            seed: scene i is sampled with the seed (seed, i), scenes are reset in a random order if shuffle
+            prefetch: number of scenes built ahead of time by the background thread
+            background: build the objects in a background thread, otherwise they are built in reset
+        '''
+        self.env = env
+        self.playground = env.unwrapped.playground.unwrapped
+        self.params = self.playground.params
+        if [a for a in self.playground.adm_abs_attributes if a not in ('categories', 'types')]:
+            raise NotImplementedError('Scene pools only support the categories and types attributes')
+        self.types = self.params['attributes']['types']
+        self.seed = seed
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+
+        self.scenes = self.load(cache_path, env_descs) if cache_path is not None and os.path.exists(cache_path) else None
+        if self.scenes is None:
+            if env_descs is None:
+                raise ValueError('You need to specify env_descs if there is no cached scenes')
+            self.scenes = self.generate(env_descs)
+            if cache_path is not None:
+                self.save(cache_path)
+
+        self._order = []
+        self._queue = queue.Queue(maxsize=prefetch)
+        self._stop = threading.Event()
+        self._thread = None
+        # Objects pool of the background thread, and objects of the replaced scenes that go back to it
+        self._objects_pool = ObjectPool()
+        self._released = queue.Queue()
+        if background:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def __len__(self):
+        return len(self.scenes['goals'])
+
+    # --- Generation and cache ---
+
+    def generate(self, env_descs):
+        '''
+            Sample one scene per env_desc, scene i is sampled with np.random.default_rng((seed, i))
+        '''
+        seeds = np.array([[self.seed, i] for i in range(len(env_descs))], dtype=np.int64).reshape(-1, 2)
+        arrays = [sample_scene_arrays(env_desc, self.playground, np.random.default_rng(s)) for env_desc, s in zip(env_descs, seeds)]
+        scenes = {k: np.stack([a[k] for a in arrays]) for k in arrays[0].keys()} if arrays else {}
+        scenes['goals'] = np.array([env_desc[0] for env_desc in env_descs], dtype=str)
+        scenes['seeds'] = seeds
+        return scenes
+
+    def save(self, path):
+        '''
+            Save the scenes to a .npz file (written atomically)
+        '''
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(tmp_path, types=np.array(self.types, dtype=str), **self.scenes)
+        os.replace(tmp_path, path)
+
+    def load(self, path, env_descs=None):
+        '''
+            Load scenes saved with save, returns None if they were generated with other object types or env_descs
+        '''
+        with np.load(path) as data:
+            scenes = {k: data[k] for k in data.files if k != 'types'}
+            if data['types'].tolist() != list(self.types):
+                return None
+        if env_descs is not None and self.get_env_descs(scenes) != [list(env_desc) for env_desc in env_descs]:
+            return None
+        return scenes
+
+    def get_env_descs(self, scenes=None):
+        scenes = self.scenes if scenes is None else scenes
+        return [[str(goal)] + [self.types[i] for i in type_ids] for goal, type_ids in zip(scenes['goals'], scenes['type_ids'])]
+
+    # --- Scenes ---
+
+    def build_scene(self, index):
+        '''
+            Build the objects of scene index, returns the scene argument of LittleZoo.reset
+        '''
+        arrays = {k: v[index] for k, v in self.scenes.items() if k not in ('goals', 'seeds')}
+        # The objects pool of the playground is not thread-safe, the background thread uses its own pool
+        in_background = threading.current_thread() is self._thread
+        return build_scene(self.scenes['goals'][index], arrays, self.playground,
+                           objects_pool=self._objects_pool if in_background else self.playground.objects_pool)
+
+    def next_index(self):
+        if len(self._order) == 0:
+            self._order = list(self.rng.permutation(len(self)) if self.shuffle else range(len(self)))
+        return self._order.pop(0)
+
+    def get(self):
+        '''
+            Next ready scene
+        '''
+        if self._thread is None:
+            return self.build_scene(self.next_index())
+        return self._queue.get()
+
+    def reset(self):
+        '''
+            Reset the environment with the next scene of the pool
+        '''
+        if self._thread is not None:
+            # Give the objects of the current scene to the background thread instead of the pool of the playground,
+            # that only gets objects back and would grow at each reset
+            self._released.put(self.playground.all_objects)
+            self.playground.all_objects = []
+        return self.env.reset(scene=self.get())
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            while self._thread.is_alive():
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+                self._thread.join(timeout=0.01)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            while not self._released.empty():
+                self._objects_pool.release(self._released.get_nowait())
+            scene = self.build_scene(self.next_index())
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(scene, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
@@ -0,0 +1,173 @@
+import collections
+import itertools
+
+import numpy as np
+
+from little_zoo.curriculum import GoalSampler
+from little_zoo.littlezoo import get_goal_horizon
+
+
+class EpisodeScheduler:
+    '''
+        Runs a queue of episodes on a LittleZooVectorEnv while keeping the policy batches full: the environments whose
+        episode ends are reset with the next episodes of the queue in the same step, and once the queue is empty the
+        finished environments leave the active set, so that the observations passed to the policy are always those of
+        running episodes (in a compact batch).
+        With bin_by_horizon, episodes are started from the longest horizon to the shortest (within each lookahead
+        window), so that the batch drains evenly at the end of the queue instead of waiting on a few long episodes.
+
+        Usage:
+            scheduler = EpisodeScheduler(envs, env_descs, bin_by_horizon=True)
+            observations, infos = scheduler.reset()
+            while not scheduler.done:
+                finished = scheduler.step(policy(scheduler.observations, scheduler.infos))
+    '''
+
+    def __init__(self, envs, episodes, nb_episodes=None, bin_by_horizon=False, lookahead=None, max_invalid_actions=10):
+        '''
+            envs: LittleZooVectorEnv
+            episodes: iterable of env_desc lists or of scenes (see ScenePool.build_scene), or a GoalSampler (the episodes
+                are sampled env_descs)
+            nb_episodes: maximum number of episodes to run, None to run all of them (required with a GoalSampler)
+            bin_by_horizon: start the episodes with the longest horizon first
+            lookahead: number of episodes that are read and sorted at once with bin_by_horizon, all the queue if None
+            max_invalid_actions: episodes end (failed) when the policy takes more invalid actions
+        '''
+        if isinstance(episodes, GoalSampler):
+            if nb_episodes is None:
+                raise ValueError('You need to specify nb_episodes with a GoalSampler')
+            episodes = _sample_env_descs(episodes)
+        self.envs = envs
+        self.env_params = envs.get_env(0).env_params
+        self.source = enumerate(episodes if nb_episodes is None else itertools.islice(episodes, nb_episodes))
+        self.queue = collections.deque()
+        self.bin_by_horizon = bin_by_horizon
+        self.lookahead = lookahead
+        self.max_invalid_actions = max_invalid_actions
+
+        # Active set: indices of the environments with a running episode, their observations and infos
+        self.indices = np.zeros([0], dtype=np.int64)
+        self.observations = []
+        self.infos = []
+        # Episode of each environment: its index in the queue, and the number of invalid actions
+        self.episode_ids = np.full([envs.nb_envs], -1, dtype=np.int64)
+        self.nb_invalid_actions = np.zeros([envs.nb_envs], dtype=np.int64)
+        # Number of policy batches and of environment steps (nb_env_steps / nb_steps is the mean batch size)
+        self.nb_steps = 0
+        self.nb_env_steps = 0
+
+    @property
+    def done(self):
+        return len(self.indices) == 0
+
+    def get_horizon(self, episode):
+        env_desc = episode['env_desc'] if isinstance(episode, dict) else episode
+        return get_goal_horizon(env_desc[0], self.env_params)
+
+    def reset(self):
+        '''
+            Start the first episodes of the queue on all the environments
+            Returns the observations and the infos of the active set
+        '''
+        self.indices = np.zeros([0], dtype=np.int64)
+        self.observations, self.infos = [], []
+        self._start(np.arange(self.envs.nb_envs))
+        return self.observations, self.infos
+
+    def step(self, actions):
+        '''
+            Step the environments of the active set (actions are aligned with self.indices), reset the finished ones
+            with the next episodes of the queue and compact the active set.
+            Returns the list of the finished episodes: dicts with their index in the queue ('episode'), env_desc,
+            goal_id, reward, success, length (number of steps), truncated and invalid_actions.
+        '''
+        observations, rewards, dones, truncateds, infos = self.envs.step(self.indices, actions, return_exceptions=True)
+        self.nb_steps += 1
+        self.nb_env_steps += len(self.indices)
+        finished = []
+        for j, index in enumerate(self.indices):
+            if infos[j] is None:
+                if not isinstance(observations[j], ValueError):
+                    raise observations[j]
+                # Invalid action: the environment did not change
+                self.nb_invalid_actions[index] += 1
+                dones[j] = self.nb_invalid_actions[index] > self.max_invalid_actions
+                if dones[j] and self.envs.statistics is not None:
+                    env = self.envs.envs[index]
+                    self.envs.statistics.add_episode(env.goal_id, False, env.current_step,
+                                                     nb_invalid_actions=self.nb_invalid_actions[index])
+            else:
+                self.observations[j] = observations[j]
+                self.infos[j] = infos[j]
+            if dones[j]:
+                env = self.envs.envs[index]
+                finished.append(dict(episode=int(self.episode_ids[index]),
+                                     env_desc=env.env_desc,
+                                     goal_id=env.goal_id,
+                                     reward=float(rewards[j]),
+                                     success=bool(rewards[j] > 0),
+                                     length=env.current_step,
+                                     truncated=bool(truncateds[j]),
+                                     invalid_actions=int(self.nb_invalid_actions[index])))
+                self.episode_ids[index] = -1
+
+        if dones.any():
+            # Finished environments leave the active set, then those that get a new episode join it again
+            freed = self.indices[dones]
+            self.indices = self.indices[~dones]
+            if isinstance(self.observations, np.ndarray):
+                self.observations = self.observations[~dones]
+            else:
+                self.observations = [o for o, done in zip(self.observations, dones) if not done]
+            self.infos = [info for info, done in zip(self.infos, dones) if not done]
+            self._start(freed)
+        return finished
+
+    def run(self, policy):
+        '''
+            Run all the episodes of the queue with a policy (called with the observations and the infos of the active
+            set, see little_zoo.policies), returns the finished episodes in the order they ended
+        '''
+        self.reset()
+        finished = []
+        while not self.done:
+            finished += self.step(policy(self.observations, self.infos))
+        return finished
+
+    def _next_episodes(self, nb_episodes):
+        # Next episodes of the queue, read from the source by lookahead windows sorted by decreasing horizon
+        while len(self.queue) < nb_episodes:
+            window = list(itertools.islice(self.source, self.lookahead if self.bin_by_horizon else nb_episodes - len(self.queue)))
+            if len(window) == 0:
+                break
+            if self.bin_by_horizon:
+                window.sort(key=lambda item: - self.get_horizon(item[1]))
+            self.queue.extend(window)
+        return [self.queue.popleft() for _ in range(min(nb_episodes, len(self.queue)))]
+
+    def _start(self, indices):
+        # Reset free environments with the next episodes and add them to the active set
+        episodes = self._next_episodes(len(indices))
+        if len(episodes) == 0:
+            return
+        indices = indices[:len(episodes)]
+        episode_ids, episodes = zip(*episodes)
+        is_scene = [isinstance(e, dict) for e in episodes]
+        observations, infos = self.envs.reset(indices,
+                                              env_descs=[None if s else e for e, s in zip(episodes, is_scene)],
+                                              scenes=[e if s else None for e, s in zip(episodes, is_scene)])
+        self.episode_ids[indices] = episode_ids
+        self.nb_invalid_actions[indices] = 0
+        if isinstance(observations, np.ndarray) and len(self.indices) > 0:
+            self.observations = np.concatenate([self.observations, observations])
+        elif isinstance(observations, np.ndarray):
+            self.observations = observations
+        else:
+            self.observations = list(self.observations) + observations
+        self.indices = np.concatenate([self.indices, indices])
+        self.infos = self.infos + infos
+
+
+def _sample_env_descs(goal_sampler):
+    while True:
+        yield goal_sampler.sample_env_descs(1)[1][0]
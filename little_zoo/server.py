@@ -0,0 +1,588 @@
+import argparse
+import multiprocessing
+import os
+import queue
+import selectors
+import socket
+import struct
+import threading
+import time
+
+import gymnasium as gym
+import numpy as np
+
+from little_zoo.policies import POLICIES, make_policy
+from little_zoo.vector_env import LittleZooVectorEnv
+
+
+# --- Protocol ---
+# Messages are frames: a little-endian uint32 length followed by the payload.
+# On connection, the server sends a hello frame (observation mode, number of actions, observation size).
+# Requests start with an opcode, responses with a status: STATUS_OK followed by the result, or an error status followed
+# by the error message.
+
+OP_RESET = 1  # goal id (int32), number of objects (uint16), object type ids (int16)
+OP_RESET_DESC = 2  # env_desc joined by '\n'
+OP_STEP = 3  # action id (int16)
+OP_STEP_STR = 4  # action string
+OP_CLOSE = 5
+
+STATUS_OK = 0
+STATUS_VALUE_ERROR = 1
+STATUS_ERROR = 2
+
+OBSERVATION_MODES = ('text', 'vector', 'prompt', 'delta')
+EVENTS = ('grasped', 'released', 'grown', 'consumed')
+
+_FRAME_HEADER = struct.Struct('<I')
+_HELLO = struct.Struct('<BHI')
+_RESET_IDS = struct.Struct('<iH')
+_ACTION_ID = struct.Struct('<h')
+# reward, done, truncated, keyframe (delta observation mode), goal id, number of actions, number of events
+_RESULT = struct.Struct('<fBBBiHH')
+# Events: event index and object id
+_EVENT = np.dtype([('event', 'u1'), ('object_id', '<u2')])
+
+
+def _frame(payload):
+    return _FRAME_HEADER.pack(len(payload)) + payload
+
+
+def _pack_bytes(data):
+    return _FRAME_HEADER.pack(len(data)) + data
+
+
+def _unpack_bytes(payload, offset):
+    size, = _FRAME_HEADER.unpack_from(payload, offset)
+    offset += _FRAME_HEADER.size
+    return bytes(payload[offset:offset + size]), offset + size
+
+
+def encode_result(observation, reward, done, truncated, info):
+    '''
+        Response to a reset or step request. The action mask is sent as bits, events as (event, object id) records,
+        the inventory of text observations as names, the goal, the action vocabulary and the prompt prefix only after a
+        reset (the client keeps them for the episode).
+    '''
+    mask = info['action_mask']
+    events = info.get('events', [])
+    reset = 'action_vocabulary' in info
+    if isinstance(observation, np.ndarray):
+        observation = observation.astype('<f4').tobytes()
+    else:
+        observation = observation.encode()
+    return b''.join([bytes([STATUS_OK]),
+                     _RESULT.pack(reward, int(done), int(truncated), int(info.get('keyframe', False)), info['goal_id'],
+                                  len(mask), len(events)),
+                     np.packbits(mask).tobytes(),
+                     np.array([(EVENTS.index(event), obj_id) for event, obj_id in events], dtype=_EVENT).tobytes(),
+                     _pack_bytes('\n'.join(info.get('inventory', [])).encode()),
+                     _pack_bytes(info['goal'].encode() if reset else b''),
+                     _pack_bytes('\n'.join(info['action_vocabulary']).encode() if reset else b''),
+                     _pack_bytes(info.get('prompt_prefix', '').encode()),
+                     observation])
+
+
+def encode_error(error):
+    status = STATUS_VALUE_ERROR if isinstance(error, ValueError) else STATUS_ERROR
+    return bytes([status]) + '{}: {}'.format(type(error).__name__, error).encode()
+
+
+def decode_result(payload, observation_mode):
+    '''
+        Decode a response, returns (observation, reward, done, truncated, info), info holds the goal and the action
+        vocabulary after a reset only, the inventory with text observations and whether the observation is a keyframe
+        in the delta observation mode. Errors of the server are raised (ValueError for invalid requests).
+    '''
+    status = payload[0]
+    if status != STATUS_OK:
+        raise (ValueError if status == STATUS_VALUE_ERROR else RuntimeError)(bytes(payload[1:]).decode())
+    reward, done, truncated, keyframe, goal_id, nb_actions, nb_events = _RESULT.unpack_from(payload, 1)
+    offset = 1 + _RESULT.size
+    mask_size = (nb_actions + 7) // 8
+    mask = np.unpackbits(np.frombuffer(payload, np.uint8, mask_size, offset), count=nb_actions).astype(bool)
+    offset += mask_size
+    events = [(EVENTS[event], int(obj_id)) for event, obj_id in np.frombuffer(payload, _EVENT, nb_events, offset)]
+    offset += _EVENT.itemsize * nb_events
+    inventory, offset = _unpack_bytes(payload, offset)
+    goal, offset = _unpack_bytes(payload, offset)
+    vocabulary, offset = _unpack_bytes(payload, offset)
+    prompt_prefix, offset = _unpack_bytes(payload, offset)
+    if observation_mode == 'vector':
+        observation = np.frombuffer(payload, '<f4', offset=offset).copy()
+    else:
+        observation = bytes(payload[offset:]).decode()
+
+    info = {'goal_id': goal_id, 'action_mask': mask, 'events': events}
+    if observation_mode != 'vector':
+        info['inventory'] = inventory.decode().split('\n') if inventory else []
+    if observation_mode == 'delta':
+        info['keyframe'] = bool(keyframe)
+    if vocabulary:
+        info['goal'] = goal.decode()
+        info['action_vocabulary'] = vocabulary.decode().split('\n')
+    if prompt_prefix:
+        info['prompt_prefix'] = prompt_prefix.decode()
+    return observation, reward, bool(done), bool(truncated), info
+
+
+def _make_socket(address):
+    # A string is the path of a Unix domain socket, a (host, port) tuple a TCP address
+    if isinstance(address, str):
+        return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+# --- Server ---
+
+class _Session:
+    def __init__(self, sock, slot):
+        self.socket = sock
+        self.slot = slot
+        self.buffer = bytearray()
+        # Responses that the socket did not accept yet, sent when it is writable
+        self.outgoing = bytearray()
+        self.writing = False
+        # Slots are reused: the environment of a new session still holds the episode of the previous one
+        self.is_reset = False
+
+
+class EnvServer:
+    '''
+        Serve LittleZoo sessions to remote workers (e.g. LLM inference processes) on a local socket, TCP or Unix domain.
+        Each connection is a session with its own environment. The server runs a single event loop: all the requests
+        received since the last iteration (at most one per session and per round) are executed as batched calls on a
+        LittleZooVectorEnv, and batch_wait can delay execution to coalesce more requests.
+        Sockets are non-blocking: the responses that a client does not read are buffered, and the session is closed
+        when its buffer exceeds max_backlog bytes, so that a slow client never stalls the other sessions.
+        Environments run in info_mode 'mask': the client receives the action vocabulary at reset and an action mask at
+        each step.
+
+        Usage:
+            server = EnvServer(('127.0.0.1', 5555))  # or EnvServer('/tmp/little_zoo.sock')
+            server.start()  # or server.serve_forever()
+            env = LittleZooClient(server.address)
+    '''
+
+    def __init__(self,
+                 address=('127.0.0.1', 0),
+                 max_sessions=256,
+                 max_batch_size=256,
+                 batch_wait=0.,
+                 max_backlog=1 << 24,
+                 **env_kwargs,
+                ):
+        '''
+            address: (host, port) for TCP (port 0 picks a free port, see self.address) or the path of a Unix socket
+            max_sessions: maximal number of concurrent sessions, a LittleZoo environment is kept for each
+            max_batch_size: maximal number of requests executed in one batch
+            batch_wait: time (in s) to wait for more requests once a request is received, latency traded for batching
+            max_backlog: maximal size (in bytes) of the responses waiting to be read by a client
+            env_kwargs: arguments of LittleZoo
+        '''
+        env_kwargs['info_mode'] = 'mask'
+        self.backend = LittleZooVectorEnv(max_sessions, **env_kwargs)
+        self.max_batch_size = max_batch_size
+        self.batch_wait = batch_wait
+        self.max_backlog = max_backlog
+
+        env = self.backend.get_env(0)
+        self.observation_mode = env.observation_mode
+        self.hello = _frame(_HELLO.pack(OBSERVATION_MODES.index(env.observation_mode),
+                                        1 + 2 * env.playground.nb_obj,
+                                        env.observation_space.shape[0] if env.observation_mode == 'vector' else 0))
+
+        if isinstance(address, str) and os.path.exists(address):
+            os.unlink(address)
+        self.socket = _make_socket(address)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind(address)
+        self.socket.listen(max_sessions)
+        self.socket.setblocking(False)
+        self.address = self.socket.getsockname()
+
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.socket, selectors.EVENT_READ, None)
+        self.free_slots = list(range(max_sessions))[::-1]
+        self.sessions = set()
+        self.nb_batches = 0
+        self.nb_requests = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        '''
+            Serve in a background thread
+        '''
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self, poll_interval=0.1):
+        while not self._stop.is_set():
+            requests = self._poll(poll_interval)
+            if requests and self.batch_wait > 0:
+                deadline = time.perf_counter() + self.batch_wait
+                while len(requests) < self.max_batch_size and time.perf_counter() < deadline:
+                    requests += self._poll(max(deadline - time.perf_counter(), 0))
+            while requests:
+                self._process(requests[:self.max_batch_size])
+                requests = requests[self.max_batch_size:]
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for session in list(self.sessions):
+            self._close_session(session)
+        self.selector.close()
+        self.socket.close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+        self.backend.close()
+
+    # --- Utils ---
+
+    def _poll(self, timeout):
+        '''
+            Accept new sessions and read the complete requests received, returns a list of (session, payload)
+        '''
+        requests = []
+        for key, events in self.selector.select(timeout):
+            if key.data is None:
+                self._accept()
+                continue
+            session = key.data
+            if events & selectors.EVENT_WRITE:
+                self._flush(session)
+            if not events & selectors.EVENT_READ or session not in self.sessions:
+                continue
+            try:
+                data = session.socket.recv(1 << 16)
+            except ConnectionError:
+                data = b''
+            except BlockingIOError:
+                continue
+            if not data:
+                self._close_session(session)
+                continue
+            session.buffer += data
+            while len(session.buffer) >= _FRAME_HEADER.size:
+                size, = _FRAME_HEADER.unpack_from(session.buffer)
+                if len(session.buffer) < _FRAME_HEADER.size + size:
+                    break
+                requests.append((session, bytes(session.buffer[_FRAME_HEADER.size:_FRAME_HEADER.size + size])))
+                del session.buffer[:_FRAME_HEADER.size + size]
+        return requests
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self.socket.accept()
+            except BlockingIOError:
+                return
+            if not self.free_slots:
+                sock.close()
+                continue
+            sock.setblocking(False)
+            if sock.family == socket.AF_INET:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            session = _Session(sock, self.free_slots.pop())
+            self.sessions.add(session)
+            self.selector.register(sock, selectors.EVENT_READ, session)
+            self._send(session, self.hello)
+
+    def _send(self, session, data):
+        '''
+            Send data without blocking, what the socket does not accept is buffered until it is writable
+        '''
+        if session not in self.sessions:
+            return
+        session.outgoing += data
+        if not session.writing:
+            self._flush(session)
+        if len(session.outgoing) > self.max_backlog:
+            # The client does not read its responses
+            self._close_session(session)
+
+    def _flush(self, session):
+        try:
+            sent = session.socket.send(session.outgoing)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self._close_session(session)
+            return
+        del session.outgoing[:sent]
+        # Wait for the socket to be writable while responses are left
+        writing = len(session.outgoing) > 0
+        if writing != session.writing:
+            session.writing = writing
+            self.selector.modify(session.socket, selectors.EVENT_READ | (selectors.EVENT_WRITE if writing else 0),
+                                 session)
+
+    def _close_session(self, session):
+        if session in self.sessions:
+            self.sessions.remove(session)
+            self.selector.unregister(session.socket)
+            session.socket.close()
+            self.free_slots.append(session.slot)
+
+    def _process(self, requests):
+        '''
+            Execute requests, in rounds where each session has at most one request to keep their order
+        '''
+        rounds = []
+        nb_requests = dict()
+        for session, payload in requests:
+            i_round = nb_requests.get(session, 0)
+            nb_requests[session] = i_round + 1
+            if i_round == len(rounds):
+                rounds.append([])
+            rounds[i_round].append((session, payload))
+
+        for requests in rounds:
+            resets, steps = [], []
+            responses = dict()
+            for session, payload in requests:
+                try:
+                    opcode = payload[0]
+                    if opcode == OP_RESET:
+                        goal_id, nb_objects = _RESET_IDS.unpack_from(payload, 1)
+                        object_ids = np.frombuffer(payload, '<i2', nb_objects, 1 + _RESET_IDS.size).tolist()
+                        resets.append((session, dict(goal_id=goal_id, object_ids=object_ids)))
+                    elif opcode == OP_RESET_DESC:
+                        resets.append((session, dict(env_desc=payload[1:].decode().split('\n'))))
+                    elif opcode in (OP_STEP, OP_STEP_STR) and not session.is_reset:
+                        raise ValueError('The session must be reset before step')
+                    elif opcode == OP_STEP:
+                        steps.append((session, _ACTION_ID.unpack_from(payload, 1)[0]))
+                    elif opcode == OP_STEP_STR:
+                        steps.append((session, payload[1:].decode()))
+                    elif opcode == OP_CLOSE:
+                        self._close_session(session)
+                    else:
+                        raise ValueError('Unknown opcode {}'.format(opcode))
+                except Exception as e:
+                    responses[session] = encode_error(e)
+
+            if resets:
+                observations, infos = self.backend.reset([s.slot for s, _ in resets],
+                                                         env_descs=[r.get('env_desc') for _, r in resets],
+                                                         goal_ids=[r.get('goal_id') for _, r in resets],
+                                                         object_ids=[r.get('object_ids') for _, r in resets],
+                                                         return_exceptions=True)
+                for (session, _), observation, info in zip(resets, observations, infos):
+                    if info is None:
+                        responses[session] = encode_error(observation)
+                    else:
+                        session.is_reset = True
+                        responses[session] = encode_result(observation, 0, False, False, info)
+            if steps:
+                observations, rewards, dones, truncateds, infos = self.backend.step([s.slot for s, _ in steps],
+                                                                                    [a for _, a in steps],
+                                                                                    return_exceptions=True)
+                for i, (session, _) in enumerate(steps):
+                    if infos[i] is None:
+                        responses[session] = encode_error(observations[i])
+                    else:
+                        responses[session] = encode_result(observations[i], rewards[i], dones[i], truncateds[i], infos[i])
+
+            for session, response in responses.items():
+                self._send(session, _frame(response))
+            self.nb_batches += 1
+            self.nb_requests += len(requests)
+
+
+# --- Client ---
+
+class LittleZooClient(gym.Env):
+    '''
+        Gymnasium env connected to a session of an EnvServer. The info dicts hold the goal id, the action mask and the
+        events of the step, and after a reset the goal and the action vocabulary of the scene.
+    '''
+
+    def __init__(self, address, timeout=None):
+        '''
+            address: address of the server (EnvServer.address)
+        '''
+        self.socket = _make_socket(address)
+        self.socket.settimeout(timeout)
+        self.socket.connect(address)
+        observation_mode, nb_actions, dim_obs = _HELLO.unpack(self._recv())
+        self.observation_mode = OBSERVATION_MODES[observation_mode]
+        self.action_space = gym.spaces.Discrete(nb_actions)
+        if self.observation_mode == 'vector':
+            self.observation_space = gym.spaces.Box(low=-np.inf, high=np.inf, shape=(dim_obs,), dtype=np.float32)
+        else:
+            self.observation_space = gym.spaces.Text(int(1e6))
+        self.goal = None
+        self.action_vocabulary = None
+
+    def reset(self, env_desc=None, goal_id=None, object_ids=None, seed=None, options=None):
+        '''
+            Reset the session with an env_desc, or a goal id and object type ids (see LittleZoo.reset)
+        '''
+        if env_desc is not None:
+            payload = bytes([OP_RESET_DESC]) + '\n'.join(env_desc).encode()
+        elif goal_id is not None and object_ids is not None:
+            payload = (bytes([OP_RESET]) + _RESET_IDS.pack(goal_id, len(object_ids))
+                       + np.asarray(object_ids, dtype='<i2').tobytes())
+        else:
+            raise ValueError('You need to specify a goal')
+        observation, _, _, _, info = decode_result(self._request(payload), self.observation_mode)
+        self.goal = info['goal']
+        self.action_vocabulary = info['action_vocabulary']
+        return observation, info
+
+    def step(self, action):
+        '''
+            action: action id in the action vocabulary, or action string
+        '''
+        if isinstance(action, (int, np.integer)):
+            payload = bytes([OP_STEP]) + _ACTION_ID.pack(action)
+        else:
+            payload = bytes([OP_STEP_STR]) + action.encode()
+        observation, reward, done, truncated, info = decode_result(self._request(payload), self.observation_mode)
+        info['goal'] = self.goal
+        return observation, reward, done, truncated, info
+
+    def close(self):
+        if self.socket is not None:
+            try:
+                self.socket.sendall(_frame(bytes([OP_CLOSE])))
+            except OSError:
+                pass
+            self.socket.close()
+            self.socket = None
+
+    def _request(self, payload):
+        self.socket.sendall(_frame(payload))
+        return self._recv()
+
+    def _recv(self):
+        size, = _FRAME_HEADER.unpack(self._recv_exactly(_FRAME_HEADER.size))
+        return self._recv_exactly(size)
+
+    def _recv_exactly(self, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.socket.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError('The env server closed the connection')
+            data += chunk
+        return data
+
+
+# --- Loopback benchmark ---
+
+def _run_fake_policy(address, nb_steps, seed, barrier, results, policy='random'):
+    # Client process: actions of a scripted policy, reset at the end of the episodes
+    from little_zoo.curriculum import GoalSampler
+    from little_zoo.playground.env_params import get_env_params
+
+    env_params = get_env_params()
+    goal_sampler = GoalSampler(env_params, seed=seed)
+    policy = make_policy(policy, env_params, seed=seed)
+    env = LittleZooClient(address)
+    goal_ids, env_descs = goal_sampler.sample_env_descs(64)
+    observation, info = env.reset(env_descs[0])
+    latencies = np.empty([nb_steps])
+    barrier.wait()
+    start = time.monotonic()
+    for i in range(nb_steps):
+        t = time.perf_counter()
+        observations = observation[None] if env.observation_mode == 'vector' else [observation]
+        observation, reward, done, truncated, info = env.step(int(policy(observations, [info])[0]))
+        if done:
+            observation, info = env.reset(env_descs[i % len(env_descs)])
+        latencies[i] = time.perf_counter() - t
+    results.put((start, time.monotonic(), latencies))
+    env.close()
+
+
+def run_loopback_benchmark(nb_clients=16, nb_steps=2000, address=('127.0.0.1', 0), policy='random', timeout=600.,
+                           **server_kwargs):
+    '''
+        Serve LittleZoo in this process and run nb_clients fake-policy clients (scripted policy of little_zoo.policies,
+        food_chain and oracle need observation_mode='vector') in other processes. Returns the sustained throughput
+        (steps/s, over all clients) and latency percentiles of the steps (in ms, resets at the end of the episodes
+        included).
+        timeout: in seconds, a RuntimeError is raised if the clients did not finish (or if one of them failed)
+    '''
+    if policy != 'random' and server_kwargs.get('observation_mode', 'text') != 'vector':
+        raise ValueError('The {} policy needs vector observations (observation_mode=\'vector\')'.format(policy))
+    server = EnvServer(address, **server_kwargs).start()
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(nb_clients)
+    results = context.Queue()
+    clients = [context.Process(target=_run_fake_policy, args=(server.address, nb_steps, seed, barrier, results, policy))
+               for seed in range(nb_clients)]
+    try:
+        for client in clients:
+            client.start()
+        client_results = []
+        deadline = time.monotonic() + timeout
+        while len(client_results) < nb_clients:
+            try:
+                client_results.append(results.get(timeout=1.))
+            except queue.Empty:
+                failed = [i for i, client in enumerate(clients) if client.exitcode not in (None, 0)]
+                if failed:
+                    raise RuntimeError('The benchmark clients {} failed'.format(failed))
+                if time.monotonic() > deadline:
+                    raise RuntimeError('The benchmark clients did not finish in {} s'.format(timeout))
+        for client in clients:
+            client.join()
+    finally:
+        # Clients that are still running are waiting on a failed client (at the barrier) or on the server
+        for client in clients:
+            if client.is_alive():
+                client.terminate()
+                client.join()
+        nb_batches, nb_requests = server.nb_batches, server.nb_requests
+        server.close()
+    starts, ends, latencies = zip(*client_results)
+
+    latencies = np.concatenate(latencies) * 1e3
+    return dict(steps_per_second=nb_clients * nb_steps / (max(ends) - min(starts)),
+                latency_p50=np.percentile(latencies, 50),
+                latency_p90=np.percentile(latencies, 90),
+                latency_p99=np.percentile(latencies, 99),
+                latency_max=latencies.max(),
+                mean_batch_size=nb_requests / max(nb_batches, 1))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve LittleZoo environments on a local socket')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5555)
+    parser.add_argument('--unix', default=None, help='path of a Unix domain socket, used instead of TCP')
+    parser.add_argument('--max-sessions', type=int, default=256)
+    parser.add_argument('--batch-wait', type=float, default=0., help='in seconds')
+    parser.add_argument('--observation-mode', default='text', choices=OBSERVATION_MODES)
+    parser.add_argument('--benchmark', type=int, default=0, help='run a loopback benchmark with this number of clients')
+    parser.add_argument('--nb-steps', type=int, default=2000, help='steps per client of the benchmark')
+    parser.add_argument('--policy', default='random', choices=POLICIES, help='policy of the benchmark clients')
+    args = parser.parse_args()
+
+    address = args.unix if args.unix is not None else (args.host, args.port)
+    if args.benchmark > 0:
+        stats = run_loopback_benchmark(args.benchmark, args.nb_steps, address if args.unix else (args.host, 0), args.policy,
+                                       max_sessions=args.max_sessions, batch_wait=args.batch_wait,
+                                       observation_mode=args.observation_mode)
+        print('{:.0f} steps/s, latency (ms): p50 {:.3f}, p90 {:.3f}, p99 {:.3f}, max {:.3f}, mean batch size {:.1f}'.format(
+            stats['steps_per_second'], stats['latency_p50'], stats['latency_p90'], stats['latency_p99'],
+            stats['latency_max'], stats['mean_batch_size']))
+    else:
+        server = EnvServer(address, max_sessions=args.max_sessions, batch_wait=args.batch_wait,
+                           observation_mode=args.observation_mode)
+        print('Serving LittleZoo on', server.address)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        server.close()
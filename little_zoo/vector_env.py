@@ -0,0 +1,122 @@
+import numpy as np
+
+from little_zoo.littlezoo import LittleZoo
+
+
+class LittleZooVectorEnv:
+    '''
+        Batch of LittleZoo environments that are reset and stepped together.
+        Unlike gymnasium vector envs, any subset of the environments can be reset or stepped (e.g. the sessions of an
+        env server that sent a request), and environments are not reset automatically at the end of the episodes.
+        Environments are built on their first reset. With observation_mode 'vector', the environments write their
+        observations into the rows of one batch array (see LittleZoo.set_observation_buffer), the observations of the
+        stepped environments are gathered from it.
+
+        Usage:
+            envs = LittleZooVectorEnv(8, observation_mode='vector')
+            observations, infos = envs.reset(range(8), env_descs=env_descs)
+            observations, rewards, dones, truncateds, infos = envs.step(range(8), actions)
+    '''
+
+    def __init__(self, nb_envs, statistics=None, **env_kwargs):
+        '''
+            nb_envs: number of environments
+            statistics: RolloutStatistics where the finished episodes are recorded
+            env_kwargs: arguments of LittleZoo
+        '''
+        self.nb_envs = nb_envs
+        self.env_kwargs = env_kwargs
+        self.envs = [None] * nb_envs
+        self.statistics = statistics
+        self.nb_invalid_actions = np.zeros([nb_envs], dtype=np.int64)
+        # Batch of vector observations, allocated with the first environment
+        self.observations = None
+
+    def __len__(self):
+        return self.nb_envs
+
+    def get_env(self, index):
+        if self.envs[index] is None:
+            env = LittleZoo(**self.env_kwargs)
+            if env.observation_mode == 'vector':
+                if self.observations is None:
+                    self.observations = np.zeros([self.nb_envs, env.observation_space.shape[0]], dtype=np.float32)
+                env.set_observation_buffer(self.observations[index])
+            self.envs[index] = env
+        return self.envs[index]
+
+    def reset(self, indices, env_descs=None, goal_ids=None, object_ids=None, scenes=None, return_exceptions=False):
+        '''
+            Reset the environments at indices
+            env_descs, goal_ids, object_ids, scenes: lists aligned with indices (see LittleZoo.reset), entries can be None
+            return_exceptions: if True, the exception raised by an environment is returned as its observation (with an
+                info of None) instead of being raised, the other environments are still reset
+        '''
+        indices = list(indices)
+        env_descs = [None] * len(indices) if env_descs is None else env_descs
+        goal_ids = [None] * len(indices) if goal_ids is None else goal_ids
+        object_ids = [None] * len(indices) if object_ids is None else object_ids
+        scenes = [None] * len(indices) if scenes is None else scenes
+
+        observations, infos = [], []
+        for index, env_desc, goal_id, obj_ids, scene in zip(indices, env_descs, goal_ids, object_ids, scenes):
+            self.nb_invalid_actions[index] = 0
+            try:
+                observation, info = self.get_env(index).reset(env_desc=env_desc, goal_id=goal_id, object_ids=obj_ids,
+                                                              scene=scene)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                observation, info = e, None
+            observations.append(observation)
+            infos.append(info)
+        return self._stack(indices, observations), infos
+
+    def step(self, indices, actions, return_exceptions=False):
+        '''
+            Step the environments at indices with actions (strings or action ids)
+            return_exceptions: if True, the exception raised by an environment is returned as its observation (with an
+                info of None) instead of being raised, the other environments are still stepped
+        '''
+        indices = list(indices)
+        observations, infos = [], []
+        rewards = np.zeros([len(indices)])
+        dones = np.zeros([len(indices)], dtype=bool)
+        truncateds = np.zeros([len(indices)], dtype=bool)
+        for i, (index, action) in enumerate(zip(indices, actions)):
+            try:
+                if self.envs[index] is None:
+                    raise ValueError('The environment {} must be reset before step'.format(index))
+                observation, rewards[i], dones[i], truncateds[i], info = self.envs[index].step(action)
+            except Exception as e:
+                if isinstance(e, ValueError):
+                    self.nb_invalid_actions[index] += 1
+                if not return_exceptions:
+                    raise
+                observation, info = e, None
+            observations.append(observation)
+            infos.append(info)
+
+        if self.statistics is not None and dones.any():
+            done_indices = [index for index, done in zip(indices, dones) if done]
+            self.statistics.add_episodes([self.envs[index].goal_id for index in done_indices],
+                                         rewards[dones] > 0,
+                                         [self.envs[index].current_step for index in done_indices],
+                                         truncateds[dones],
+                                         nb_invalid_actions=self.nb_invalid_actions[done_indices])
+        return self._stack(indices, observations), rewards, dones, truncateds, infos
+
+    def close(self):
+        for env in self.envs:
+            if env is not None:
+                env.close()
+        self.envs = [None] * self.nb_envs
+
+    def _stack(self, indices, observations):
+        # Vector observations are rows of the batch array, they are gathered in one copy (in a list of copies when an
+        # environment failed), so that the next steps do not change them
+        if self.observations is None or not observations:
+            return observations
+        if all(isinstance(o, np.ndarray) for o in observations):
+            return self.observations[indices]
+        return [o.copy() if isinstance(o, np.ndarray) else o for o in observations]
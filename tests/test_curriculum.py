@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from little_zoo import LittleZoo
+from little_zoo.curriculum import GOAL_BUCKETS, GoalSampler
+from little_zoo.playground.env_params import get_env_params
+
+
+@pytest.mark.parametrize('nb_objects', [1, 2, 3, 4, 5])
+def test_env_descs_contain_the_food_chain(nb_objects):
+    params = get_env_params()
+    sampler = GoalSampler(params, nb_objects=nb_objects, seed=0)
+    # Grow carnivore goals need a carnivore, a herbivore, a plant and water
+    assert {GOAL_BUCKETS[b] for b in sampler.goal_buckets} == set(GOAL_BUCKETS[:nb_objects])
+    goal_ids, env_descs = sampler.sample_env_descs(200)
+    env = LittleZoo(nb_objects=nb_objects)
+    for env_desc in env_descs:
+        goal, objects = env_desc[0], env_desc[1:]
+        assert len(objects) == nb_objects
+        if goal.startswith('Grow'):
+            levels = {c for c in ('plant', 'herbivore', 'carnivore') for o in objects if o in params['categories'][c]}
+            assert 'water' in objects
+            assert len(levels) >= sampler.get_nb_required_objects(goal) - 1
+        env.reset(env_desc)
+
+
+def test_get_env_desc_rejects_goals_that_do_not_fit():
+    sampler = GoalSampler(get_env_params(), nb_objects=3)
+    goal_id = int(np.flatnonzero(np.array(sampler.tables['descriptions']) == 'Grow any lion')[0])
+    with pytest.raises(ValueError):
+        sampler.get_env_desc(goal_id)
@@ -0,0 +1,36 @@
+import pytest
+
+from little_zoo import LittleZoo
+from little_zoo.playground.descriptions import DescriptionSpace, generate_all_descriptions
+from little_zoo.playground.env_params import get_env_params
+from little_zoo.playground.reward_function import get_reward_tables
+
+CONFIGURATIONS = [dict(),
+                  dict(admissible_attributes=('categories', 'types', 'sizes', 'positions', 'relative_positions'),
+                       attribute_combinations=True)]
+
+
+@pytest.mark.parametrize('configuration', CONFIGURATIONS)
+@pytest.mark.parametrize('words_test_set_def', [(), ('small', 'cow')])
+def test_description_space_ids_are_goal_ids(configuration, words_test_set_def):
+    params = get_env_params(**configuration)
+    params['words_test_set_def'] = words_test_set_def
+    space = DescriptionSpace(params)
+    tables = get_reward_tables(params)
+    train_descriptions, test_descriptions, _ = generate_all_descriptions(params)
+
+    assert len(space) == len(tables['descriptions'])
+    assert sorted(space) == sorted(train_descriptions + test_descriptions)
+    for goal_id in range(0, len(space), 7):
+        description = tables['descriptions'][goal_id]
+        assert space[goal_id] == description
+        assert space.index(description) == tables['description_ids'][description] == goal_id
+        assert space.is_test(goal_id) == tables['goal_splits'][goal_id] == (description in test_descriptions)
+
+
+def test_littlezoo_goals():
+    env = LittleZoo()
+    assert env.train_descriptions == sorted(env.train_descriptions)
+    for goal in env.train_descriptions:
+        goal_id = env.get_goal_id(goal)
+        assert env.goal_descriptions[goal_id] == goal and env.goal_tables['goal_splits'][goal_id] == 0
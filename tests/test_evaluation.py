@@ -0,0 +1,66 @@
+import glob
+import json
+import os
+
+import pytest
+
+from little_zoo.evaluation import get_shard_path, load_results, merge_results, run_evaluation
+from little_zoo.policies import OraclePolicy
+
+SEEDS = (0, 1)
+# The LittleZoo goals are all in the train descriptions
+SPLITS = ('train',)
+
+
+def oracle_policy(env_params):
+    # Callable policy of run_evaluation, defined at the module level so that the workers can unpickle it
+    return OraclePolicy(env_params)
+
+
+def _dump(report):
+    # Families without episodes have NaN statistics, that are only equal in their JSON form
+    return json.dumps(report, sort_keys=True)
+
+
+def _read_keys(path):
+    with open(path) as f:
+        return [json.loads(line)['key'] for line in f if line.endswith('\n')]
+
+
+def test_run_evaluation_resumes_with_other_workers(tmp_path):
+    output_dir = str(tmp_path / 'resumed')
+    report = run_evaluation(oracle_policy, output_dir, nb_workers=2, seeds=SEEDS, splits=SPLITS, batch_size=16)
+    assert report['nb_units'] > 0
+    assert report['nb_completed'] == report['nb_units'] and report['nb_missing'] == 0
+    assert report['splits']['train']['Grasp/success_rate'] == 1.
+
+    # Simulate a crash in the middle of writing the last result of a shard
+    shard_path = get_shard_path(output_dir, 1, 2)
+    with open(shard_path) as f:
+        lines = f.readlines()
+    with open(shard_path, 'w') as f:
+        f.writelines(lines[:-2])
+        f.write(lines[-2][:len(lines[-2]) // 2])
+    missing = {json.loads(line)['key'] for line in lines[-2:]}
+    assert merge_results(output_dir, SEEDS, splits=SPLITS)['nb_missing'] == 2
+    assert missing.isdisjoint(load_results(output_dir))
+
+    # Resuming with 3 workers only evaluates the missing units, in the shard files of 3 workers
+    resumed = run_evaluation(oracle_policy, output_dir, nb_workers=3, seeds=SEEDS, splits=SPLITS, batch_size=16)
+    new_keys = [key for path in glob.glob(os.path.join(output_dir, 'shard_*-of-003.jsonl')) for key in _read_keys(path)]
+    assert sorted(new_keys) == sorted(missing)
+    assert _dump(resumed) == _dump(report)
+
+    # Nothing is left to evaluate, in this process or in workers
+    assert _dump(run_evaluation(oracle_policy, output_dir, nb_workers=0, seeds=SEEDS, splits=SPLITS)) == _dump(report)
+    assert not os.path.exists(get_shard_path(output_dir, 0, 1))
+
+    # Results are deterministic: an evaluation in this process gives the same report
+    in_process = run_evaluation(oracle_policy, str(tmp_path / 'in_process'), nb_workers=0, seeds=SEEDS, splits=SPLITS)
+    assert _dump(in_process) == _dump(report)
+
+
+def test_run_evaluation_checks_units(tmp_path):
+    run_evaluation(oracle_policy, str(tmp_path), nb_workers=0, seeds=(0,), splits=SPLITS)
+    with pytest.raises(ValueError):
+        run_evaluation(oracle_policy, str(tmp_path), nb_workers=0, seeds=(1,), splits=SPLITS)
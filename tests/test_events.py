@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from little_zoo import LittleZoo
+from little_zoo.playground.reward_function import get_reward_from_state
+
+OBJECTS = ['carrot', 'water', 'cow', 'sofa']
+
+# Grasp a seed, grow it by releasing it on water, then feed the grown plant to an animal
+FEED_SCRIPT = [('Go to carrot seed', []),
+               ('Grasp', [('grasped', 0)]),
+               ('Go to water', []),
+               ('Release carrot seed', [('released', 0), ('grown', 0), ('consumed', 1)]),
+               ('Grasp', [('grasped', 0)]),
+               ('Go to baby cow', []),
+               ('Release carrot', [('grown', 2), ('consumed', 0)])]
+
+# Water the seed by releasing water on it
+WATER_SCRIPT = [('Go to water', []),
+                ('Grasp', [('grasped', 1)]),
+                ('Go to carrot seed', []),
+                ('Release water', [('grown', 0), ('consumed', 1)])]
+
+
+@pytest.mark.parametrize('script, reached_goals', [(FEED_SCRIPT, ['Grow cow', 'Grow carrot', 'Grasp carrot']),
+                                                   (WATER_SCRIPT, ['Grow carrot', 'Grasp water'])])
+@pytest.mark.parametrize('goal', ['Grow cow', 'Grow carrot', 'Grasp carrot', 'Grasp water', 'Grasp sofa'])
+def test_events_and_rewards(script, reached_goals, goal):
+    env = LittleZoo(info_mode='mask')
+    np.random.seed(0)
+    observation, info = env.reset([goal] + OBJECTS)
+    playground = env.playground.unwrapped
+    assert [obj.object_descr['types'] for obj in playground.objects if obj is not None] == OBJECTS
+    assert env.goal_id >= 0
+    for action, events in script:
+        observation, reward, done, truncated, info = env.step(action)
+        assert info['events'] == events
+        # Rewards given by the events match the rewards of the state
+        assert reward == float(get_reward_from_state(playground.observation, goal, env.env_params))
+        if reward:
+            break
+    assert reward == float(goal in reached_goals)
@@ -0,0 +1,45 @@
+import os
+
+import numpy as np
+import pytest
+
+from little_zoo.playground.env_params import get_env_params
+from little_zoo.playground.functional import EVENTS, check_trace, load_traces
+
+GOLDEN_TRACES = os.path.join(os.path.dirname(__file__), 'data', 'golden_traces.npz')
+
+
+@pytest.fixture(scope='module')
+def traces():
+    return load_traces(GOLDEN_TRACES)
+
+
+@pytest.fixture(scope='module')
+def params():
+    return get_env_params()
+
+
+def test_golden_traces(traces, params):
+    assert len(traces) == 60
+    assert [i for i, trace in enumerate(traces) if not check_trace(trace, params)] == []
+
+
+def test_golden_traces_cover_events(traces):
+    # 'released' is only emitted when a held object grows
+    flags = np.concatenate([trace['event_flags'] for trace in traces]).any(axis=(0, 1))
+    assert all(flags[EVENTS.index(event)] for event in ('grasped', 'grown', 'consumed'))
+
+
+def test_check_trace_detects_mismatches(traces, params):
+    trace = next(t for t in traces if t['event_flags'][..., EVENTS.index('grown')].any())
+    observations = dict(trace, observations=trace['observations'] + 1e-3)
+    assert not check_trace(observations, params)
+    assert check_trace(observations, params, atol=1e-2)
+    event_flags = dict(trace, event_flags=~trace['event_flags'])
+    assert not check_trace(event_flags, params)
+
+
+def test_golden_traces_jax(traces, params):
+    jax = pytest.importorskip('jax')
+    jax.config.update('jax_enable_x64', True)
+    assert all(check_trace(trace, params, backend='jax') for trace in traces[:10])
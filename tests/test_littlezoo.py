@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from little_zoo import LittleZoo
+from little_zoo.playground.functional import get_state
+from little_zoo.scene_pool import build_scene
+
+ENV_DESCS = [['Grow lion', 'lion', 'water', 'carrot', 'cow'],
+             ['Grow cow', 'cow', 'water', 'berry', 'carrot'],
+             ['Grasp water', 'water', 'sofa', 'cow', 'berry']]
+# Actions that walk the whole food chain of the first scene
+FOOD_CHAIN_SCRIPT = ['Go to water', 'Grasp', 'Go to carrot seed', 'Release water', 'Go to carrot', 'Grasp',
+                     'Go to baby cow', 'Release carrot', 'Go to cow', 'Grasp', 'Go to baby lion', 'Release cow']
+
+
+def _copy_scene(source, target):
+    # Reset target with the current scene of source
+    state = get_state(source.playground.unwrapped)
+    arrays = {k: state[k] for k in ('type_ids', 'positions', 'rgb_codes', 'sizes', 'agent_pos', 'gripper_state')}
+    return target.reset(scene=build_scene(source.env_desc[0], arrays, target.playground.unwrapped))
+
+
+@pytest.mark.parametrize('observation_mode', ['text', 'vector'])
+@pytest.mark.parametrize('goal', ['Grow lion', 'Grow table'])
+def test_step_returns_python_types(observation_mode, goal):
+    env = LittleZoo(observation_mode=observation_mode, info_mode='mask')
+    observation, info = env.reset([goal, 'lion', 'water', 'carrot', 'table'])
+    assert type(env.max_steps) is int
+    done = False
+    while not done:
+        action = int(np.flatnonzero(info['action_mask'])[0])
+        observation, reward, done, truncated, info = env.step(action)
+        assert type(reward) is float and type(done) is bool and type(truncated) is bool
+    assert env.current_step <= env.max_steps
+
+
+@pytest.mark.parametrize('env_desc', ENV_DESCS)
+def test_action_mask_matches_possible_actions(env_desc):
+    # The first scene is played with the food chain script, the others at random
+    script = list(FOOD_CHAIN_SCRIPT) if env_desc == ENV_DESCS[0] else []
+    text_env = LittleZoo()
+    mask_env = LittleZoo(info_mode='mask')
+    observation, info = text_env.reset(env_desc)
+    mask_observation, mask_info = _copy_scene(text_env, mask_env)
+    rng = np.random.default_rng(0)
+    done = False
+    while not done:
+        assert mask_observation == observation
+        assert 'possible_actions' not in mask_info and 'action_mask' not in info
+        mask_actions = [mask_env.get_action_str(i) for i in np.flatnonzero(mask_info['action_mask'])]
+        assert sorted(mask_actions) == sorted(info['possible_actions'])
+        action = script.pop(0) if script else info['possible_actions'][rng.integers(len(info['possible_actions']))]
+        observation, reward, done, truncated, info = text_env.step(action)
+        mask_observation, mask_reward, mask_done, mask_truncated, mask_info = mask_env.step(
+            int(np.flatnonzero(mask_info['action_mask'])[mask_actions.index(action)]))
+        assert (mask_reward, mask_done, mask_truncated) == (reward, done, truncated)
+    if env_desc == ENV_DESCS[0]:
+        assert reward == 1 and not script
+
+
+def test_action_ids_round_trip_with_the_vocabulary():
+    env = LittleZoo(observation_mode='vector')
+    observation, info = env.reset(ENV_DESCS[0])
+    vocabulary = info['action_vocabulary']
+    assert len(vocabulary) == env.action_space.n
+    for action_id in np.flatnonzero(info['action_mask']):
+        assert env.get_action_str(action_id) == vocabulary[action_id]
+    for action in FOOD_CHAIN_SCRIPT:
+        action_strs = dict()
+        for action_id in range(env.action_space.n):
+            if info['action_mask'][action_id]:
+                action_strs[env.get_action_str(action_id)] = action_id
+                np.testing.assert_array_equal(env.get_action_from_id(action_id),
+                                              env.get_action_from_str(env.get_action_str(action_id)))
+            else:
+                with pytest.raises(ValueError):
+                    env.get_action_from_id(action_id)
+        observation, reward, done, truncated, info = env.step(action_strs[action])
+    assert reward == 1
+    with pytest.raises(ValueError):
+        env.get_action_from_id(env.action_space.n)
+
+
+def test_prompt_segments_only_grow():
+    env = LittleZoo(observation_mode='prompt')
+    observation, info = env.reset(ENV_DESCS[0])
+    prefix = info['prompt_prefix']
+    assert env.get_prompt() == prefix + observation
+    for step, action in enumerate(FOOD_CHAIN_SCRIPT, start=1):
+        prompt = env.get_prompt()
+        observation, reward, done, truncated, info = env.step(action)
+        # The new segment is appended to the prompt of the previous step, that is left untouched
+        assert env.get_prompt() == prompt + observation
+        assert observation.startswith('Step {}:\nAction: {}\n'.format(step, action)) and observation.endswith('\n\n')
+        assert 'prompt_prefix' not in info
+    assert env.get_prompt().startswith(prefix) and reward == 1
+
+
+@pytest.mark.parametrize('keyframe_interval', [1, 3])
+def test_delta_observations(keyframe_interval):
+    text_env = LittleZoo()
+    delta_env = LittleZoo(observation_mode='delta', keyframe_interval=keyframe_interval)
+    observation, info = text_env.reset(ENV_DESCS[0])
+    delta_observation, delta_info = _copy_scene(text_env, delta_env)
+    assert delta_info['keyframe'] and delta_observation == observation
+    # The food chain script with repeated actions that do not change the description
+    script = ['Go to water', 'Go to water', 'Grasp', 'Grasp', 'Go to carrot seed', 'Go to carrot seed', 'Release water',
+              'Go to carrot', 'Grasp', 'Go to baby cow', 'Release carrot', 'Go to cow', 'Grasp', 'Grasp',
+              'Go to baby lion', 'Release cow']
+    nb_unchanged = 0
+    for step, action in enumerate(script, start=1):
+        previous_observation = observation
+        observation, reward, done, truncated, info = text_env.step(action)
+        delta_observation, delta_reward, delta_done, delta_truncated, delta_info = delta_env.step(action)
+        assert (delta_reward, delta_done, delta_truncated) == (reward, done, truncated)
+        assert delta_info['keyframe'] == (step % keyframe_interval == 0)
+        if delta_info['keyframe']:
+            assert delta_observation == observation
+        elif observation == previous_observation:
+            assert delta_observation == 'Nothing changed'
+            nb_unchanged += 1
+        else:
+            assert delta_observation != 'Nothing changed' and delta_observation != observation
+    assert reward == 1
+    assert nb_unchanged > 0 or keyframe_interval == 1
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from little_zoo.metrics import GOAL_FAMILIES, RolloutStatistics, get_goal_families
+from little_zoo.playground.env_params import get_env_params
+from little_zoo.playground.reward_function import get_reward_tables
+
+
+@pytest.fixture(scope='module')
+def env_params():
+    return get_env_params()
+
+
+@pytest.fixture(scope='module')
+def tables(env_params):
+    return get_reward_tables(env_params)
+
+
+def _sample_episodes(nb_episodes, nb_goals, rng):
+    # Goals of the catalog, with a few goals that are not in it (-1 and out of range)
+    goal_ids = rng.choice(np.append(rng.integers(0, nb_goals, 20), [-1, nb_goals]), nb_episodes)
+    successes = rng.uniform(size=nb_episodes) < 0.6
+    lengths = rng.integers(1, 20, nb_episodes)
+    truncateds = ~successes & (rng.uniform(size=nb_episodes) < 0.5)
+    nb_invalid_actions = rng.integers(0, 3, nb_episodes)
+    return goal_ids, successes, lengths, truncateds, nb_invalid_actions
+
+
+def _expected_statistics(goal_ids, successes, lengths, truncateds, nb_invalid_actions):
+    # Statistics computed from the whole list of episodes
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return dict(episodes=len(goal_ids),
+                    success_rate=successes.mean() if len(goal_ids) else np.nan,
+                    steps_to_success=lengths[successes].mean() if successes.any() else np.nan,
+                    truncation_rate=truncateds.mean() if len(goal_ids) else np.nan,
+                    invalid_action_rate=nb_invalid_actions.sum() / (lengths + nb_invalid_actions).sum())
+
+
+@pytest.mark.parametrize('window', [1000, 50])
+def test_streaming_statistics_match_batch_statistics(env_params, tables, window):
+    rng = np.random.default_rng(0)
+    nb_goals = len(tables['descriptions'])
+    episodes = _sample_episodes(500, nb_goals, rng)
+    goal_ids, successes, lengths, truncateds, nb_invalid_actions = episodes
+
+    # One episode at a time, by batches, and merged from two processes
+    single = RolloutStatistics(env_params, tables, window=window)
+    for episode in zip(*episodes):
+        single.add_episode(*episode[:4], nb_invalid_actions=episode[4])
+    batched = RolloutStatistics(env_params, tables, window=window)
+    for start in range(0, 500, 64):
+        batched.add_episodes(*[values[start:start + 64] for values in episodes[:4]],
+                             nb_invalid_actions=nb_invalid_actions[start:start + 64])
+    merged = RolloutStatistics(env_params, tables, window=window)
+    other = RolloutStatistics(env_params, tables, window=window)
+    merged.add_episodes(*[values[:200] for values in episodes[:4]], nb_invalid_actions=nb_invalid_actions[:200])
+    other.add_episodes(*[values[200:] for values in episodes[:4]], nb_invalid_actions=nb_invalid_actions[200:])
+    merged.merge(other.state_dict())
+
+    families = get_goal_families(env_params, tables)
+    episode_families = np.where((goal_ids >= 0) & (goal_ids < nb_goals), families[np.clip(goal_ids, 0, nb_goals - 1)],
+                                GOAL_FAMILIES.index('Other'))
+    for statistics in (single, batched, merged):
+        snapshot = statistics.snapshot()
+        for name, value in _expected_statistics(*episodes).items():
+            np.testing.assert_allclose(snapshot[name], value)
+        for i_family, family in enumerate(GOAL_FAMILIES):
+            in_family = episode_families == i_family
+            for name, value in _expected_statistics(*[values[in_family] for values in episodes]).items():
+                np.testing.assert_allclose(snapshot[family + '/' + name], value)
+        goal_statistics = statistics.get_goal_statistics()
+        for goal_id in np.unique(goal_ids[(goal_ids >= 0) & (goal_ids < nb_goals)]):
+            for name, value in _expected_statistics(*[values[goal_ids == goal_id] for values in episodes]).items():
+                np.testing.assert_allclose(goal_statistics[name][goal_id], value)
+        np.testing.assert_allclose(snapshot['window_success_rate'], successes[-window:].mean())
+        for i_family, family in enumerate(GOAL_FAMILIES):
+            in_family = episode_families[-window:] == i_family
+            expected = successes[-window:][in_family].mean() if in_family.any() else np.nan
+            np.testing.assert_allclose(snapshot[family + '/window_success_rate'], expected)
@@ -0,0 +1,42 @@
+import numpy as np
+
+from little_zoo import LittleZoo
+
+ENV_DESC = ['Grow cow', 'carrot', 'water', 'cow', 'sofa']
+# Grasp and grow the carrot, then feed it to the cow (see test_events)
+SCRIPT = ['Go to carrot seed', 'Grasp', 'Go to water', 'Release carrot seed', 'Grasp', 'Go to baby cow',
+          'Release carrot', 'Go to sofa', 'Grasp']
+
+
+def _object_state(obj):
+    return dict(type=type(obj), object_id_int=obj.object_id_int, size=obj.size, rgb_code=obj.rgb_code.tolist(),
+                initial_rgb_code=obj.initial_rgb_code.tolist(), position=obj.position.tolist(), grasped=obj.grasped,
+                grown_once=obj.grown_once, big=obj.big, object_attributes=obj.object_attributes,
+                object_initial_attributes=obj.object_initial_attributes, features=obj.get_features().tolist())
+
+
+def test_object_pool_reuses_and_reinitializes_objects():
+    env = LittleZoo()
+    playground = env.playground.unwrapped
+    env.reset(ENV_DESC)
+    objects = list(playground.objects)
+    for action in SCRIPT:
+        env.step(action)
+    assert objects[0].grown_once and objects[2].grown_once and objects[3].grasped
+    assert playground.objects[0] is None
+
+    # A scene built without the pool, with the same random numbers
+    fresh = LittleZoo()
+    np.random.seed(0)
+    fresh.reset(ENV_DESC)
+    expected = [_object_state(obj) for obj in fresh.playground.unwrapped.objects]
+
+    for _ in range(2):
+        np.random.seed(0)
+        observation, info = env.reset(ENV_DESC)
+        # The same objects are reused, consumed objects included, without any state of the previous episodes
+        assert [id(obj) for obj in playground.objects] == [id(obj) for obj in objects]
+        assert [_object_state(obj) for obj in playground.objects] == expected
+        assert observation == fresh.generate_description()[0]
+        for action in SCRIPT:
+            env.step(action)
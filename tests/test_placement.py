@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from little_zoo.playground.placement import (PlacementError, get_max_nb_objects, sample_free_position,
+                                             sample_lattice_positions, sample_positions, sample_positions_batch)
+
+
+def _min_pairwise_distance(positions):
+    distances = np.linalg.norm(positions[..., :, None, :] - positions[..., None, :, :], axis=-1)
+    distances[..., np.arange(positions.shape[-2]), np.arange(positions.shape[-2])] = np.inf
+    return distances.min()
+
+
+# Few objects (compared to all placed objects), many objects (background grid) and near the capacity (lattice search)
+@pytest.mark.parametrize('nb_objects, min_dist', [(10, 0.3), (100, 0.1), (500, 0.07)])
+def test_sample_positions_batch(nb_objects, min_dist):
+    rng = np.random.default_rng(0)
+    lows, highs = np.array([-1, -0.5]), np.array([1, 0.8])
+    positions = sample_positions_batch(4, nb_objects, min_dist, lows, highs, rng=rng)
+    assert positions.shape == (4, nb_objects, 2)
+    assert (positions >= lows).all() and (positions <= highs).all()
+    for scene_positions in positions:
+        assert _min_pairwise_distance(scene_positions) >= min_dist
+
+
+def test_per_object_bounds():
+    rng = np.random.default_rng(0)
+    lows = np.array([[-1, -1], [0, 0], [0.5, -1]])
+    highs = np.array([[0, 0], [1, 1], [1, -0.5]])
+    positions = sample_positions_batch(100, 3, 0.2, lows, highs, rng=rng)
+    assert (positions >= lows).all() and (positions <= highs).all()
+
+
+def test_sample_lattice_positions():
+    rng = np.random.default_rng(0)
+    lows, highs = np.array([-1, -0.5]), np.array([1, 0.8])
+    # Denser than what dart throwing can place
+    nb_objects = int(0.8 * get_max_nb_objects(0.1, lows, highs))
+    positions = sample_lattice_positions(nb_objects, 0.1, lows, highs, rng=rng)
+    assert (positions >= lows).all() and (positions <= highs).all()
+    assert _min_pairwise_distance(positions) >= 0.1 - 1e-9
+
+
+def test_infeasible_density():
+    max_nb_objects = get_max_nb_objects(0.2)
+    with pytest.raises(PlacementError):
+        sample_positions(max_nb_objects + 1, 0.2)
+    with pytest.raises(PlacementError):
+        sample_lattice_positions(max_nb_objects + 1, 0.2)
+    with pytest.raises(PlacementError):
+        sample_free_position(np.zeros([1, 2]), 0.2, lows=(-0.05, -0.05), highs=(0.05, 0.05))
+    # PlacementError is a ValueError for the callers that do not know about it
+    assert issubclass(PlacementError, ValueError)
+
+
+def test_sample_free_position():
+    rng = np.random.default_rng(0)
+    other_positions = sample_positions(200, 0.1, rng=rng)
+    for _ in range(20):
+        position = sample_free_position(other_positions, 0.1, rng=rng)
+        assert (np.abs(position) <= 1).all()
+        assert np.linalg.norm(other_positions - position, axis=-1).min() >= 0.1
+
+
+@pytest.mark.parametrize('nb_objects, min_dist', [(5, 0.4), (60, 0.15)])
+def test_batch_and_single_scene_agree(nb_objects, min_dist):
+    nb_scenes = 500
+    # A single scene is a batch of one scene
+    np.testing.assert_array_equal(sample_positions(nb_objects, min_dist, rng=np.random.default_rng(1)),
+                                  sample_positions_batch(1, nb_objects, min_dist, rng=np.random.default_rng(1))[0])
+
+    # Scenes placed at once follow the same distribution as scenes placed one by one
+    rng = np.random.default_rng(0)
+    batch = sample_positions_batch(nb_scenes, nb_objects, min_dist, rng=rng)
+    single = np.stack([sample_positions(nb_objects, min_dist, rng=rng) for _ in range(nb_scenes)])
+    bins = np.linspace(-1, 1, 5)
+    for i_obj in [0, nb_objects - 1]:
+        for axis in range(2):
+            batch_hist = np.histogram(batch[:, i_obj, axis], bins)[0] / nb_scenes
+            single_hist = np.histogram(single[:, i_obj, axis], bins)[0] / nb_scenes
+            np.testing.assert_allclose(batch_hist, single_hist, atol=0.1)
+    assert abs(_mean_nearest_distance(batch) - _mean_nearest_distance(single)) < 0.05 * min_dist
+
+
+def _mean_nearest_distance(positions):
+    distances = np.linalg.norm(positions[:, :, None] - positions[:, None], axis=-1)
+    distances[:, np.arange(positions.shape[1]), np.arange(positions.shape[1])] = np.inf
+    return distances.min(axis=-1).mean()
@@ -0,0 +1,28 @@
+import numpy as np
+
+from little_zoo import LittleZooVectorEnv
+from little_zoo.curriculum import GoalSampler
+from little_zoo.metrics import GOAL_FAMILIES, get_goal_families
+from little_zoo.policies import OraclePolicy
+from little_zoo.scheduler import EpisodeScheduler
+
+# Largest number of steps of the oracle for each goal family (see OraclePolicy)
+MAX_ORACLE_STEPS = {'Grasp': 2, 'Grow plant': 4, 'Grow herbivore': 7, 'Grow carnivore': 10}
+
+
+def test_oracle_policy_achieves_all_train_goals():
+    envs = LittleZooVectorEnv(32, observation_mode='vector')
+    env = envs.get_env(0)
+    goal_sampler = GoalSampler(env.env_params, tables=env.goal_tables)
+    rng = np.random.default_rng(0)
+    # Three scenes per goal
+    env_descs = [goal_sampler.get_env_desc(env.get_goal_id(goal), rng=rng) for goal in env.train_descriptions * 3]
+    scheduler = EpisodeScheduler(envs, env_descs, max_invalid_actions=0)
+    episodes = scheduler.run(OraclePolicy(env.env_params, env.goal_tables))
+    envs.close()
+
+    assert len(episodes) == len(env_descs)
+    families = get_goal_families(env.env_params, env.goal_tables)
+    for episode in episodes:
+        assert episode['success'] and episode['invalid_actions'] == 0, episode['env_desc']
+        assert episode['length'] <= MAX_ORACLE_STEPS[GOAL_FAMILIES[families[episode['goal_id']]]]
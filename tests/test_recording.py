@@ -0,0 +1,70 @@
+import struct
+
+import numpy as np
+import pytest
+
+from little_zoo import LittleZoo
+from little_zoo import recording
+from little_zoo.recording import APNGEncoder, EpisodeRecorder
+
+
+def _read_chunks(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    chunks, offset = [], 8
+    while offset < len(data):
+        length, chunk_type = struct.unpack('>I4s', data[offset:offset + 8])
+        chunks.append((chunk_type, data[offset + 8:offset + 8 + length]))
+        offset += 12 + length
+    return chunks
+
+
+@pytest.mark.parametrize('fps', [2, 3, 7.5])
+def test_apng_encoder(tmp_path, fps):
+    path = str(tmp_path / 'video.png')
+    encoder = APNGEncoder(path, fps)
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 256, (4, 6, 5, 3), dtype=np.uint8)
+    for frame in frames:
+        encoder.write(frame)
+    encoder.close()
+
+    chunks = _read_chunks(path)
+    assert [c for c, _ in chunks] == [b'IHDR', b'acTL', b'fcTL', b'IDAT'] + [b'fcTL', b'fdAT'] * 3 + [b'IEND']
+    assert struct.unpack('>II', dict(chunks)[b'acTL']) == (4, 0)
+    for chunk_type, data in chunks:
+        if chunk_type == b'fcTL':
+            delay_num, delay_den = struct.unpack('>HH', data[20:24])
+            assert delay_num / delay_den == pytest.approx(1 / fps, abs=1e-3)
+
+    PIL = pytest.importorskip('PIL.Image')
+    with PIL.open(path) as image:
+        assert image.n_frames == 4
+        for i, frame in enumerate(frames):
+            image.seek(i)
+            np.testing.assert_array_equal(np.asarray(image.convert('RGB')), frame)
+
+
+def test_recorder_closes_the_file_when_encoding_fails(tmp_path, monkeypatch):
+    encoders = []
+
+    def make_encoder(path, fps, encoder='auto'):
+        encoders.append(APNGEncoder(path + APNGEncoder.extension, fps))
+        return encoders[-1]
+
+    def render_frame(*args):
+        if encoders[-1].nb_frames == 2:
+            raise ValueError('rendering failed')
+        return np.zeros([8, 8, 3], dtype=np.uint8)
+
+    monkeypatch.setattr(recording, 'make_encoder', make_encoder)
+    monkeypatch.setattr(recording, 'render_frame', render_frame)
+    env = EpisodeRecorder(LittleZoo(), str(tmp_path), fps=2.5, encoder='apng')
+    observation, info = env.reset(['Grow lion', 'lion', 'water', 'carrot', 'cow'])
+    for action in info['possible_actions'][:4]:
+        env.step(action)
+    with pytest.raises(RuntimeError):
+        env.flush()
+    assert encoders[0].file is None
+    env.close()
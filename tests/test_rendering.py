@@ -0,0 +1,49 @@
+import numpy as np
+
+from little_zoo import LittleZoo
+from little_zoo.playground.env_params import get_env_params
+from little_zoo.playground.rendering import (BACKGROUND_COLOR, SpriteAtlas, get_pixel_coordinates, render_batch,
+                                             render_frame)
+from little_zoo.scene_pool import build_scene
+
+
+def test_render_rgb_array():
+    env = LittleZoo(render_mode='rgb_array')
+    env_desc = ['Grow lion', 'lion', 'water', 'carrot', 'cow']
+    env.reset(env_desc)
+    playground = env.playground.unwrapped
+    types = playground.params['attributes']['types']
+    positions = np.array([[0.5, 0.5], [-0.5, 0.5], [0.5, -0.5], [-0.5, -0.5]])
+    rgb_codes = np.array([[1., 0., 0.], [0., 1., 0.], [0., 0., 1.], [0.2, 0.4, 0.6]])
+    arrays = dict(type_ids=np.array([types.index(name) for name in env_desc[1:]]), positions=positions,
+                  rgb_codes=rgb_codes, sizes=np.full(4, 0.2), agent_pos=np.array([0., 0.]), gripper_state=-1)
+    env.reset(scene=build_scene(env_desc[0], arrays, playground))
+
+    frame = env.render()
+    screen_size = playground.params['screen_size']
+    assert frame.shape == (screen_size, screen_size, 3)
+    assert frame.dtype == np.uint8
+    xs, ys = get_pixel_coordinates(positions[:, 0], positions[:, 1], screen_size)
+    for x, y, rgb_code in zip(xs, ys, rgb_codes):
+        np.testing.assert_allclose(frame[y, x], rgb_code * 255, atol=1)
+    np.testing.assert_array_equal(frame[0, 0], BACKGROUND_COLOR)
+
+
+def test_render_batch_matches_render_frame():
+    params = get_env_params(screen_size=200)
+    atlas = SpriteAtlas(params)
+    rng = np.random.default_rng(0)
+    nb_frames, nb_objects = 8, 5
+    positions = rng.uniform(-1.2, 1.2, [nb_frames, nb_objects, 2])  # some objects are partly outside of the frame
+    sizes = rng.choice([0.2, 0.25, 0.3, 0.34], [nb_frames, nb_objects])  # grown objects included
+    type_ids = rng.integers(-1, len(params['attributes']['types']), [nb_frames, nb_objects])  # -1 for removed objects
+    rgb_codes = rng.uniform(-0.2, 1.2, [nb_frames, nb_objects, 3])
+    agent_pos = rng.uniform(-1, 1, [nb_frames, 2])
+    gripper_state = rng.choice([-1, 1], nb_frames)
+
+    frames = render_batch(atlas, positions, sizes, type_ids, rgb_codes, agent_pos, gripper_state)
+    assert frames.shape == (nb_frames, 200, 200, 3) and frames.dtype == np.uint8
+    assert len({frame.tobytes() for frame in frames}) == nb_frames
+    for i in range(nb_frames):
+        np.testing.assert_array_equal(frames[i], render_frame(atlas, positions[i], sizes[i], type_ids[i], rgb_codes[i],
+                                                              agent_pos[i], gripper_state[i]))
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from little_zoo import LittleZoo
+from little_zoo.curriculum import GoalSampler
+from little_zoo.playground.env_params import get_env_params
+from little_zoo.playground.reward_function import (get_achieved_goals_from_trajectories, get_reward_from_state,
+                                                   get_reward_from_states)
+from little_zoo.policies import OraclePolicy
+from little_zoo.scene_pool import build_scene, sample_scene_arrays
+
+
+@pytest.fixture(scope='module')
+def env():
+    return LittleZoo(observation_mode='vector', info_mode='mask')
+
+
+@pytest.fixture(scope='module')
+def rollouts(env):
+    # Playground observations of episodes where each action is taken by the oracle or at random
+    oracle = OraclePolicy(env.env_params, env.goal_tables)
+    goal_sampler = GoalSampler(env.env_params, tables=env.goal_tables)
+    playground = env.playground.unwrapped
+    rng = np.random.default_rng(0)
+    trajectories = []
+    for goal in env.train_descriptions[::3]:
+        env_desc = goal_sampler.get_env_desc(env.get_goal_id(goal), rng=rng)
+        observation, info = env.reset(scene=build_scene(goal, sample_scene_arrays(env_desc, playground, rng), playground))
+        states = [playground.observation.copy()]
+        done = False
+        while not done:
+            action = oracle(observation[None], [info])[0]
+            if rng.uniform() < 0.5 or not info['action_mask'][action]:
+                action = rng.choice(np.flatnonzero(info['action_mask']))
+            observation, reward, done, truncated, info = env.step(int(action))
+            states.append(playground.observation.copy())
+        trajectories.append(np.array(states))
+    return trajectories
+
+
+def test_reward_from_states_matches_reward_from_state(env, rollouts):
+    states = np.concatenate(rollouts)
+    names = env.env_params['name_attributes']
+    nb_rewards = 0
+    for goal in ['{} {}'.format(verb, name) for verb in ('Grasp', 'Grow') for name in names]:
+        rewards = get_reward_from_states(states, goal, env.env_params, env.goal_tables)
+        expected = [get_reward_from_state(state, goal, env.env_params) for state in states]
+        np.testing.assert_array_equal(rewards, expected)
+        # Goal ids give the same rewards as goal descriptions ('Grow door' is not in the description space)
+        goal_ids = np.full([len(states)], env.goal_tables['description_ids'].get(goal, -1))
+        np.testing.assert_array_equal(get_reward_from_states(states, goal_ids, env.env_params, env.goal_tables), rewards)
+        nb_rewards += rewards.sum()
+    assert nb_rewards > 0
+
+
+@pytest.mark.parametrize('admissible_attributes', [('categories', 'types'),
+                                                   ('categories', 'types', 'sizes', 'positions', 'relative_positions')])
+def test_attributes_from_states_match_attributes_from_state(rollouts, admissible_attributes):
+    params = get_env_params(admissible_attributes=admissible_attributes)
+    get_attributes_from_state = params['extract_functions']['get_attributes_functions']['all_attributes']
+    states = np.concatenate(rollouts)
+    half_dim = states.shape[1] // 2
+    # Current and initial states
+    states = np.concatenate([states[:, :half_dim], states[:, :half_dim] - states[:, half_dim:]])
+    attributes = params['extract_functions']['get_attributes_from_states'](states)
+    assert attributes.shape == (len(states), 4, len(params['attribute_names']))
+    attribute_names = np.array(params['attribute_names'])
+    for state, state_attributes in zip(states, attributes):
+        for obj_attributes, expected in zip(state_attributes, get_attributes_from_state(state)):
+            # Removed objects have no type (None) in the scalar extraction and no attribute in the batched one
+            expected = [a for a in expected if a is not None]
+            assert sorted(attribute_names[obj_attributes]) == sorted(expected)
+
+
+def test_achieved_goals_from_trajectories_match_reward_loop(env, rollouts):
+    tables = env.goal_tables
+    nb_goals = len(tables['descriptions'])
+    expected = []
+    for i_traj, trajectory in enumerate(rollouts):
+        # First timestep at which each goal is achieved, one state at a time
+        first_timesteps = np.full([nb_goals], -1)
+        for t, state in enumerate(trajectory):
+            rewards = get_reward_from_states(np.repeat(state[None], nb_goals, axis=0), np.arange(nb_goals),
+                                             env.env_params, tables)
+            first_timesteps[rewards & (first_timesteps < 0)] = t
+        rows = [(t, goal_id, tables['goal_splits'][goal_id]) for goal_id, t in enumerate(first_timesteps) if t >= 0]
+        expected += [(i_traj,) + row for row in sorted(rows)]
+        achieved = get_achieved_goals_from_trajectories(trajectory, env.env_params, tables)
+        np.testing.assert_array_equal(achieved, np.array(sorted(rows), dtype=np.int64).reshape(-1, 3))
+    assert len(expected) > 0
+
+    # Batch of trajectories, padded with states where all objects are grasped and grown
+    lengths = np.array([len(trajectory) for trajectory in rollouts])
+    padded = np.ones([len(rollouts), lengths.max(), rollouts[0].shape[1]])
+    for trajectory, padded_trajectory in zip(rollouts, padded):
+        padded_trajectory[:len(trajectory)] = trajectory
+    achieved = get_achieved_goals_from_trajectories(padded, env.env_params, tables, lengths=lengths)
+    np.testing.assert_array_equal(achieved, np.array(expected, dtype=np.int64))
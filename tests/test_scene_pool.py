@@ -0,0 +1,33 @@
+import pytest
+
+from little_zoo import LittleZoo
+from little_zoo.scene_pool import ScenePool
+
+ENV_DESCS = [['Grasp water', 'water', 'cow', 'carrot', 'lion'],
+             ['Grow lion', 'lion', 'cow', 'carrot', 'water']] * 4
+
+
+def _nb_free_objects(objects_pool):
+    return sum(len(objects) for objects in objects_pool.free_objects.values())
+
+
+@pytest.mark.parametrize('background', [False, True])
+def test_scene_pool_reuses_objects(background):
+    env = LittleZoo()
+    env.reset(ENV_DESCS[0])
+    pool = ScenePool(env, ENV_DESCS, background=background, prefetch=2)
+    playground = env.playground.unwrapped
+    object_ids = set()
+    try:
+        for _ in range(50):
+            observation, info = pool.reset()
+            assert [o.object_descr['types'] for o in playground.objects] == env.env_desc[1:]
+            env.step(info['possible_actions'][0])
+            object_ids.update(id(o) for o in playground.objects)
+            # The pools get back as many objects as they give, they do not grow with the number of resets
+            assert _nb_free_objects(playground.objects_pool) <= 4
+            assert _nb_free_objects(pool._objects_pool) <= 4
+    finally:
+        pool.close()
+    # Objects are reused: at most the objects of the scenes of the queue, the current scene and the replaced one
+    assert len(object_ids) <= 4 * 6
@@ -0,0 +1,51 @@
+import pytest
+
+from little_zoo import LittleZooVectorEnv
+from little_zoo.policies import OraclePolicy
+from little_zoo.scheduler import EpisodeScheduler
+
+ENV_DESCS = [['Grasp water', 'water', 'sofa', 'cow', 'berry'],
+             ['Grow lion', 'lion', 'water', 'carrot', 'cow'],
+             ['Grow carrot', 'carrot', 'lion', 'water', 'table'],
+             ['Grow cow', 'cow', 'water', 'berry', 'carrot'],
+             ['Grasp cow', 'water', 'sofa', 'cow', 'berry'],
+             ['Grow berry', 'berry', 'water', 'sofa', 'cow'],
+             ['Grow tiger', 'tiger', 'water', 'potato', 'sheep'],
+             ['Grasp lion', 'lion', 'water', 'carrot', 'cow']] * 2
+
+
+@pytest.mark.parametrize('bin_by_horizon, lookahead', [(False, None), (True, None), (True, 4)])
+def test_episodes_are_started_by_horizon(bin_by_horizon, lookahead):
+    # With a single environment, episodes end in the order they are started
+    envs = LittleZooVectorEnv(1, observation_mode='vector')
+    scheduler = EpisodeScheduler(envs, ENV_DESCS, bin_by_horizon=bin_by_horizon, lookahead=lookahead)
+    episodes = scheduler.run(OraclePolicy(envs.get_env(0).env_params))
+    order = [episode['episode'] for episode in episodes]
+    assert all(episode['success'] for episode in episodes)
+
+    horizons = [scheduler.get_horizon(env_desc) for env_desc in ENV_DESCS]
+    window = lookahead if lookahead is not None else len(ENV_DESCS)
+    if bin_by_horizon:
+        # Decreasing horizons within each lookahead window, episodes of the same horizon keep their order
+        expected = []
+        for start in range(0, len(ENV_DESCS), window):
+            expected += sorted(range(start, min(start + window, len(ENV_DESCS))), key=lambda i: - horizons[i])
+    else:
+        expected = list(range(len(ENV_DESCS)))
+    assert order == expected
+    assert len(set(horizons)) > 1
+
+
+def test_scheduler_keeps_the_batch_full():
+    envs = LittleZooVectorEnv(4, observation_mode='vector')
+    scheduler = EpisodeScheduler(envs, ENV_DESCS, bin_by_horizon=True)
+    policy = OraclePolicy(envs.get_env(0).env_params)
+    scheduler.reset()
+    finished = []
+    while not scheduler.done:
+        # The batch is full as long as episodes remain in the queue
+        if len(finished) + 4 <= len(ENV_DESCS):
+            assert len(scheduler.indices) == 4
+        finished += scheduler.step(policy(scheduler.observations, scheduler.infos))
+    assert sorted(episode['episode'] for episode in finished) == list(range(len(ENV_DESCS)))
+    assert scheduler.nb_env_steps == sum(episode['length'] for episode in finished)
@@ -0,0 +1,145 @@
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from little_zoo import LittleZoo
+from little_zoo.playground.functional import get_state
+from little_zoo.scene_pool import build_scene
+from little_zoo.server import (OP_RESET_DESC, OP_STEP, EnvServer, LittleZooClient, _ACTION_ID, _frame, decode_result,
+                               encode_result, run_loopback_benchmark)
+
+ENV_DESCS = [['Grow lion', 'lion', 'water', 'carrot', 'cow'],
+             ['Grasp water', 'water', 'sofa', 'cow', 'berry'],
+             ['Grow carrot', 'carrot', 'lion', 'water', 'table']]
+
+
+def _copy_scene(source, target):
+    # Reset target with the scene of source (scenes are sampled with the global random generator of each process)
+    state = get_state(source.playground)
+    arrays = {k: state[k] for k in ('type_ids', 'positions', 'rgb_codes', 'sizes', 'agent_pos', 'gripper_state')}
+    return target.reset(scene=build_scene(source.env_desc[0], arrays, target.playground))
+
+
+@pytest.mark.parametrize('observation_mode', ['text', 'delta'])
+def test_encode_result(observation_mode):
+    info = dict(goal='Grow lion', goal_id=3, action_mask=np.arange(9) % 3 == 0, inventory=['water', 'carrot'],
+                keyframe=False, events=[('grasped', 0), ('grown', 300), ('consumed', 65535)])
+    observation, reward, done, truncated, decoded = decode_result(
+        encode_result('You see a lion.', 1., True, False, info), observation_mode)
+    assert (observation, reward, done, truncated) == ('You see a lion.', 1., True, False)
+    assert decoded['events'] == info['events'] and decoded['inventory'] == info['inventory']
+    np.testing.assert_array_equal(decoded['action_mask'], info['action_mask'])
+    assert decoded.get('keyframe') == (False if observation_mode == 'delta' else None)
+    assert decode_result(encode_result('', 0., False, False, dict(info, inventory=[])), 'text')[4]['inventory'] == []
+
+
+@pytest.mark.parametrize('observation_mode', ['text', 'vector'])
+def test_loopback_benchmark(observation_mode):
+    policy = 'oracle' if observation_mode == 'vector' else 'random'
+    stats = run_loopback_benchmark(nb_clients=3, nb_steps=200, policy=policy, timeout=120,
+                                   observation_mode=observation_mode)
+    assert stats['steps_per_second'] > 50
+    assert 0 < stats['latency_p50'] <= stats['latency_p99'] < 1000
+    assert stats['mean_batch_size'] >= 1
+
+
+def test_loopback_benchmark_rejects_vector_policies_in_text_mode():
+    with pytest.raises(ValueError):
+        run_loopback_benchmark(nb_clients=1, nb_steps=10, policy='oracle')
+
+
+@pytest.mark.parametrize('observation_mode', ['text', 'vector', 'delta'])
+@pytest.mark.parametrize('transport', ['tcp', 'unix'])
+def test_client_matches_local_env(observation_mode, transport, tmp_path):
+    address = str(tmp_path / 'little_zoo.sock') if transport == 'unix' else ('127.0.0.1', 0)
+    server = EnvServer(address, max_sessions=2, observation_mode=observation_mode).start()
+    client = LittleZooClient(server.address, timeout=30)
+    local = LittleZoo(observation_mode=observation_mode, info_mode='mask')
+    rng = np.random.default_rng(0)
+    try:
+        for env_desc in ENV_DESCS:
+            observation, info = client.reset(env_desc)
+            # The session of the client is the first slot of the server
+            local_observation, local_info = _copy_scene(server.backend.envs[0], local)
+            assert info['goal'] == local_info['goal']
+            assert info['action_vocabulary'] == local_info['action_vocabulary']
+            assert info.get('keyframe') == local_info.get('keyframe')
+            done = False
+            while not done:
+                if observation_mode == 'vector':
+                    np.testing.assert_allclose(observation, local_observation.astype(np.float32))
+                else:
+                    assert observation == local_observation
+                np.testing.assert_array_equal(info['action_mask'], local_info['action_mask'])
+                action = int(rng.choice(np.flatnonzero(local_info['action_mask'])))
+                observation, reward, done, truncated, info = client.step(action)
+                local_observation, local_reward, local_done, local_truncated, local_info = local.step(action)
+                assert (reward, done, truncated) == (local_reward, local_done, local_truncated)
+                assert info['events'] == local_info['events']
+                assert info.get('inventory') == local_info.get('inventory')
+                assert info.get('keyframe') == local_info.get('keyframe')
+
+        # Invalid actions are reported as ValueError and do not end the session
+        with pytest.raises(ValueError):
+            client.step('Fly')
+        client.reset(ENV_DESCS[0])
+    finally:
+        client.close()
+        server.close()
+
+
+def test_new_sessions_must_reset_before_step():
+    server = EnvServer(max_sessions=1).start()
+    try:
+        client = LittleZooClient(server.address, timeout=30)
+        with pytest.raises(ValueError):
+            client.step(0)
+        client.reset(ENV_DESCS[0])
+        client.step(0)
+        client.close()
+        deadline = time.perf_counter() + 10
+        while server.sessions and time.perf_counter() < deadline:
+            time.sleep(0.01)
+
+        # The next client gets the slot of the first one, with its episode still running
+        client = LittleZooClient(server.address, timeout=30)
+        with pytest.raises(ValueError):
+            client.step(0)
+        assert server.backend.envs[0].current_step == 1
+        client.reset(ENV_DESCS[1])
+        client.step(0)
+        client.close()
+    finally:
+        server.close()
+
+
+def test_clients_that_do_not_read_are_dropped():
+    server = EnvServer(max_sessions=2, max_backlog=1 << 16, observation_mode='vector').start()
+    greedy = socket.create_connection(server.address)
+    # Requests of a client that never reads its responses
+    requests = (_frame(bytes([OP_RESET_DESC]) + '\n'.join(ENV_DESCS[0]).encode())
+                + _frame(bytes([OP_STEP]) + _ACTION_ID.pack(0)) * 100000)
+
+    def flood():
+        try:
+            greedy.sendall(requests)
+        except OSError:
+            pass
+    thread = threading.Thread(target=flood, daemon=True)
+    thread.start()
+    try:
+        client = LittleZooClient(server.address, timeout=10)
+        observation, info = client.reset(ENV_DESCS[1])
+        for _ in range(50):
+            client.step(0)
+        thread.join(timeout=30)
+        assert not thread.is_alive()
+        assert len(server.sessions) == 1
+        client.step(0)
+        client.close()
+    finally:
+        greedy.close()
+        server.close()
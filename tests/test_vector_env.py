@@ -0,0 +1,52 @@
+import numpy as np
+
+from little_zoo import LittleZoo, LittleZooVectorEnv
+from little_zoo.playground.functional import get_state
+from little_zoo.scene_pool import build_scene
+
+ENV_DESCS = [['Grow lion', 'lion', 'water', 'carrot', 'cow'],
+             ['Grasp water', 'water', 'sofa', 'cow', 'berry'],
+             ['Grow carrot', 'carrot', 'lion', 'water', 'table']]
+
+
+def test_vector_observations_are_rows_of_one_batch():
+    envs = LittleZooVectorEnv(3, observation_mode='vector')
+    observations, infos = envs.reset(range(3), env_descs=ENV_DESCS)
+    assert observations.dtype == np.float32 and observations.shape == envs.observations.shape
+    for index in range(3):
+        env = envs.get_env(index)
+        assert np.shares_memory(env.playground.unwrapped.observation, envs.observations[index])
+        np.testing.assert_array_equal(env.get_vector_observation()[0], observations[index])
+
+    # The returned batches are copies, that the next steps do not change
+    first = observations.copy()
+    actions = [int(np.flatnonzero(info['action_mask'])[-1]) for info in infos]
+    stepped, _, _, _, _ = envs.step([2, 0], [actions[2], actions[0]])
+    np.testing.assert_array_equal(observations, first)
+    np.testing.assert_array_equal(stepped, envs.observations[[2, 0]])
+    assert not np.array_equal(stepped[1], first[0])
+
+
+def test_vector_env_matches_single_envs():
+    envs = LittleZooVectorEnv(len(ENV_DESCS), observation_mode='vector')
+    observations, infos = envs.reset(range(len(ENV_DESCS)), env_descs=ENV_DESCS)
+    singles = []
+    for index, env_desc in enumerate(ENV_DESCS):
+        state = get_state(envs.get_env(index).playground.unwrapped)
+        single = LittleZoo(observation_mode='vector')
+        arrays = {k: state[k] for k in ('type_ids', 'positions', 'rgb_codes', 'sizes', 'agent_pos', 'gripper_state')}
+        observation, _ = single.reset(scene=build_scene(env_desc[0], arrays, single.playground))
+        np.testing.assert_array_equal(observation, observations[index])
+        singles.append(single)
+
+    rng = np.random.default_rng(0)
+    active = list(range(len(ENV_DESCS)))
+    while active:
+        actions = [int(rng.choice(np.flatnonzero(infos[i]['action_mask']))) for i in range(len(active))]
+        observations, rewards, dones, truncateds, infos = envs.step(active, actions)
+        for i, (index, action) in enumerate(zip(active, actions)):
+            observation, reward, done, truncated, _ = singles[index].step(action)
+            np.testing.assert_array_equal(observation, observations[i])
+            assert (reward, done, truncated) == (rewards[i], dones[i], truncateds[i])
+        active = [index for index, done in zip(active, dones) if not done]
+        infos = [info for info, done in zip(infos, dones) if not done]